@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DataToolsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "data_tools"
+
+    def ready(self):
+        # Connect the signal receivers
+        from . import signals  # noqa: F401
@@ -1,5 +1,62 @@
 from django import forms
 
+from data_tools.utils import (
+    CSV_DIALECTS,
+    DIALECT_SNIFF_SIZE,
+    detect_csv_dialect,
+    get_csv_dialect_choices,
+    get_sample_header,
+)
+
+
+def get_dialect_choices():
+    return [("", "Detect automatically"), *get_csv_dialect_choices()]
+
 
 class CSVUploadForm(forms.Form):
     file = forms.FileField()
+    dialect = forms.ChoiceField(
+        choices=get_dialect_choices,
+        required=False,
+        label="Format",
+        help_text="The bank that exported the file",
+    )
+
+    def clean(self):
+        """Make sure the file has a CSV header with the columns of its dialect.
+
+        If no dialect was chosen, it is detected from the header. Only the
+        start of the file is read, so this is cheap no matter how large the
+        file is; the rest of the file is checked when it is imported.
+        """
+        cleaned_data = super().clean()
+        file = cleaned_data.get("file")
+        if file is None:
+            return cleaned_data
+        sample = file.read(DIALECT_SNIFF_SIZE)
+        file.seek(0)
+
+        if cleaned_data.get("dialect"):
+            dialect = CSV_DIALECTS[cleaned_data["dialect"]]
+            missing_columns = dialect.get_missing_columns(get_sample_header(sample, dialect))
+            if missing_columns:
+                self.add_error(
+                    "file",
+                    "The file is missing the column(s): {}.".format(", ".join(missing_columns)),
+                )
+            return cleaned_data
+
+        dialect = detect_csv_dialect(sample)
+        if dialect is None:
+            self.add_error(
+                "file",
+                "The file is missing the column(s) of each of the formats: {}.".format(
+                    "; ".join(
+                        "{} ({})".format(dialect.label, ", ".join(dialect.header_columns))
+                        for dialect in CSV_DIALECTS.values()
+                    )
+                ),
+            )
+        else:
+            cleaned_data["dialect"] = dialect.name
+        return cleaned_data
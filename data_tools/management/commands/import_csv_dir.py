@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from data_tools.models import CSVImport
+from data_tools.utils import (
+    CSV_DIALECTS,
+    IMPORT_LOCK_ID,
+    CategoryResolver,
+    get_cached_mappings,
+    run_csv_import,
+)
+
+# The mappings and CategoryResolver shared by every file a worker process imports
+_worker_ingest_kwargs = {}
+
+
+def _init_worker(ingest_kwargs):
+    """Set up Django in a worker process, and keep the pre-loaded mappings."""
+    django.setup()
+    _worker_ingest_kwargs.update(ingest_kwargs)
+
+
+def _import_file(csv_import_id):
+    """Import a single file in a worker process."""
+    csv_import = CSVImport.objects.get(pk=csv_import_id)
+    count_created, errors = run_csv_import(csv_import, **_worker_ingest_kwargs)
+    return csv_import_id, count_created, errors
+
+
+class Command(BaseCommand):
+    help = "Imports every CSV file in a directory, several files at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", type=str)
+        parser.add_argument(
+            "--pattern",
+            type=str,
+            default="*.csv",
+            help="Only import the files whose names match this glob pattern.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="The number of files to import at once. With 1, files are imported in "
+            "this process.",
+        )
+        parser.add_argument(
+            "--columnar",
+            action="store_true",
+            help="Parse each file a column at a time, which is much faster for large files.",
+        )
+        parser.add_argument(
+            "--dialect",
+            type=str,
+            choices=sorted(CSV_DIALECTS),
+            default="",
+            help="The bank CSV dialect of the files. Detected from the header of each file "
+            "by default.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Import every CSV file in a directory, in parallel.
+
+        We:
+         - create a CSVImport for each file (marked as running, so the background
+           worker does not also pick it up), with the --dialect, if given (otherwise
+           the dialect of each file is detected from its header)
+         - load the title mappings, category mappings, and Categories once, and
+           share them with every worker process
+         - import the files in a process pool. Each file is imported in streaming
+           mode (invalid rows are skipped and reported), and every batch is
+           deduplicated and written under a shared lock, so overlapping files
+           don't create duplicate transactions.
+        """
+        directory = Path(options["directory"])
+        if not directory.is_dir():
+            raise CommandError('Directory not found: "%s"' % directory)
+        paths = sorted(path for path in directory.glob(options["pattern"]) if path.is_file())
+        if not paths:
+            raise CommandError('No files matching "%s" in "%s"' % (options["pattern"], directory))
+
+        csv_imports = {}
+        for path in paths:
+            with path.open("rb") as the_file:
+                csv_imports[path] = CSVImport.objects.create(
+                    file=File(the_file, name=path.name),
+                    dialect=options["dialect"],
+                    status=CSVImport.STATUS_RUNNING,
+                    started_at=timezone.now(),
+                )
+        ingest_kwargs = {
+            "atomic": False,
+            "mappings": get_cached_mappings(),
+            "category_resolver": CategoryResolver(),
+            "lock_id": IMPORT_LOCK_ID,
+            "columnar": options["columnar"],
+        }
+        paths_by_id = {csv_import.pk: path for path, csv_import in csv_imports.items()}
+
+        if options["workers"] <= 1:
+            _init_worker(ingest_kwargs)
+            results = (_import_file(csv_import.pk) for csv_import in csv_imports.values())
+            self.write_results(results, paths_by_id)
+            return
+
+        # Worker processes must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(options["workers"], len(paths)),
+            initializer=_init_worker,
+            initargs=(ingest_kwargs,),
+        ) as executor:
+            futures = [
+                executor.submit(_import_file, csv_import.pk) for csv_import in csv_imports.values()
+            ]
+            self.write_results((future.result() for future in as_completed(futures)), paths_by_id)
+
+    def write_results(self, results, paths_by_id):
+        total_created = 0
+        for csv_import_id, count_created, errors in results:
+            total_created += count_created
+            path = paths_by_id[csv_import_id]
+            if errors:
+                self.stderr.write(
+                    self.style.WARNING("%s: %d transaction(s) created, with errors:\n    %s")
+                    % (path.name, count_created, "\n    ".join(errors))
+                )
+            else:
+                self.stdout.write("%s: %d transaction(s) created." % (path.name, count_created))
+        self.stdout.write(self.style.SUCCESS("%d transaction(s) created in total.") % total_created)
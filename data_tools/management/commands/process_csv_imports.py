@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from data_tools.utils import (
+    STALE_IMPORT_TIMEOUT,
+    claim_next_csv_import,
+    fail_stale_csv_imports,
+    run_csv_import,
+)
+
+
+class Command(BaseCommand):
+    help = "Processes queued CSV imports in the background"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the imports that are currently queued, then exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait before checking for new imports when the queue is empty.",
+        )
+        parser.add_argument(
+            "--stale-timeout",
+            type=float,
+            default=STALE_IMPORT_TIMEOUT.total_seconds(),
+            help="Seconds after which a running import that has not recorded any progress is "
+            "marked as failed (because its worker must have stopped).",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Process queued CSVImports, oldest first.
+
+        We:
+         - mark the running CSVImports whose workers have stopped as failed
+         - claim the next queued CSVImport (several workers may run at once)
+         - ingest its file, recording the status, progress and errors on it
+         - when nothing is queued, either exit (--once) or wait and check again
+        """
+        stale_timeout = timedelta(seconds=options["stale_timeout"])
+        while True:
+            count_failed = fail_stale_csv_imports(stale_timeout)
+            if count_failed:
+                self.stderr.write(
+                    self.style.WARNING("Marked %d interrupted import(s) as failed.") % count_failed
+                )
+            csv_import = claim_next_csv_import()
+            if csv_import is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            count_created, errors = run_csv_import(csv_import)
+            if errors:
+                self.stderr.write(
+                    self.style.ERROR("Failed %s:\n    %s") % (csv_import, "\n    ".join(errors))
+                )
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS("Processed %s: %d transaction(s) created.")
+                    % (csv_import, count_created)
+                )
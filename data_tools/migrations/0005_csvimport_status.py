@@ -0,0 +1,45 @@
+# Generated by Django 6.0.6 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+def mark_existing_imports_completed(apps, schema_editor):
+    """Imports from before the status field existed were processed synchronously."""
+    CSVImport = apps.get_model("data_tools", "CSVImport")
+    CSVImport.objects.update(status="completed")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_tools', '0004_categorymapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvimport',
+            name='errors',
+            field=models.TextField(blank=True, help_text='Errors encountered during this import'),
+        ),
+        migrations.AddField(
+            model_name='csvimport',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='csvimport',
+            name='rows_total',
+            field=models.PositiveIntegerField(blank=True, help_text='Number of rows in the file, once it has been counted', null=True),
+        ),
+        migrations.AddField(
+            model_name='csvimport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='csvimport',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_imports_completed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_tools', '0005_csvimport_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvimport',
+            name='dialect',
+            field=models.CharField(blank=True, help_text='The bank CSV dialect of the file. Detected from its header if blank', max_length=50),
+        ),
+    ]
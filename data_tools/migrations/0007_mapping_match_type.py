@@ -0,0 +1,43 @@
+# Generated by Django 6.0.6 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_tools', '0006_csvimport_dialect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorymapping',
+            name='match_type',
+            field=models.CharField(choices=[('exact', 'Exact'), ('prefix', 'Starts with'), ('contains', 'Contains'), ('regex', 'Regular expression')], default='exact', help_text='How the source title is matched against descriptions', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='categorymapping',
+            name='priority',
+            field=models.IntegerField(default=0, help_text='Pattern mappings with a higher priority are tried first'),
+        ),
+        migrations.AddField(
+            model_name='titlemapping',
+            name='match_type',
+            field=models.CharField(choices=[('exact', 'Exact'), ('prefix', 'Starts with'), ('contains', 'Contains'), ('regex', 'Regular expression')], default='exact', help_text='How the source title is matched against descriptions', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='titlemapping',
+            name='priority',
+            field=models.IntegerField(default=0, help_text='Pattern mappings with a higher priority are tried first'),
+        ),
+        migrations.AlterField(
+            model_name='categorymapping',
+            name='source_title',
+            field=models.CharField(help_text='The title of a transaction (or a pattern that matches it)', max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='titlemapping',
+            name='source_title',
+            field=models.CharField(help_text='The title variation that appears in CSV files (or a pattern that matches it)', max_length=255, unique=True),
+        ),
+    ]
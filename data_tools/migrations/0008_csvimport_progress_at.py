@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_tools', '0007_mapping_match_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvimport',
+            name='progress_at',
+            field=models.DateTimeField(blank=True, help_text='When the progress of this import was last recorded', null=True),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import re
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
@@ -5,8 +8,24 @@ from django.utils import timezone
 class CSVImport(models.Model):
     """
     Model to track CSV imports.
+
+    Uploaded imports are queued, and processed in the background by the
+    process_csv_imports management command, which records their status,
+    progress and errors here.
     """
 
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    )
+    FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+
     file = models.FileField(upload_to="csv_imports/")
     created_at = models.DateTimeField(default=timezone.now)
     rows_created = models.PositiveIntegerField(
@@ -15,23 +34,140 @@ class CSVImport(models.Model):
     rows_skipped = models.PositiveIntegerField(
         default=0, help_text="Number of rows skipped during this import"
     )
+    rows_total = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Number of rows in the file, once it has been counted"
+    )
+    dialect = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="The bank CSV dialect of the file. Detected from its header if blank",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    errors = models.TextField(blank=True, help_text="Errors encountered during this import")
+    started_at = models.DateTimeField(null=True, blank=True)
+    progress_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the progress of this import was last recorded"
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"CSV Import on {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
 
+    @property
+    def last_active_at(self):
+        """When the worker of a running import was last known to be working on it."""
+        return self.progress_at or self.started_at
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @property
+    def progress_percent(self):
+        """The percentage of rows processed so far, or None if the rows have not been counted."""
+        if not self.rows_total:
+            return None
+        return min(100, int((self.rows_created + self.rows_skipped) * 100 / self.rows_total))
+
+
+#: The parts of a regular expression that a regex mapping can't use, since the
+#: patterns of all the regex mappings are combined into one regular expression:
+#: backreferences, named groups and global inline flags. Escaped characters and
+#: character classes are matched too, so that they are skipped.
+_UNSUPPORTED_REGEX_RE = re.compile(
+    r"\\.|\[\^?\]?(?:\\.|[^\]\\])*\]|\(\?P[<=]|\(\?\(|\(\?[aiLmsux]+\)"
+)
+
+
+def get_mapping_regex(pattern):
+    """
+    Get the regular expression that a description is matched against (with
+    re.match()) for a regex mapping's pattern.
+
+    The pattern can be anywhere in the description, so it is prefixed with a
+    lazy ".*?".
+
+    Raises:
+        ValueError: If the pattern is not a valid regular expression, or uses
+            something that can't be combined with other patterns.
+    """
+    for match in _UNSUPPORTED_REGEX_RE.finditer(pattern):
+        token = match.group()
+        if token.startswith("(?P<"):
+            raise ValueError("Named groups are not supported.")
+        if token.startswith(("(?P=", "(?(")) or token[1:] in "123456789":
+            raise ValueError("Backreferences are not supported.")
+        if token.startswith("(?"):
+            raise ValueError(
+                f"Global flags like {token} are not supported (patterns are already "
+                "case-insensitive, and . matches newlines). Use a scoped flag, like "
+                "(?-i:...), instead."
+            )
+    regex = f".*?(?:{pattern})"
+    try:
+        re.compile(regex)
+    except re.error as e:
+        raise ValueError(f"Invalid regular expression: {e}")
+    return regex
+
+
+class MappingBase(models.Model):
+    """
+    An abstract base model for the mappings that are applied to the descriptions in CSV files.
+
+    A mapping's source_title either matches a description exactly, or is a
+    pattern (a prefix, a substring, or a regular expression) that is matched
+    case-insensitively. Exact mappings are always tried first, and then the
+    pattern mappings, highest priority first.
+    """
+
+    MATCH_EXACT = "exact"
+    MATCH_PREFIX = "prefix"
+    MATCH_CONTAINS = "contains"
+    MATCH_REGEX = "regex"
+    MATCH_TYPE_CHOICES = (
+        (MATCH_EXACT, "Exact"),
+        (MATCH_PREFIX, "Starts with"),
+        (MATCH_CONTAINS, "Contains"),
+        (MATCH_REGEX, "Regular expression"),
+    )
+
+    match_type = models.CharField(
+        max_length=20,
+        choices=MATCH_TYPE_CHOICES,
+        default=MATCH_EXACT,
+        help_text="How the source title is matched against descriptions",
+    )
+    priority = models.IntegerField(
+        default=0,
+        help_text="Pattern mappings with a higher priority are tried first",
+    )
+
+    class Meta:
+        abstract = True
+
+    def clean(self):
+        super().clean()
+        if self.match_type == self.MATCH_REGEX:
+            try:
+                get_mapping_regex(self.source_title)
+            except ValueError as e:
+                raise ValidationError({"source_title": str(e)})
+
 
-class TitleMapping(models.Model):
+class TitleMapping(MappingBase):
     """
     Model to map various transaction title variations to a canonical title.
 
     For example: 'Restaurant 1', 'Rest. 1', 'restaurant 1', 'RESTAURANT 1'
-    would all map to 'Restaurant 1' as the canonical title.
+    would all map to 'Restaurant 1' as the canonical title. A prefix mapping
+    of 'Restaurant 1 #' would map 'RESTAURANT 1 #123' and 'Restaurant 1 #456'.
     """
 
     source_title = models.CharField(
         max_length=255,
         unique=True,
-        help_text="The title variation that appears in CSV files",
+        help_text="The title variation that appears in CSV files (or a pattern that matches it)",
     )
     canonical_title = models.CharField(
         max_length=255,
@@ -46,7 +182,7 @@ class TitleMapping(models.Model):
         return f"'{self.source_title}' -> '{self.canonical_title}'"
 
 
-class CategoryMapping(models.Model):
+class CategoryMapping(MappingBase):
     """
     Model to automatically assign a category to transactions based on their
     source description as it appears in CSV files.
@@ -57,7 +193,7 @@ class CategoryMapping(models.Model):
     source_title = models.CharField(
         max_length=255,
         unique=True,
-        help_text="The title of a transaction",
+        help_text="The title of a transaction (or a pattern that matches it)",
     )
     category = models.ForeignKey(
         "occurrence.Category",
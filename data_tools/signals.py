@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from occurrence.models import Category
+
+from . import models, utils
+
+
+@receiver(post_save, sender=models.TitleMapping)
+@receiver(post_delete, sender=models.TitleMapping)
+@receiver(post_save, sender=models.CategoryMapping)
+@receiver(post_delete, sender=models.CategoryMapping)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_mapping_version(sender, instance, **kwargs):
+    """Make sure the compiled mappings are not reused after a mapping (or its Category) changes."""
+    utils.bump_mapping_version()
@@ -0,0 +1,326 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from data_tools.models import CSVImport
+from data_tools.utils import (
+    ImportProgress,
+    claim_next_csv_import,
+    fail_stale_csv_imports,
+    iter_columnar_parsed_rows,
+    run_csv_import,
+)
+from occurrence.models import Category, ExpenseTransaction
+
+
+class ProcessCSVImportsTestCase(TestCase):
+    """Test the 'process_csv_imports' management command."""
+
+    def setUp(self):
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        Category.objects.create(
+            name="Uncategorized Expense", type_cat=Category.TYPE_EXPENSE, slug="uncategorized"
+        )
+        csv_file_path = os.path.join(os.path.dirname(__file__), "example.csv")
+        with open(csv_file_path, "rb") as the_file:
+            self.csv_content = the_file.read()
+
+    def call_command(self, *args, **kwargs):
+        kwargs["stdout"] = self.stdout
+        kwargs["stderr"] = self.stderr
+        call_command("process_csv_imports", *args, once=True, **kwargs)
+
+    def create_csv_import(self, content, **kwargs):
+        return CSVImport.objects.create(
+            file=SimpleUploadedFile("example.csv", content, content_type="text/csv"), **kwargs
+        )
+
+    def test_nothing_queued(self):
+        """With no queued imports, the command exits without doing anything."""
+        completed_import = self.create_csv_import(
+            self.csv_content, status=CSVImport.STATUS_COMPLETED
+        )
+
+        self.call_command()
+
+        completed_import.refresh_from_db()
+        self.assertEqual(completed_import.status, CSVImport.STATUS_COMPLETED)
+        self.assertEqual(completed_import.rows_created, 0)
+        self.assertEqual(self.stdout.getvalue(), "")
+
+    def test_processes_all_queued_imports(self):
+        """Every queued import is processed, and its status and progress are recorded."""
+        first_import = self.create_csv_import(self.csv_content)
+        second_import = self.create_csv_import(self.csv_content)
+
+        self.call_command()
+
+        first_import.refresh_from_db()
+        self.assertEqual(first_import.status, CSVImport.STATUS_COMPLETED)
+        self.assertEqual(first_import.rows_total, 3)
+        self.assertEqual(first_import.rows_created, 3)
+        self.assertEqual(first_import.progress_percent, 100)
+        self.assertIsNotNone(first_import.started_at)
+        self.assertIsNotNone(first_import.finished_at)
+        self.assertEqual(first_import.errors, "")
+        # The second import (of the same file) only found duplicates
+        second_import.refresh_from_db()
+        self.assertEqual(second_import.status, CSVImport.STATUS_COMPLETED)
+        self.assertEqual(second_import.rows_created, 0)
+        self.assertEqual(second_import.rows_skipped, 3)
+        self.assertEqual(ExpenseTransaction.objects.count(), 2)
+        self.assertIn("3 transaction(s) created", self.stdout.getvalue())
+
+    def test_unreadable_file_fails(self):
+        """An import whose file can't be ingested is marked as failed, with the error."""
+        csv_import = self.create_csv_import(b"Not,A,Bank,Export\n1,2,3,4\n")
+
+        self.call_command()
+
+        csv_import.refresh_from_db()
+        self.assertEqual(csv_import.status, CSVImport.STATUS_FAILED)
+        self.assertEqual(
+            csv_import.errors,
+            "Error processing file: The columns of the file don't match any of the CSV dialects.",
+        )
+        self.assertIn("Failed", self.stderr.getvalue())
+
+    def test_claim_skips_imports_that_are_not_queued(self):
+        """Only queued imports are claimed, oldest first."""
+        self.create_csv_import(self.csv_content, status=CSVImport.STATUS_RUNNING)
+        queued_import = self.create_csv_import(self.csv_content)
+
+        claimed_import = claim_next_csv_import()
+
+        self.assertEqual(claimed_import, queued_import)
+        self.assertEqual(claimed_import.status, CSVImport.STATUS_RUNNING)
+        self.assertIsNone(claim_next_csv_import())
+
+    def test_stale_imports_fail(self):
+        """Running imports whose workers have stopped recording progress are marked as failed."""
+        now = timezone.now()
+        stale_imports = [
+            self.create_csv_import(
+                self.csv_content,
+                status=CSVImport.STATUS_RUNNING,
+                started_at=now - timedelta(hours=3),
+                progress_at=now - timedelta(hours=2),
+            ),
+            self.create_csv_import(
+                self.csv_content,
+                status=CSVImport.STATUS_RUNNING,
+                started_at=now - timedelta(hours=2),
+            ),
+        ]
+        active_imports = [
+            self.create_csv_import(
+                self.csv_content,
+                status=CSVImport.STATUS_RUNNING,
+                started_at=now - timedelta(hours=3),
+                progress_at=now - timedelta(minutes=1),
+            ),
+            self.create_csv_import(
+                self.csv_content, status=CSVImport.STATUS_RUNNING, started_at=now
+            ),
+            self.create_csv_import(
+                self.csv_content,
+                status=CSVImport.STATUS_COMPLETED,
+                started_at=now - timedelta(hours=3),
+            ),
+        ]
+
+        self.call_command()
+
+        self.assertIn("Marked 2 interrupted import(s) as failed.", self.stderr.getvalue())
+        for csv_import in stale_imports:
+            csv_import.refresh_from_db()
+            self.assertEqual(csv_import.status, CSVImport.STATUS_FAILED)
+            self.assertIn("interrupted", csv_import.errors)
+            self.assertIsNotNone(csv_import.finished_at)
+        for csv_import in active_imports:
+            old_status = csv_import.status
+            csv_import.refresh_from_db()
+            self.assertEqual(csv_import.status, old_status)
+        self.assertEqual(fail_stale_csv_imports(timedelta(seconds=30)), 1)
+
+
+class ImportProgressTestCase(TransactionTestCase):
+    """The progress of an atomic import is visible to other connections while it runs."""
+
+    def test_progress_is_committed(self):
+        Category.objects.create(
+            name="Uncategorized Expense", type_cat=Category.TYPE_EXPENSE, slug="uncategorized"
+        )
+        csv_import = CSVImport.objects.create(
+            file=SimpleUploadedFile(
+                "example.csv",
+                ImportCSVDirTestCase.header
+                + b"".join(
+                    f"2025-07-{day:02},2025-07-01,Store {day},Food,Sale,1.00,\n".encode()
+                    for day in range(1, 4)
+                ),
+                content_type="text/csv",
+            )
+        )
+        self.addCleanup(csv_import.file.delete, save=False)
+        visible_progress = []
+        original_save = ImportProgress.save
+
+        def save_and_check(progress, *args):
+            original_save(progress, *args)
+            # Read the progress from another connection, like the status page would
+            other_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                with other_connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT rows_created, rows_skipped FROM data_tools_csvimport WHERE id = %s",
+                        [csv_import.pk],
+                    )
+                    visible_progress.append(cursor.fetchone())
+            finally:
+                other_connection.close()
+
+        with mock.patch.object(ImportProgress, "save", save_and_check):
+            # As the process_csv_imports worker does, but with a batch for each row
+            run_csv_import(claim_next_csv_import(), batch_size=1)
+
+        self.assertEqual(visible_progress, [(1, 0), (2, 0), (3, 0)])
+        csv_import.refresh_from_db()
+        self.assertEqual(csv_import.status, CSVImport.STATUS_COMPLETED)
+        self.assertEqual(csv_import.rows_created, 3)
+        self.assertIsNotNone(csv_import.progress_at)
+
+
+class ImportCSVDirTestCase(TestCase):
+    """Test the 'import_csv_dir' management command."""
+
+    header = b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+
+    def setUp(self):
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        Category.objects.create(
+            name="Uncategorized Expense", type_cat=Category.TYPE_EXPENSE, slug="uncategorized"
+        )
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = Path(temp_dir.name)
+
+    def call_command(self, *args, **kwargs):
+        kwargs["stdout"] = self.stdout
+        kwargs["stderr"] = self.stderr
+        call_command("import_csv_dir", *args, **kwargs)
+
+    def write_file(self, name, rows):
+        (self.directory / name).write_bytes(self.header + b"".join(rows))
+
+    def test_imports_every_file_without_duplicates(self):
+        """Each file gets its own CSVImport, and overlapping rows are only created once."""
+        self.write_file(
+            "bank-a.csv",
+            [
+                b"2025-07-01,2025-07-01,Store 1,Food,Sale,1.00,\n",
+                b"2025-07-02,2025-07-02,Store 2,Food,Sale,2.00,\n",
+            ],
+        )
+        self.write_file(
+            "bank-b.csv",
+            [
+                b"2025-07-02,2025-07-02,Store 2,Food,Sale,2.00,\n",
+                b"July 3 2025,2025-07-03,Store 3,Food,Sale,3.00,\n",
+                b"2025-07-04,2025-07-04,Store 4,Food,Sale,4.00,\n",
+            ],
+        )
+        self.write_file("notes.txt", [b"2025-07-05,2025-07-05,Store 5,Food,Sale,5.00,\n"])
+
+        self.call_command(str(self.directory), workers=1)
+
+        self.assertEqual(
+            sorted(ExpenseTransaction.objects.values_list("title", flat=True)),
+            ["Store 1", "Store 2", "Store 4"],
+        )
+        csv_imports = {
+            Path(csv_import.file.name).stem.split("_")[0]: csv_import
+            for csv_import in CSVImport.objects.all()
+        }
+        self.assertEqual(set(csv_imports), {"bank-a", "bank-b"})
+        self.assertEqual(csv_imports["bank-a"].status, CSVImport.STATUS_COMPLETED)
+        self.assertEqual(csv_imports["bank-a"].rows_created, 2)
+        # The invalid row was skipped, and the rest of the file was still imported
+        self.assertEqual(csv_imports["bank-b"].status, CSVImport.STATUS_FAILED)
+        self.assertEqual(csv_imports["bank-b"].rows_created, 1)
+        self.assertEqual(csv_imports["bank-b"].rows_skipped, 2)
+        self.assertIn("3 transaction(s) created in total.", self.stdout.getvalue())
+        self.assertIn("bank-b.csv: 1 transaction(s) created, with errors", self.stderr.getvalue())
+
+    def test_columnar(self):
+        """With --columnar, the files are parsed a column at a time."""
+        self.write_file(
+            "bank-a.csv",
+            [
+                b"07/01/2025,07/01/2025,Store 1,Food,Sale,1.00,\n",
+                b"07/02/2025,07/02/2025,Store 2,Food,Sale,2.00,\n",
+            ],
+        )
+
+        with mock.patch(
+            "data_tools.utils.iter_columnar_parsed_rows", wraps=iter_columnar_parsed_rows
+        ) as mock_parse:
+            self.call_command(str(self.directory), workers=1, columnar=True)
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(
+            sorted(ExpenseTransaction.objects.values_list("title", flat=True)),
+            ["Store 1", "Store 2"],
+        )
+
+    def test_directory_not_found(self):
+        with self.assertRaises(CommandError) as error:
+            self.call_command(str(self.directory / "missing"))
+        self.assertEqual(
+            str(error.exception), 'Directory not found: "{}"'.format(self.directory / "missing")
+        )
+
+    def test_no_matching_files(self):
+        with self.assertRaises(CommandError):
+            self.call_command(str(self.directory))
+        self.assertFalse(CSVImport.objects.exists())
+
+
+class ImportCSVDirParallelTestCase(TransactionTestCase):
+    """Test the 'import_csv_dir' management command with a pool of worker processes."""
+
+    def test_parallel_import(self):
+        Category.objects.create(
+            name="Uncategorized Expense", type_cat=Category.TYPE_EXPENSE, slug="uncategorized"
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Every file contains the same rows, so they all compete to create them
+            for index in range(4):
+                (Path(temp_dir) / f"bank-{index}.csv").write_bytes(
+                    ImportCSVDirTestCase.header
+                    + b"".join(
+                        f"2025-07-{day:02},2025-07-01,Store {day},Food,Sale,1.00,\n".encode()
+                        for day in range(1, 21)
+                    )
+                )
+
+            call_command("import_csv_dir", temp_dir, workers=4, stdout=StringIO())
+
+        self.assertEqual(ExpenseTransaction.objects.count(), 20)
+        self.assertEqual(
+            CSVImport.objects.filter(status=CSVImport.STATUS_COMPLETED).count(),
+            4,
+        )
+        self.assertEqual(sum(CSVImport.objects.values_list("rows_created", flat=True)), 20)
@@ -1,6 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-from data_tools.models import CSVImport
+from data_tools.models import CSVImport, TitleMapping
 
 
 class CSVImportModelTest(TestCase):
@@ -12,3 +13,33 @@ class CSVImportModelTest(TestCase):
     def test_str_method(self):
         expected_str = f"CSV Import on {self.csv_import.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
         self.assertEqual(str(self.csv_import), expected_str)
+
+
+class TitleMappingModelTest(TestCase):
+    def test_clean_regex(self):
+        """The source_title of a regex mapping must be a valid regular expression."""
+        mapping = TitleMapping(
+            source_title="STORE #[0-9+",
+            canonical_title="Store",
+            match_type=TitleMapping.MATCH_REGEX,
+        )
+        with self.assertRaises(ValidationError) as context:
+            mapping.full_clean()
+        self.assertIn("source_title", context.exception.message_dict)
+
+        # Patterns that can't be combined with the patterns of other mappings
+        for source_title in [r"(?P<store>STORE) #\d+", r"(STORE) \1", "(?i)store"]:
+            with self.subTest(source_title=source_title):
+                mapping.source_title = source_title
+                with self.assertRaises(ValidationError) as context:
+                    mapping.full_clean()
+                self.assertIn("source_title", context.exception.message_dict)
+
+        for source_title in ["STORE #[0-9]+", r"\(?P<store", "[(?i)]", "(?-i:STORE)"]:
+            with self.subTest(source_title=source_title):
+                mapping.source_title = source_title
+                mapping.full_clean()
+        # Other types of mappings are not regular expressions
+        mapping.source_title = "STORE #[0-9+"
+        mapping.match_type = TitleMapping.MATCH_PREFIX
+        mapping.full_clean()
@@ -1,15 +1,47 @@
 import os
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
+from django.core.cache import caches
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from data_tools.models import CategoryMapping, CSVImport, TitleMapping
-from data_tools.utils import ingest_csv
+from data_tools.utils import (
+    CSV_DIALECTS,
+    SIGN_NEGATIVE_EXPENSES,
+    TYPE_EARNING,
+    TYPE_EXPENSE,
+    CategoryResolver,
+    CSVDialect,
+    MappingTable,
+    clear_mapping_cache,
+    detect_csv_dialect,
+    detect_date_format,
+    get_amount_cents,
+    get_cached_mappings,
+    get_csv_dialect,
+    get_duplicate_key,
+    ingest_csv,
+    iter_columnar_parsed_rows,
+    iter_parsed_rows,
+    load_mappings,
+    parse_amount,
+    parse_date,
+    parse_date_column,
+    register_csv_dialect,
+    remove_duplicate_transactions,
+)
 from occurrence.models import (
     Category,
     EarningTransaction,
     ExpenseTransaction,
     Month,
+    MonthlyCategoryTotal,
+    clear_month_cache,
 )
 
 
@@ -329,3 +361,834 @@ class IngestCSVTest(TestCase):
         months = Month.objects.filter(year=2025, month=7)
         self.assertEqual(months.count(), 1)
         self.assertEqual(months.get().pk, existing_month.pk)
+
+
+class IngestCSVStreamingTest(TestCase):
+    """Tests for ingest_csv() batching, and its non-atomic (streaming) mode."""
+
+    csv_content = (
+        b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+        b"2025-07-01,2025-07-01,Store 1,Food & Drink,Sale,1.00,\n"
+        b"July 2 2025,July 3 2025,Store 2,Food & Drink,Sale,2.00,\n"
+        b"2025-07-03,2025-07-03,Store 3,Food & Drink,Sale,3.00,\n"
+        b"2025-07-04,2025-07-04,Store 4,Food & Drink,Sale,4.00,\n"
+        b"2025-08-05,2025-08-05,Company A,Paycheck,Income,-5.00,\n"
+    )
+
+    def setUp(self):
+        self.category_food_and_drink = Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        Category.objects.create(
+            name="Uncategorized Earning", type_cat=Category.TYPE_EARNING, slug="uncategorized"
+        )
+        self.csv_import = CSVImport.objects.create(
+            file=SimpleUploadedFile("mixed.csv", self.csv_content, content_type="text/csv")
+        )
+
+    def test_atomic_mode_rolls_back_all_batches(self):
+        """By default, one invalid row means nothing is created, even across batches."""
+        count_transactions_created, errors = ingest_csv(self.csv_import, batch_size=1)
+
+        self.assertEqual(count_transactions_created, 0)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(ExpenseTransaction.objects.count(), 0)
+        self.assertEqual(EarningTransaction.objects.count(), 0)
+        # The Month created for the first (flushed) batch was rolled back too
+        self.assertEqual(Month.objects.count(), 0)
+        self.csv_import.refresh_from_db()
+        self.assertEqual(self.csv_import.rows_created, 0)
+        self.assertEqual(self.csv_import.rows_skipped, 1)
+
+    def test_streaming_mode_keeps_valid_rows(self):
+        """With atomic=False, invalid rows are skipped and the valid rows are kept."""
+        count_transactions_created, errors = ingest_csv(self.csv_import, batch_size=2, atomic=False)
+
+        self.assertEqual(count_transactions_created, 4)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("Invalid date format for row:"))
+        self.assertEqual(
+            sorted(ExpenseTransaction.objects.values_list("title", flat=True)),
+            ["Store 1", "Store 3", "Store 4"],
+        )
+        self.assertEqual(EarningTransaction.objects.get().title, "Company A")
+        self.csv_import.refresh_from_db()
+        self.assertEqual(self.csv_import.rows_created, 4)
+        self.assertEqual(self.csv_import.rows_skipped, 1)
+
+    def test_streaming_mode_failed_refresh(self):
+        """With atomic=False, a failed refresh of the totals isn't reported as an unsaved batch."""
+
+        def on_commit(func, using=None, robust=False):
+            # Outside of a transaction (like in production), the refresh runs right away
+            func()
+
+        with (
+            mock.patch("django.db.transaction.on_commit", on_commit),
+            mock.patch(
+                "data_tools.utils.refresh_monthly_category_totals",
+                side_effect=DatabaseError("deadlock detected"),
+            ),
+        ):
+            count_transactions_created, errors = ingest_csv(
+                self.csv_import, batch_size=2, atomic=False
+            )
+
+        self.assertEqual(count_transactions_created, 4)
+        self.assertTrue(errors[0].startswith("Invalid date format for row:"))
+        self.assertTrue(errors[1].startswith("Could not refresh the totals of 1 Month(s):"))
+        self.assertFalse(any(error.startswith("Could not save") for error in errors))
+        self.assertEqual(ExpenseTransaction.objects.count(), 3)
+        self.csv_import.refresh_from_db()
+        self.assertEqual(self.csv_import.rows_created, 4)
+        self.assertEqual(self.csv_import.rows_skipped, 1)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        """Categories, Months and duplicates are resolved per batch, not per row."""
+        csv_import = CSVImport.objects.create(
+            file=SimpleUploadedFile(
+                "big.csv",
+                b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+                + b"".join(
+                    f"2025-07-{day:02},2025-07-01,Store {day},Food & Drink,Sale,{day}.00,\n".encode()
+                    for day in range(1, 29)
+                ),
+                content_type="text/csv",
+            )
+        )
+        with CaptureQueriesContext(connection) as small_file_queries:
+            ingest_csv(self.csv_import, atomic=False)
+        ExpenseTransaction.objects.all().delete()
+        EarningTransaction.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as big_file_queries:
+            ingest_csv(csv_import, atomic=False)
+
+        self.assertEqual(ExpenseTransaction.objects.count(), 28)
+        self.assertLessEqual(len(big_file_queries), len(small_file_queries))
+
+    def test_monthly_category_totals_refreshed_on_commit(self):
+        """Once the import is committed, the MonthlyCategoryTotals include its transactions."""
+        # Committing caches the Months, which would outlive the rolled-back test transaction
+        self.addCleanup(clear_month_cache)
+        for atomic in (True, False):
+            with self.subTest(atomic=atomic):
+                ExpenseTransaction.objects.all().delete()
+                EarningTransaction.objects.all().delete()
+                csv_import = CSVImport.objects.create(
+                    file=SimpleUploadedFile(
+                        "valid.csv",
+                        self.csv_content.replace(b"July 2 2025", b"2025-07-02"),
+                        content_type="text/csv",
+                    )
+                )
+                with self.captureOnCommitCallbacks(execute=True):
+                    ingest_csv(csv_import, batch_size=2, atomic=atomic)
+
+                totals = MonthlyCategoryTotal.objects.filter(
+                    category=self.category_food_and_drink
+                ).select_related("month")
+                self.assertEqual(
+                    [(t.month.month, t.amount, t.transaction_count) for t in totals],
+                    [(7, Decimal("10.00"), 4)],
+                )
+
+    def test_batches_are_flushed_as_they_fill(self):
+        """Each full batch is written (with the CSVImport's progress) before the next is read."""
+        progress = []
+        original_save = CSVImport.save
+
+        def record_progress(csv_import, *args, **kwargs):
+            progress.append((csv_import.rows_created, csv_import.rows_skipped))
+            return original_save(csv_import, *args, **kwargs)
+
+        with mock.patch.object(CSVImport, "save", record_progress):
+            ingest_csv(self.csv_import, batch_size=2, atomic=False)
+
+        # The detected dialect, two full batches, the final partial batch, then the
+        # final counts
+        self.assertEqual(progress, [(0, 0), (2, 1), (4, 1), (4, 1)])
+
+
+class RemoveDuplicateTransactionsTest(TestCase):
+    """Tests for the set-based duplicate detection used by ingest_csv()."""
+
+    def setUp(self):
+        self.category = Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        self.existing = ExpenseTransaction.objects.create(
+            title="Store 1", amount=Decimal("1.10"), date=date(2025, 7, 1), category=self.category
+        )
+
+    def build(self, title, amount, transaction_date):
+        return ExpenseTransaction(
+            title=title, amount=amount, date=transaction_date, category=self.category
+        )
+
+    def test_removes_existing_and_in_batch_duplicates(self):
+        transactions = [
+            # The same as self.existing, but with a float amount
+            self.build("Store 1", 1.1, date(2025, 7, 1)),
+            self.build("Store 1", 1.1, date(2025, 7, 2)),
+            self.build("Store 2", 2.5, date(2025, 7, 3)),
+            self.build("Store 2", 2.5, date(2025, 7, 3)),
+        ]
+
+        # A single query, no matter how many transactions there are
+        with self.assertNumQueries(1):
+            new_transactions = remove_duplicate_transactions(ExpenseTransaction, transactions)
+
+        self.assertEqual(new_transactions, [transactions[1], transactions[2]])
+
+    def test_no_transactions(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(remove_duplicate_transactions(ExpenseTransaction, []), [])
+
+    def test_ingest_csv_skips_duplicates_within_file(self):
+        """Repeated rows in one file are only created once, even across batches."""
+        csv_content = (
+            b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+            b"2025-07-05,2025-07-05,Store 3,Food & Drink,Sale,3.00,\n"
+            b"2025-07-05,2025-07-05,Store 3,Food & Drink,Sale,3.00,\n"
+            b"2025-07-01,2025-07-01,Store 1,Food & Drink,Sale,1.10,\n"
+            b"2025-07-05,2025-07-05,Store 3,Food & Drink,Sale,3.00,\n"
+        )
+        csv_import = CSVImport.objects.create(
+            file=SimpleUploadedFile("dupes.csv", csv_content, content_type="text/csv")
+        )
+
+        count_transactions_created, errors = ingest_csv(csv_import, batch_size=2)
+
+        self.assertEqual(count_transactions_created, 1)
+        self.assertEqual(errors, [])
+        self.assertEqual(ExpenseTransaction.objects.filter(title="Store 3").count(), 1)
+        csv_import.refresh_from_db()
+        self.assertEqual(csv_import.rows_created, 1)
+        self.assertEqual(csv_import.rows_skipped, 3)
+
+
+class CategoryResolverTest(TestCase):
+    """Tests for the CategoryResolver used by ingest_csv()."""
+
+    def setUp(self):
+        self.category_food = Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        self.category_uncategorized_expense = Category.objects.create(
+            name="Uncategorized Expense", type_cat=Category.TYPE_EXPENSE, slug="uncat-expense"
+        )
+        self.category_uncategorized_earning = Category.objects.create(
+            name="Uncategorized Earning", type_cat=Category.TYPE_EARNING, slug="uncat-earning"
+        )
+
+    def test_resolves_without_queries(self):
+        """Categories are loaded once; resolving names does not query the database."""
+        with self.assertNumQueries(1):
+            resolver = CategoryResolver()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve("food & DRINK", TYPE_EXPENSE), self.category_food)
+            self.assertEqual(
+                resolver.resolve("Something", TYPE_EXPENSE),
+                self.category_uncategorized_expense,
+            )
+            self.assertEqual(
+                resolver.resolve("Something", TYPE_EARNING),
+                self.category_uncategorized_earning,
+            )
+            # Memoized lookups give the same results
+            self.assertEqual(resolver.resolve("food & DRINK", TYPE_EXPENSE), self.category_food)
+
+    def test_single_uncategorized_category(self):
+        """With only one "Uncategorized" Category, it is the fallback for both types."""
+        self.category_uncategorized_earning.delete()
+
+        resolver = CategoryResolver()
+
+        self.assertEqual(
+            resolver.resolve("Something", TYPE_EARNING), self.category_uncategorized_expense
+        )
+        self.assertEqual(
+            resolver.resolve("Something", TYPE_EXPENSE), self.category_uncategorized_expense
+        )
+
+    def test_no_uncategorized_category(self):
+        """Without an "Uncategorized" Category, unknown names resolve to None."""
+        Category.objects.filter(name__startswith="Uncategorized").delete()
+
+        resolver = CategoryResolver()
+
+        self.assertIsNone(resolver.resolve("Something", TYPE_EXPENSE))
+        self.assertEqual(resolver.resolve("Food & Drink", TYPE_EXPENSE), self.category_food)
+
+
+class ColumnarParsingTest(TestCase):
+    """Tests for the columnar parse mode of ingest_csv()."""
+
+    csv_content = (
+        b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+        b"07/01/2025,07/01/2025,Store 1,Food & Drink,Sale,1.00,\n"
+        b"\n"
+        b"2025-07-02,2025-07-02,Store 2,Food & Drink,Sale,2.50,\n"
+        b"July 3 2025,July 3 2025,Store 3,Food & Drink,Sale,3.00,\n"
+        b"07/04/2025,07/04/2025,Store 4,Food & Drink,Sale,4.00\n"
+        b"08/05/2025,08/05/2025,Company A,Paycheck,Income,-5.00,\n"
+    )
+
+    def setUp(self):
+        Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        Category.objects.create(
+            name="Uncategorized Earning", type_cat=Category.TYPE_EARNING, slug="uncategorized"
+        )
+
+    def create_csv_import(self, content=None):
+        return CSVImport.objects.create(
+            file=SimpleUploadedFile(
+                "columnar.csv", content or self.csv_content, content_type="text/csv"
+            )
+        )
+
+    def test_same_rows_as_row_mode(self):
+        """The columnar parser gives the same values as parsing row by row."""
+        csv_import = self.create_csv_import()
+        for chunk_size in [1, 2, 1000]:
+            with self.subTest(chunk_size=chunk_size):
+                columnar_rows = list(iter_columnar_parsed_rows(csv_import, chunk_size=chunk_size))
+                rows = list(iter_parsed_rows(csv_import))
+                self.assertEqual(
+                    [row[:5] for row in columnar_rows],
+                    [row[:5] for row in rows],
+                )
+                # The original row is only kept for the invalid date
+                self.assertEqual(
+                    [row.row for row in columnar_rows if row.row is not None],
+                    [rows[2].row],
+                )
+
+    def test_ingest_csv(self):
+        """Importing in columnar mode creates the same transactions as the default mode."""
+        results = {}
+        for columnar in [False, True]:
+            ExpenseTransaction.objects.all().delete()
+            EarningTransaction.objects.all().delete()
+            count_transactions_created, errors = ingest_csv(
+                self.create_csv_import(), atomic=False, columnar=columnar
+            )
+            results[columnar] = (
+                count_transactions_created,
+                errors,
+                sorted(ExpenseTransaction.objects.values_list("title", "date", "amount")),
+                sorted(EarningTransaction.objects.values_list("title", "date", "amount")),
+            )
+
+        self.assertEqual(results[True], results[False])
+        self.assertEqual(results[True][0], 4)
+        self.assertEqual(len(results[True][1]), 1)
+
+    def test_row_mode_detects_date_format(self):
+        """Row by row, the date format is detected once, from the first date in a known format."""
+        csv_import = self.create_csv_import(
+            b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+            b"July 1 2025,July 1 2025,Store 1,Food & Drink,Sale,1.00,\n"
+            + b"".join(
+                f"07/{day:02}/2025,07/{day:02}/2025,Store,Food & Drink,Sale,1.00,\n".encode()
+                for day in range(2, 12)
+            )
+        )
+
+        with mock.patch("data_tools.utils.parse_date", wraps=parse_date) as mock_parse_date:
+            rows = list(iter_parsed_rows(csv_import))
+
+        # Only the date in an unknown format is parsed by trying every format
+        mock_parse_date.assert_called_once_with("July 1 2025")
+        self.assertIsNone(rows[0].transaction_date)
+        self.assertEqual(
+            [row.transaction_date for row in rows[1:]],
+            [date(2025, 7, day) for day in range(2, 12)],
+        )
+
+    def test_detect_date_format(self):
+        """The date format is detected from the first non-empty date."""
+        test_data = [
+            (["", "2025-07-01", "07/02/2025"], "%Y-%m-%d"),
+            (["07/02/2025", "2025-07-01"], "%m/%d/%Y"),
+            (["July 2 2025"], None),
+            ([], None),
+        ]
+        for date_strings, expected_format in test_data:
+            with self.subTest(date_strings=date_strings):
+                self.assertEqual(detect_date_format(date_strings), expected_format)
+
+    def test_parse_date_column(self):
+        """Dates in another format fall back to parse_date(), and invalid dates are None."""
+        self.assertEqual(
+            parse_date_column(
+                ["07/01/2025", "2025-07-02", "7/3/2025", "13/01/2025", "July 2 2025", None],
+                "%m/%d/%Y",
+            ),
+            [date(2025, 7, 1), date(2025, 7, 2), date(2025, 7, 3), None, None, None],
+        )
+        self.assertEqual(
+            parse_date_column(["20250701", "2025-07-01"], "%Y-%m-%d"),
+            [None, date(2025, 7, 1)],
+        )
+
+
+class AmountParsingTest(TestCase):
+    """Tests for the exact parsing of the amounts of imported rows."""
+
+    def test_parse_amount(self):
+        test_data = [
+            ("12.5", Decimal("12.50")),
+            ("-0.10", Decimal("-0.10")),
+            ("1.005", Decimal("1.01")),
+            ("-1.005", Decimal("-1.01")),
+            ("  7 ", Decimal("7.00")),
+            ("$12.50", Decimal("12.50")),
+            ("-$12.50", Decimal("-12.50")),
+            ("$-12.50", Decimal("-12.50")),
+            ("€3", Decimal("3.00")),
+            ("1,234.56", Decimal("1234.56")),
+            ("$1,234,567", Decimal("1234567.00")),
+            ("(12.50)", Decimal("-12.50")),
+            ("($1,234.56)", Decimal("-1234.56")),
+            (".5", Decimal("0.50")),
+            ("+3", Decimal("3.00")),
+            ("-99,999,999.99", Decimal("-99999999.99")),
+        ]
+        for amount_string, expected_amount in test_data:
+            with self.subTest(amount_string=amount_string):
+                amount = parse_amount(amount_string)
+                self.assertEqual(amount, expected_amount)
+                self.assertEqual(amount.as_tuple().exponent, -2)
+
+    def test_parse_amount_invalid(self):
+        for amount_string in [
+            "",
+            "abc",
+            "NaN",
+            "Infinity",
+            "1,23.45",
+            "12,34",
+            "1.2.3",
+            "$",
+            "()",
+            "(12.50",
+            "12 50",
+            "1e5",
+            "1E-2",
+            "1_000",
+            "$1_000",
+            "(-12.50)",
+            "(+12.50)",
+            "($-12.50)",
+            "--5",
+            "-$-5",
+            "$$5",
+            "100000000",
+            "-99999999.995",
+            "123456789012.00",
+            None,
+        ]:
+            with self.subTest(amount_string=amount_string):
+                with self.assertRaises(ValueError):
+                    parse_amount(amount_string)
+
+    def test_get_amount_cents(self):
+        test_data = [
+            (Decimal("1.10"), 110),
+            (Decimal("1.1"), 110),
+            (1.1, 110),
+            (-2.5, -250),
+            (3, 300),
+            (Decimal("0.005"), 1),
+        ]
+        for amount, expected_cents in test_data:
+            with self.subTest(amount=amount):
+                cents = get_amount_cents(amount)
+                self.assertEqual(cents, expected_cents)
+                self.assertIs(type(cents), int)
+        self.assertEqual(
+            get_duplicate_key("Store 1", 0.1 + 0.2, date(2025, 7, 1)),
+            get_duplicate_key("Store 1", Decimal("0.30"), date(2025, 7, 1)),
+        )
+
+    def test_ingest_csv(self):
+        """Formatted amounts are imported exactly, and invalid or too large amounts are skipped."""
+        Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        csv_content = (
+            b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+            b'2025-07-01,2025-07-01,Store 1,Food & Drink,Sale,"$1,234.56",\n'
+            b"2025-07-02,2025-07-02,Store 2,Food & Drink,Sale,(0.10),\n"
+            b"2025-07-03,2025-07-03,Store 3,Food & Drink,Sale,abc,\n"
+            b"2025-07-04,2025-07-04,Store 4,Food & Drink,Sale,123456789012.00,\n"
+            b"2025-07-05,2025-07-05,Store 5,Food & Drink,Sale,5.00,\n"
+        )
+        for columnar in [False, True]:
+            with self.subTest(columnar=columnar):
+                ExpenseTransaction.objects.all().delete()
+                csv_import = CSVImport.objects.create(
+                    file=SimpleUploadedFile("amounts.csv", csv_content, content_type="text/csv")
+                )
+
+                count_transactions_created, errors = ingest_csv(
+                    csv_import, atomic=False, columnar=columnar
+                )
+
+                self.assertEqual(count_transactions_created, 3)
+                self.assertEqual(len(errors), 2)
+                self.assertTrue(errors[0].startswith("Invalid amount for row: "))
+                self.assertIn("Store 3", errors[0])
+                self.assertTrue(errors[1].startswith("Invalid amount for row: "))
+                self.assertIn("Store 4", errors[1])
+                self.assertEqual(
+                    sorted(ExpenseTransaction.objects.values_list("title", "amount")),
+                    [
+                        ("Store 1", Decimal("1234.56")),
+                        ("Store 2", Decimal("-0.10")),
+                        ("Store 5", Decimal("5.00")),
+                    ],
+                )
+
+
+class CSVDialectTest(TestCase):
+    """Tests for the registry of bank CSV dialects."""
+
+    def setUp(self):
+        Category.objects.create(
+            name="Uncategorized Expense", type_cat=Category.TYPE_EXPENSE, slug="uncategorized"
+        )
+        Category.objects.create(
+            name="Uncategorized Earning", type_cat=Category.TYPE_EARNING, slug="uncategorized-2"
+        )
+
+    def create_csv_import(self, content, **kwargs):
+        return CSVImport.objects.create(
+            file=SimpleUploadedFile("dialect.csv", content, content_type="text/csv"), **kwargs
+        )
+
+    def test_detect_csv_dialect(self):
+        test_data = [
+            (b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n", "chase"),
+            # The header is matched loosely, and a byte order mark is ignored
+            (b"\xef\xbb\xbfdate, description ,AMOUNT\n2025-07-01,Store,1", "bank"),
+            # Amex files also have the columns of the generic bank dialect
+            (b"Date,Description,Card Member,Account #,Amount\n", "amex"),
+            (b"Not,A,Bank,Export\n", None),
+            (b"", None),
+            (b"\x00\xff\xfe", None),
+        ]
+        for sample, expected_name in test_data:
+            with self.subTest(sample=sample):
+                dialect = detect_csv_dialect(sample)
+                self.assertEqual(dialect and dialect.name, expected_name)
+
+    def test_invalid_dialect(self):
+        with self.assertRaises(ValueError):
+            CSVDialect("invalid", "Invalid", columns={"date": "Date", "amount": "Amount"})
+        with self.assertRaises(ValueError):
+            CSVDialect(
+                "invalid",
+                "Invalid",
+                columns={"date": "Date", "description": "Description", "amount": "Amount"},
+            )
+        with self.assertRaises(ValueError):
+            get_csv_dialect("invalid")
+
+    def test_sign_conventions(self):
+        """The dialects read the rows in the same way, row by row or a column at a time."""
+        test_data = [
+            (
+                "chase",
+                b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+                b"07/01/2025,07/01/2025,Store 1,Food & Drink,Sale,9.02,\n"
+                b"07/02/2025,07/02/2025,Company A,Paycheck,income,-20.00,\n",
+                [
+                    (date(2025, 7, 1), Decimal("9.02"), TYPE_EXPENSE, "Food & Drink", "Store 1"),
+                    (date(2025, 7, 2), Decimal("-20.00"), TYPE_EARNING, "Paycheck", "Company A"),
+                ],
+            ),
+            (
+                "amex",
+                b"Date,Description,Card Member,Account #,Amount\n"
+                b"07/01/2025,Store 1,A Member,-12345,9.02\n"
+                b"07/02/2025,Refund,A Member,-12345,-20.00\n",
+                [
+                    (date(2025, 7, 1), Decimal("9.02"), TYPE_EXPENSE, "", "Store 1"),
+                    (date(2025, 7, 2), Decimal("20.00"), TYPE_EARNING, "", "Refund"),
+                ],
+            ),
+            (
+                "bank",
+                b"Date,Description,Amount\n2025-07-01,Store 1,-9.02\n2025-07-02,Company A,20\n",
+                [
+                    (date(2025, 7, 1), Decimal("9.02"), TYPE_EXPENSE, "", "Store 1"),
+                    (date(2025, 7, 2), Decimal("20.00"), TYPE_EARNING, "", "Company A"),
+                ],
+            ),
+        ]
+        for name, content, expected_rows in test_data:
+            with self.subTest(name=name):
+                csv_import = self.create_csv_import(content)
+                rows = list(iter_parsed_rows(csv_import))
+                # The detected dialect was saved
+                csv_import.refresh_from_db()
+                self.assertEqual(csv_import.dialect, name)
+                self.assertEqual([row[:5] for row in rows], expected_rows)
+                self.assertEqual(
+                    [row[:5] for row in iter_columnar_parsed_rows(csv_import)], expected_rows
+                )
+
+    def test_registered_dialect(self):
+        """A registered dialect's encoding, delimiter and date format are used."""
+        dialect = register_csv_dialect(
+            CSVDialect(
+                "test",
+                "Test bank",
+                columns={"date": "Datum", "description": "Beschreibung", "amount": "Betrag"},
+                date_format="%d.%m.%Y",
+                sign_convention=SIGN_NEGATIVE_EXPENSES,
+                encoding="latin-1",
+                delimiter=";",
+            )
+        )
+        self.addCleanup(CSV_DIALECTS.pop, "test")
+        content = "Datum;Beschreibung;Betrag\n03.07.2025;Café;-4.50\n".encode("latin-1")
+        self.assertEqual(detect_csv_dialect(content), dialect)
+
+        for columnar in [False, True]:
+            with self.subTest(columnar=columnar):
+                ExpenseTransaction.objects.all().delete()
+                count_transactions_created, errors = ingest_csv(
+                    self.create_csv_import(content, dialect="test"), columnar=columnar
+                )
+
+                self.assertEqual((count_transactions_created, errors), (1, []))
+                self.assertEqual(
+                    list(ExpenseTransaction.objects.values_list("title", "amount", "date")),
+                    [("Café", Decimal("4.50"), date(2025, 7, 3))],
+                )
+
+
+class MappingTableTest(TestCase):
+    """Tests for the compiled title and category mappings."""
+
+    def test_get(self):
+        table = MappingTable(
+            {"Store 1": "Exact"},
+            [
+                (TitleMapping.MATCH_PREFIX, "store 1 #", "Prefix"),
+                (TitleMapping.MATCH_CONTAINS, "coffee", "Contains"),
+                (TitleMapping.MATCH_REGEX, r"^STORE \d+$", "Regex"),
+                (TitleMapping.MATCH_REGEX, "[invalid", "Invalid"),
+                (TitleMapping.MATCH_CONTAINS, "store", "Lower priority"),
+            ],
+        )
+        self.assertEqual(len(table), 5)
+        test_data = [
+            # Exact mappings are tried first, and are case-sensitive
+            ("Store 1", "Exact"),
+            ("STORE 1", "Regex"),
+            # Patterns are case-insensitive, and the first one that matches is used
+            ("STORE 1 #123", "Prefix"),
+            ("Store 1 #123 Coffee", "Prefix"),
+            ("The Coffee Store", "Contains"),
+            ("Store 12", "Regex"),
+            ("Store 12 B", "Lower priority"),
+            ("A\nstore", "Lower priority"),
+            ("Stor", None),
+            ("Something else", None),
+            (None, None),
+        ]
+        for _ in range(2):
+            # Matches are remembered, so check them twice
+            for description, expected_value in test_data:
+                with self.subTest(description=description):
+                    self.assertEqual(table.get(description), expected_value)
+        self.assertEqual(table.get("Something else", "Default"), "Default")
+
+    def test_regexes_that_cant_be_combined(self):
+        """If the regex mappings can't be combined into one regex, they are tried one at a time."""
+        patterns = [
+            (TitleMapping.MATCH_REGEX, r"(?P<store>AMZN)\s\d+", "Amazon"),
+            (TitleMapping.MATCH_CONTAINS, "uber eats", "Uber Eats"),
+            (TitleMapping.MATCH_REGEX, r"(?P<store>UBER)\s\d+", "Uber"),
+        ]
+        # Invalid patterns are skipped, rather than failing every import
+        table = MappingTable({}, patterns)
+        self.assertEqual(len(table), 1)
+        self.assertIsNone(table.get("AMZN 123"))
+
+        with mock.patch(
+            "data_tools.utils.get_mapping_regex", side_effect=lambda pattern: f".*?(?:{pattern})"
+        ):
+            table = MappingTable({}, patterns)
+        self.assertIsNone(table.regex)
+        test_data = [
+            ("Order AMZN 123", "Amazon"),
+            ("UBER 12", "Uber"),
+            ("Uber Eats 12", "Uber Eats"),
+            ("UBER EATS", "Uber Eats"),
+            ("Something else", None),
+        ]
+        for description, expected_value in test_data:
+            with self.subTest(description=description):
+                self.assertEqual(table.get(description), expected_value)
+
+    def test_overlapping_patterns(self):
+        """Patterns that overlap each other are all found in a single pass."""
+        table = MappingTable(
+            {},
+            [
+                (TitleMapping.MATCH_CONTAINS, "market 12", "Market 12"),
+                (TitleMapping.MATCH_PREFIX, "ket", "Prefix"),
+                (TitleMapping.MATCH_CONTAINS, "ket 1", "Ket 1"),
+                (TitleMapping.MATCH_CONTAINS, "mark", "Mark"),
+            ],
+        )
+        test_data = [
+            ("Supermarket 12", "Market 12"),
+            ("Supermarket 13", "Ket 1"),
+            ("Market 2", "Mark"),
+            ("Ketchup", "Prefix"),
+            ("A ketchup", None),
+        ]
+        for description, expected_value in test_data:
+            with self.subTest(description=description):
+                self.assertEqual(table.get(description), expected_value)
+
+    def test_load_mappings(self):
+        """Mappings are loaded with a query each, in priority order."""
+        category = Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        other_category = Category.objects.create(
+            name="Other", type_cat=Category.TYPE_EXPENSE, slug="other"
+        )
+        TitleMapping.objects.create(
+            source_title="restaurant", canonical_title="Restaurant", match_type="contains"
+        )
+        TitleMapping.objects.create(
+            source_title="Restaurant 1 #",
+            canonical_title="Restaurant 1",
+            match_type="prefix",
+            priority=10,
+        )
+        TitleMapping.objects.create(source_title="Restaurant 2", canonical_title="Restaurant Two")
+        CategoryMapping.objects.create(
+            source_title="^Restaurant", category=category, match_type="regex"
+        )
+        CategoryMapping.objects.create(
+            source_title="Restaurant 1", category=other_category, match_type="prefix"
+        )
+
+        with self.assertNumQueries(2):
+            title_mappings, category_mappings = load_mappings()
+
+        self.assertEqual(title_mappings.get("RESTAURANT 1 #12"), "Restaurant 1")
+        self.assertEqual(title_mappings.get("Restaurant 2"), "Restaurant Two")
+        self.assertEqual(title_mappings.get("Restaurant 2 #12"), "Restaurant")
+        # With the same priority, the mapping that was created first is used
+        self.assertEqual(category_mappings.get("Restaurant 1"), category)
+
+    def test_ingest_csv(self):
+        """Pattern mappings are applied when a file is imported."""
+        Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        other_category = Category.objects.create(
+            name="Other", type_cat=Category.TYPE_EXPENSE, slug="other"
+        )
+        TitleMapping.objects.create(
+            source_title="STORE #", canonical_title="Store", match_type="prefix"
+        )
+        # Category mappings are matched against the mapped titles
+        CategoryMapping.objects.create(source_title="Store", category=other_category)
+        csv_import = CSVImport.objects.create(
+            file=SimpleUploadedFile(
+                "mappings.csv",
+                b"Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+                b"2025-07-01,2025-07-01,STORE #123,Food & Drink,Sale,1.00,\n"
+                b"2025-07-02,2025-07-02,Store #456,Food & Drink,Sale,2.00,\n"
+                b"2025-07-03,2025-07-03,Restaurant,Food & Drink,Sale,3.00,\n",
+                content_type="text/csv",
+            )
+        )
+
+        self.assertEqual(ingest_csv(csv_import), (3, []))
+
+        self.assertEqual(
+            sorted(ExpenseTransaction.objects.values_list("title", "category__name")),
+            [("Restaurant", "Food & Drink"), ("Store", "Other"), ("Store", "Other")],
+        )
+
+
+@override_settings(MAPPING_CACHE_ALIAS="default")
+class MappingCacheTest(TestCase):
+    """Tests for the caching of the compiled mappings between imports."""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        clear_mapping_cache()
+        self.addCleanup(clear_mapping_cache)
+        self.category = Category.objects.create(
+            name="Food & Drink", type_cat=Category.TYPE_EXPENSE, slug="food-drink"
+        )
+        self.title_mapping = TitleMapping.objects.create(
+            source_title="store #", canonical_title="Store", match_type="prefix"
+        )
+        CategoryMapping.objects.create(source_title="Store", category=self.category)
+
+    def test_mappings_are_reused(self):
+        """The mappings are only loaded once, and are shared with other processes."""
+        with self.assertNumQueries(2):
+            title_mappings, category_mappings = get_cached_mappings()
+        self.assertEqual(title_mappings.get("Store #1"), "Store")
+        self.assertEqual(category_mappings.get("Store"), self.category)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_cached_mappings()[0], title_mappings)
+
+        # Another process gets them from the shared cache
+        clear_mapping_cache()
+        with self.assertNumQueries(0):
+            title_mappings, category_mappings = get_cached_mappings()
+        self.assertEqual(title_mappings.get("Store #1"), "Store")
+        self.assertEqual(category_mappings.get("Store"), self.category)
+
+    def test_changes_are_not_cached(self):
+        """The mappings are reloaded after a mapping or a Category changes."""
+        get_cached_mappings()
+
+        with self.subTest("TitleMapping saved"):
+            self.title_mapping.canonical_title = "The Store"
+            self.title_mapping.save()
+            with self.assertNumQueries(2):
+                self.assertEqual(get_cached_mappings()[0].get("Store #1"), "The Store")
+
+        with self.subTest("TitleMapping deleted"):
+            self.title_mapping.delete()
+            self.assertIsNone(get_cached_mappings()[0].get("Store #1"))
+
+        with self.subTest("Category saved"):
+            self.category.name = "Food"
+            self.category.save()
+            self.assertEqual(get_cached_mappings()[1].get("Store").name, "Food")
+
+        with self.subTest("CategoryMapping created"):
+            CategoryMapping.objects.create(
+                source_title="cafe", category=self.category, match_type="contains"
+            )
+            self.assertEqual(get_cached_mappings()[1].get("Internet Cafe"), self.category)
+
+    @override_settings(MAPPING_CACHE_ALIAS=None)
+    def test_no_mapping_cache(self):
+        """Without a mapping cache, the mappings are loaded for every import."""
+        for _ in range(2):
+            with self.assertNumQueries(2):
+                get_cached_mappings()
@@ -1,7 +1,9 @@
 import os
+from io import StringIO
 
 from django.contrib.messages import get_messages
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 
@@ -53,6 +55,7 @@ class UploadCSVViewTests(TestCase):
             )
 
     def test_upload_valid_csv(self):
+        """Uploading a CSV file queues it, and the worker then ingests it."""
         # Currently, there are no CSVImport objects.
         self.assertEqual(CSVImport.objects.count(), 0)
         # Currently, there are no transactions.
@@ -66,37 +69,49 @@ class UploadCSVViewTests(TestCase):
             {"file": self.valid_csv_file},
         )
         self.assertEqual(response.status_code, 302)  # Check for redirect
-        self.assertRedirects(response, reverse("transactions"))
+        self.assertRedirects(response, reverse("csv_import_list"))
 
         # Check for success message
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(len(messages), 1)
-        self.assertEqual(str(messages[0]), "CSV file uploaded. 3 transaction(s) created.")
+        self.assertEqual(str(messages[0]), "CSV file uploaded. It has been queued for import.")
 
-        # Check that a CSVImport object was created
+        # Check that a queued CSVImport object was created
         self.assertEqual(CSVImport.objects.count(), 1)
+        csv_import = CSVImport.objects.get()
+        self.assertEqual(csv_import.status, CSVImport.STATUS_QUEUED)
+        # The file has not been ingested yet
+        self.assertEqual(ExpenseTransaction.objects.count(), 0)
+        self.assertEqual(EarningTransaction.objects.count(), 0)
+
+        call_command("process_csv_imports", once=True, stdout=StringIO())
+
+        csv_import.refresh_from_db()
+        self.assertEqual(csv_import.status, CSVImport.STATUS_COMPLETED)
+        self.assertEqual(csv_import.rows_total, 3)
+        self.assertEqual(csv_import.rows_created, 3)
         # Check that 3 Transaction objects were created
         self.assertEqual(ExpenseTransaction.objects.count(), 2)
         self.assertEqual(EarningTransaction.objects.count(), 1)
-        # Check that a Month was created (note: the current Month is also created
-        # when the user is redirected to the transactions list page).
-        self.assertEqual(Month.objects.count(), 2)
+        # Check that a Month was created.
         self.assertEqual(Month.objects.filter(slug="july-2025").count(), 1)
 
     def test_upload_invalid_csv(self):
+        """A CSV file with invalid rows is queued, and its import fails with the errors."""
         response = self.client.post(
             reverse("upload_csv"),
             {"file": self.invalid_csv_file},
         )
-        self.assertEqual(response.status_code, 200)  # Check for rendering the form again
-
-        # Check for error message
-        messages = list(get_messages(response.wsgi_request))
-        self.assertEqual(len(messages), 1)
-        self.assertTrue(str(messages[0]).startswith("Error(s) processing file:"))
+        self.assertRedirects(response, reverse("csv_import_list"))
 
         # Check that a CSVImport object was created
         self.assertEqual(CSVImport.objects.count(), 1)
+
+        call_command("process_csv_imports", once=True, stderr=StringIO())
+
+        csv_import = CSVImport.objects.get()
+        self.assertEqual(csv_import.status, CSVImport.STATUS_FAILED)
+        self.assertTrue(csv_import.errors.startswith("Invalid date format for row:"))
         # Check that no Transaction objects were created
         self.assertEqual(ExpenseTransaction.objects.count(), 0)
         self.assertEqual(EarningTransaction.objects.count(), 0)
@@ -104,25 +119,52 @@ class UploadCSVViewTests(TestCase):
         self.assertEqual(Month.objects.count(), 0)
 
     def test_upload_non_csv_file(self):
+        """A file without the required CSV columns is rejected without being queued."""
         response = self.client.post(
             reverse("upload_csv"),
             {"file": self.non_csv_file},
         )
         self.assertEqual(response.status_code, 200)  # Check for rendering the form again
 
-        # Check for error message
-        messages = list(get_messages(response.wsgi_request))
-        self.assertEqual(len(messages), 1)
-        self.assertTrue(str(messages[0]).startswith("Error(s) processing file:"))
+        # Check for the form error
+        self.assertTrue(
+            response.context["form"].errors["file"][0].startswith("The file is missing the column")
+        )
 
-        # Check that a CSVImport object was created
-        self.assertEqual(CSVImport.objects.count(), 1)
+        # Check that no CSVImport object was created
+        self.assertEqual(CSVImport.objects.count(), 0)
         # Check that no Transaction objects were created
         self.assertEqual(ExpenseTransaction.objects.count(), 0)
         self.assertEqual(EarningTransaction.objects.count(), 0)
         # Check that no Months were created.
         self.assertEqual(Month.objects.count(), 0)
 
+    def test_upload_csv_dialect(self):
+        """The dialect of an upload is detected from its header, unless one is chosen."""
+        bank_csv = b"Date,Description,Amount\n2025-07-01,Store 1,-9.02\n"
+        with self.subTest("detected"):
+            response = self.client.post(
+                reverse("upload_csv"),
+                {"file": SimpleUploadedFile("bank.csv", bank_csv, content_type="text/csv")},
+            )
+            self.assertRedirects(response, reverse("csv_import_list"))
+            self.assertEqual(CSVImport.objects.get().dialect, "bank")
+
+        with self.subTest("chosen, and the file is missing its columns"):
+            response = self.client.post(
+                reverse("upload_csv"),
+                {
+                    "file": SimpleUploadedFile("bank.csv", bank_csv, content_type="text/csv"),
+                    "dialect": "chase",
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.context["form"].errors["file"],
+                ["The file is missing the column(s): Transaction Date, Category, Type."],
+            )
+            self.assertEqual(CSVImport.objects.count(), 1)
+
     def test_upload_csv_invalid_method(self):
         response = self.client.patch(reverse("upload_csv"))
         self.assertEqual(response.status_code, 405)
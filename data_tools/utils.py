@@ -1,28 +1,338 @@
 import csv
+import functools
+import io
 import logging
-from datetime import datetime
+import re
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice, repeat, zip_longest
 
-from django.core.exceptions import ObjectDoesNotExist
-from django.utils.text import slugify
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
 
-from data_tools.models import CategoryMapping, TitleMapping
+from data_tools.models import (
+    CategoryMapping,
+    CSVImport,
+    MappingBase,
+    TitleMapping,
+    get_mapping_regex,
+)
 from occurrence.models import (
     Category,
     EarningTransaction,
     ExpenseTransaction,
-    get_or_create_month_for_date_obj,
+    get_or_create_months_for_dates,
+    set_unique_transaction_slugs,
 )
+from occurrence.utils import bump_title_index_version, refresh_monthly_category_totals
 
 logger = logging.getLogger(__name__)
 
+#: The number of transactions that ingest_csv() writes to the database at a time.
+DEFAULT_BATCH_SIZE = 500
+
+TYPE_EARNING = "earning"
+TYPE_EXPENSE = "expense"
+
+#: A running import whose worker has not recorded any progress for this long is
+#: assumed to have been interrupted (see fail_stale_csv_imports()).
+STALE_IMPORT_TIMEOUT = timedelta(hours=1)
+
+#: The Postgres advisory lock held by concurrent imports while they deduplicate and
+#: write a batch, so that overlapping files can't create the same transaction twice.
+IMPORT_LOCK_ID = 582_011
+
+#: The date formats that parse_date() supports, in the order they are tried.
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y")
+
+#: Amounts are stored (and compared) to the cent.
+CENT = Decimal("0.01")
+
+#: Amounts must be smaller than this (in absolute value), to fit the amount fields of
+#: the transactions (with max_digits=10 and decimal_places=2).
+MAX_AMOUNT = Decimal(10) ** 8
+
+#: The currency symbols that parse_amount() ignores.
+CURRENCY_SYMBOLS = "$€£¥"
+#: An amount, after its currency symbols and sign have been removed: digits with
+#: optional (correctly grouped) thousands separators, and optional decimals.
+AMOUNT_RE = re.compile(r"(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d*)?|\.\d+")
+#: A plain amount, which Decimal() can convert as is: an optional sign, and digits
+#: with optional decimals.
+PLAIN_AMOUNT_RE = re.compile(r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)")
+
+#: The number of rows that the columnar parser converts at a time.
+COLUMNAR_CHUNK_SIZE = 10_000
+
+#: The flags that the regex mappings are matched with.
+REGEX_MAPPING_FLAGS = re.IGNORECASE | re.DOTALL
+
+#: The number of bytes at the start of a file that its CSVDialect is detected from.
+DIALECT_SNIFF_SIZE = 4096
+
+#: The sign conventions of a CSVDialect. With SIGN_TYPE_COLUMN, a type column says
+#: whether a row is an earning, and the amount is kept as it is. With the others,
+#: the sign of the amount does, and its absolute value is kept.
+SIGN_TYPE_COLUMN = "type_column"
+SIGN_NEGATIVE_EXPENSES = "negative_expenses"
+SIGN_NEGATIVE_EARNINGS = "negative_earnings"
+SIGN_CONVENTIONS = (SIGN_TYPE_COLUMN, SIGN_NEGATIVE_EXPENSES, SIGN_NEGATIVE_EARNINGS)
+
+#: The fields of a transaction that every CSVDialect must have a column for.
+DIALECT_REQUIRED_FIELDS = ("date", "description", "amount")
+#: The fields of a transaction that a CSVDialect may have a column for.
+DIALECT_FIELDS = DIALECT_REQUIRED_FIELDS + ("category", "type")
+
+#: How long (in seconds) the compiled mappings are cached for. Since the cache keys
+#: include the mapping version, they never need to expire to be correct.
+MAPPING_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+MAPPING_VERSION_CACHE_KEY = "data_tools:mapping-version"
+
+#: A row of a CSV file, converted: its date and amount (each None if it is not
+#: valid), whether it is an expense or an earning (TYPE_EXPENSE or TYPE_EARNING),
+#: its category name and description. The original row (a dict) is only kept for
+#: invalid rows.
+ParsedRow = namedtuple(
+    "ParsedRow",
+    ["transaction_date", "amount", "expense_or_earning", "category", "description", "row"],
+)
+
+
+class LiteralPatternMatcher:
+    """
+    An Aho-Corasick automaton that finds which of many prefix and substring
+    patterns a string matches, in a single pass over the string.
+
+    The patterns are added with a rank, and best_match() returns the lowest
+    rank of the patterns that match, so the cost of a match depends on the
+    length of the string, not the number of patterns. Patterns are matched
+    case-insensitively.
+    """
+
+    def __init__(self):
+        # The trie of the patterns: each state maps a character -> the next state
+        self._transitions = [{}]
+        # The lowest rank of a prefix pattern that ends at each state (or None)
+        self._prefix_ranks = [None]
+        # The lowest rank of a substring pattern that ends at each state, or at
+        # one of its suffixes (or None)
+        self._contains_ranks = [None]
+        self._fail = [0]
+
+    def _add_state(self):
+        self._transitions.append({})
+        self._prefix_ranks.append(None)
+        self._contains_ranks.append(None)
+        self._fail.append(0)
+        return len(self._transitions) - 1
+
+    def add(self, pattern, rank, prefix=False):
+        """Add a substring pattern (or a prefix pattern, if prefix is True)."""
+        state = 0
+        for character in pattern.casefold():
+            next_state = self._transitions[state].get(character)
+            if next_state is None:
+                next_state = self._transitions[state][character] = self._add_state()
+            state = next_state
+        ranks = self._prefix_ranks if prefix else self._contains_ranks
+        if ranks[state] is None or rank < ranks[state]:
+            ranks[state] = rank
+
+    def build(self):
+        """Link each state to its longest proper suffix in the trie, once the patterns are added."""
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._transitions[state].items():
+                fail = self._fail[state]
+                while fail and character not in self._transitions[fail]:
+                    fail = self._fail[fail]
+                fail = self._transitions[fail].get(character, 0)
+                self._fail[next_state] = fail
+                # The substring patterns that end at the suffix also end here
+                fail_rank = self._contains_ranks[fail]
+                rank = self._contains_ranks[next_state]
+                if fail_rank is not None and (rank is None or fail_rank < rank):
+                    self._contains_ranks[next_state] = fail_rank
+                queue.append(next_state)
+
+    def best_match(self, text):
+        """Get the lowest rank of the patterns that text matches, or None if it matches none."""
+        transitions = self._transitions
+        fail = self._fail
+        contains_ranks = self._contains_ranks
+        prefix_ranks = self._prefix_ranks
+        best_rank = None
+        state = 0
+        # Whether every character so far has followed the trie from its root,
+        # so the state is a prefix of the text
+        is_prefix = True
+        for character in text.casefold():
+            next_state = transitions[state].get(character)
+            while next_state is None and state:
+                is_prefix = False
+                state = fail[state]
+                next_state = transitions[state].get(character)
+            if next_state is None:
+                is_prefix = False
+                state = 0
+                continue
+            state = next_state
+            rank = contains_ranks[state]
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best_rank = rank
+            if is_prefix:
+                rank = prefix_ranks[state]
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank = rank
+        return best_rank
+
+
+class MappingTable:
+    """
+    The compiled TitleMappings or CategoryMappings, to look up the mapping of
+    each description in a CSV file.
+
+    Exact mappings are looked up in a dict. The prefix and substring mappings
+    are compiled into a single LiteralPatternMatcher, which finds the highest
+    priority one that matches a description in one pass over it. The regex
+    mappings are compiled into a single regular expression (with an
+    alternative for each mapping, in priority order), which is matched with
+    one call instead of a loop over the mappings in Python. The regular
+    expression engine still tries each alternative in turn, so matching it
+    costs about (the number of regex mappings) x (the length of the
+    description), and substring mappings are cheaper than regex mappings that
+    do the same thing. Bank exports repeat the same descriptions a lot, so the
+    mapping that matched each description is also remembered.
+
+    Like a dict, a MappingTable is read with get().
+    """
+
+    #: The number of descriptions whose matches are remembered
+    max_remembered_matches = 100_000
+
+    def __init__(self, exact_mappings, pattern_mappings=()):
+        """
+        Args:
+            exact_mappings (dict): Maps source_title -> value.
+            pattern_mappings (iterable): (match_type, pattern, value) tuples,
+                highest priority first. Invalid regular expressions (see
+                get_mapping_regex()) are skipped.
+        """
+        self.exact_mappings = dict(exact_mappings)
+        # The values of the pattern mappings, by rank (their index in priority order)
+        self.pattern_values = []
+        self.literal_matcher = None
+        regex_alternatives = []
+        for match_type, pattern, value in pattern_mappings:
+            rank = len(self.pattern_values)
+            if match_type in (MappingBase.MATCH_PREFIX, MappingBase.MATCH_CONTAINS):
+                if self.literal_matcher is None:
+                    self.literal_matcher = LiteralPatternMatcher()
+                self.literal_matcher.add(
+                    pattern, rank, prefix=match_type == MappingBase.MATCH_PREFIX
+                )
+            elif match_type == MappingBase.MATCH_REGEX:
+                try:
+                    regex = get_mapping_regex(pattern)
+                except ValueError as e:
+                    logger.warning(f"Skipping the invalid regex mapping '{pattern}': {e}")
+                    continue
+                regex_alternatives.append((rank, regex))
+            else:
+                raise ValueError(f"Invalid match type: {match_type}")
+            self.pattern_values.append(value)
+        if self.literal_matcher is not None:
+            self.literal_matcher.build()
+        self.regex = None
+        # The (rank, compiled regex) of each regex mapping, if they can't be combined
+        self.separate_regexes = []
+        if regex_alternatives:
+            try:
+                # The name of each group is the rank of its mapping. The regexes are
+                # anchored at the start, so the first alternative that matches is used.
+                self.regex = re.compile(
+                    "|".join(f"(?P<_{rank}>{regex})" for rank, regex in regex_alternatives),
+                    REGEX_MAPPING_FLAGS,
+                )
+            except re.error as e:
+                logger.warning(f"Matching the regex mappings one at a time: {e}")
+                self.separate_regexes = [
+                    (rank, re.compile(regex, REGEX_MAPPING_FLAGS))
+                    for rank, regex in regex_alternatives
+                ]
+        self._matches = {}
+
+    @classmethod
+    def from_mappings(cls, mappings):
+        """
+        Compile mappings, given as (source_title, match_type, value) tuples in priority order.
+        """
+        exact_mappings = {}
+        pattern_mappings = []
+        for source_title, match_type, value in mappings:
+            if match_type == MappingBase.MATCH_EXACT:
+                exact_mappings[source_title] = value
+            else:
+                pattern_mappings.append((match_type, source_title, value))
+        return cls(exact_mappings, pattern_mappings)
+
+    def __len__(self):
+        return len(self.exact_mappings) + len(self.pattern_values)
+
+    def __getstate__(self):
+        # The remembered matches are not worth sharing (see get_cached_mappings())
+        return {**self.__dict__, "_matches": {}}
+
+    def _get_pattern_rank(self, description):
+        """Get the rank of the highest priority pattern mapping that matches a description."""
+        rank = None
+        if self.literal_matcher is not None:
+            rank = self.literal_matcher.best_match(description)
+        if self.regex is not None:
+            match = self.regex.match(description)
+            if match is not None:
+                regex_rank = int(match.lastgroup[1:])
+                if rank is None or regex_rank < rank:
+                    rank = regex_rank
+        for regex_rank, regex in self.separate_regexes:
+            if rank is not None and rank < regex_rank:
+                break
+            if regex.match(description):
+                return regex_rank
+        return rank
+
+    def get(self, description, default=None):
+        """Get the value of the first mapping that matches a description, or default."""
+        try:
+            return self.exact_mappings[description]
+        except KeyError:
+            pass
+        if not self.pattern_values or description is None:
+            return default
+        try:
+            rank = self._matches[description]
+        except KeyError:
+            rank = self._get_pattern_rank(description)
+            if len(self._matches) >= self.max_remembered_matches:
+                self._matches.clear()
+            self._matches[description] = rank
+        return default if rank is None else self.pattern_values[rank]
+
 
 def get_mapped_title(description, title_mappings):
     """
-    Get the canonical title for a transaction description using a pre-loaded mapping dictionary.
+    Get the canonical title for a transaction description using the pre-loaded mappings.
 
     Args:
         description (str): The original transaction description.
-        title_mappings (dict): Dictionary mapping source_title -> canonical_title.
+        title_mappings (MappingTable or dict): Maps source_title -> canonical_title.
 
     Returns:
         str: The canonical title if a mapping exists, otherwise the original description.
@@ -36,7 +346,7 @@ def get_mapped_category(description, category_mappings):
 
     Args:
         description (str): The original CSV description.
-        category_mappings (dict): Maps source_title -> Category object.
+        category_mappings (MappingTable or dict): Maps source_title -> Category object.
 
     Returns:
         Category or None: The mapped category if one exists, otherwise None.
@@ -44,6 +354,65 @@ def get_mapped_category(description, category_mappings):
     return category_mappings.get(description, None)
 
 
+class CategoryResolver:
+    """
+    Resolve the category names in a CSV file to Category objects.
+
+    All Categories are loaded once, when the resolver is created, so resolving
+    a name never queries the database. A name that does not match a Category
+    (case-insensitively) falls back to an "Uncategorized" Category: if there
+    are several, the one whose name mentions the transaction type (e.g.
+    "Uncategorized Expense") is preferred.
+    """
+
+    default_category_name = "Uncategorized"
+
+    def __init__(self):
+        categories = list(Category.objects.all())
+
+        self.categories_by_name = {}
+        for category in categories:
+            self.categories_by_name.setdefault(category.name.casefold(), category)
+
+        default_categories = [
+            category
+            for category in categories
+            if self.default_category_name.casefold() in category.name.casefold()
+        ]
+        self.default_categories = {}
+        for expense_or_earning in (TYPE_EARNING, TYPE_EXPENSE):
+            default_category = None
+            if len(default_categories) > 1:
+                default_category = next(
+                    (c for c in default_categories if expense_or_earning in c.name.casefold()),
+                    None,
+                )
+            if not default_category and default_categories:
+                default_category = default_categories[0]
+            self.default_categories[expense_or_earning] = default_category
+
+        self._resolved = {}
+
+    def resolve(self, name, expense_or_earning):
+        """
+        Get the Category for a CSV category name.
+
+        Args:
+            name (str): The category name, as it appears in the CSV file.
+            expense_or_earning (str): TYPE_EXPENSE or TYPE_EARNING.
+
+        Returns:
+            Category or None: The matching Category, the "Uncategorized" fallback,
+            or None if neither exists.
+        """
+        key = (name, expense_or_earning)
+        if key not in self._resolved:
+            self._resolved[key] = self.categories_by_name.get(
+                name.casefold(), self.default_categories[expense_or_earning]
+            )
+        return self._resolved[key]
+
+
 def parse_date(date_string):
     """
     Convert a date string into a date object.
@@ -61,7 +430,7 @@ def parse_date(date_string):
     Raises:
         ValueError: If the date string is in an invalid format.
     """
-    for fmt in ("%Y-%m-%d", "%m/%d/%Y"):
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_string, fmt).date()
         except ValueError:
@@ -69,128 +438,1134 @@ def parse_date(date_string):
     raise ValueError(f"Invalid date format: {date_string}")
 
 
-def ingest_csv(csv_import):
+def parse_amount(amount_string):
+    """
+    Convert an amount string into a Decimal, rounded to the cent.
+
+    Plain numbers (like "-12.5") are converted directly. Otherwise, these are
+    supported:
+    - currency symbols: "$12.50", "-$12.50"
+    - thousands separators: "1,234.56"
+    - parenthesized negatives: "(12.50)", "($1,234.56)"
+
+    Anything else that Decimal() would accept (like "1e5", "1_000" or "NaN")
+    is not a valid amount, and neither is an amount that is too large to be
+    saved (see MAX_AMOUNT).
+
+    Args:
+        amount_string (str): The amount string to convert.
+
+    Returns:
+        Decimal: The amount, with 2 decimal places.
+
+    Raises:
+        ValueError: If the string is not a valid amount.
+    """
+    if isinstance(amount_string, str) and PLAIN_AMOUNT_RE.fullmatch(amount_string):
+        amount = Decimal(amount_string)
+    else:
+        amount = _parse_formatted_amount(amount_string)
+    amount = amount.quantize(CENT, rounding=ROUND_HALF_UP)
+    if abs(amount) >= MAX_AMOUNT:
+        raise ValueError(f"Invalid amount: {amount_string}")
+    return amount
+
+
+def _parse_formatted_amount(amount_string):
+    """Parse an amount with currency symbols, thousands separators or parentheses."""
+    if not isinstance(amount_string, str):
+        raise ValueError(f"Invalid amount: {amount_string}")
+    value = amount_string.strip()
+    parenthesized = value.startswith("(") and value.endswith(")")
+    if parenthesized:
+        value = value[1:-1].strip()
+    negative = parenthesized
+    # The sign may come before or after the currency symbol (but not in parentheses)
+    has_sign = has_currency_symbol = False
+    while value[:1]:
+        if value[0] in ("-", "+") and not has_sign and not parenthesized:
+            has_sign = True
+            negative = value[0] == "-"
+        elif value[0] in CURRENCY_SYMBOLS and not has_currency_symbol:
+            has_currency_symbol = True
+        else:
+            break
+        value = value[1:].strip()
+    if not AMOUNT_RE.fullmatch(value):
+        raise ValueError(f"Invalid amount: {amount_string}")
+    amount = Decimal(value.replace(",", ""))
+    return -amount if negative else amount
+
+
+def get_amount_cents(amount):
+    """
+    Get an amount as an integer number of cents.
+
+    Integers are exact, and cheaper to hash and compare than Decimals, so
+    amounts are compared in this form.
+    """
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+@contextmanager
+def open_csv_file(csv_import, dialect):
+    """Open a CSVImport's file as text, in the encoding of its CSVDialect."""
+    with csv_import.file.open(mode="rb") as csv_file:
+        yield io.TextIOWrapper(csv_file, encoding=dialect.encoding, newline="")
+
+
+def iter_csv_rows(csv_import, dialect=None):
+    """
+    Yield (index, row) pairs from a CSVImport's file, one row at a time.
+
+    The file is read lazily, so only the current row is held in memory, no
+    matter how large the file is.
+    """
+    dialect = dialect or get_csv_import_dialect(csv_import)
+    with open_csv_file(csv_import, dialect) as csv_file:
+        yield from enumerate(csv.DictReader(csv_file, delimiter=dialect.delimiter))
+
+
+def iter_parsed_rows(csv_import, dialect=None):
+    """Yield a ParsedRow for each row of a CSVImport's file, converting one row at a time."""
+    dialect = dialect or get_csv_import_dialect(csv_import)
+    with open_csv_file(csv_import, dialect) as csv_file:
+        reader = csv.reader(csv_file, delimiter=dialect.delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        convert_row = dialect.get_row_converter(header)
+        for row in reader:
+            # Skip blank lines, like csv.DictReader does
+            if row:
+                yield convert_row(row)
+
+
+def _parse_iso_date(date_string):
+    """Parse a "YYYY-MM-DD" date (like datetime.strptime(), but much faster)."""
+    if len(date_string) != 10:
+        raise ValueError(f"Invalid date format: {date_string}")
+    return date.fromisoformat(date_string)
+
+
+def _parse_us_date(date_string):
+    """Parse a "MM/DD/YYYY" date (like datetime.strptime(), but much faster)."""
+    month, day, year = date_string.split("/")
+    if len(year) != 4 or not (month.isdigit() and day.isdigit() and year.isdigit()):
+        raise ValueError(f"Invalid date format: {date_string}")
+    return date(int(year), int(month), int(day))
+
+
+#: Fast parsers for each of the DATE_FORMATS.
+DATE_FORMAT_PARSERS = {"%Y-%m-%d": _parse_iso_date, "%m/%d/%Y": _parse_us_date}
+
+
+def detect_date_format(date_strings):
+    """
+    Get the first of the DATE_FORMATS that the first non-empty date string is in.
+
+    Returns:
+        str or None: The format, or None if the date string is not in any of them.
+    """
+    date_string = next((value for value in date_strings if value), None)
+    if date_string is None:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            DATE_FORMAT_PARSERS[fmt](date_string)
+        except ValueError:
+            continue
+        return fmt
+    return None
+
+
+def get_date_parser(date_format):
+    """
+    Get a function that parses a date string in date_format.
+
+    The fast parser in DATE_FORMAT_PARSERS is used if there is one. Values in
+    a different format fall back to parse_date(), as do all values if
+    date_format is None. The function raises ValueError for invalid dates.
+    """
+    if date_format is None:
+        return parse_date
+    fast_parse = DATE_FORMAT_PARSERS.get(date_format)
+    if fast_parse is None:
+
+        def fast_parse(date_string):
+            return datetime.strptime(date_string, date_format).date()
+
+    def parse(date_string):
+        try:
+            return fast_parse(date_string)
+        except (TypeError, ValueError, AttributeError):
+            return parse_date(date_string)
+
+    return parse
+
+
+def parse_date_column(date_strings, date_format):
+    """
+    Convert a column of date strings to dates, with the parser for date_format.
+
+    Each distinct date string is only parsed once, since bank exports have
+    many transactions on each date. Values in a different format fall back to
+    parse_date(), and values that are not valid dates become None.
+    """
+    parse = get_date_parser(date_format)
+    parsed_dates = {}
+    for date_string in set(date_strings):
+        try:
+            parsed_dates[date_string] = parse(date_string)
+        except (TypeError, ValueError):
+            parsed_dates[date_string] = None
+    return list(map(parsed_dates.__getitem__, date_strings))
+
+
+def parse_amount_column(amount_strings):
+    """Convert a column of amount strings with parse_amount(). Invalid amounts become None."""
+    amounts = []
+    for amount_string in amount_strings:
+        try:
+            amounts.append(parse_amount(amount_string))
+        except ValueError:
+            amounts.append(None)
+    return amounts
+
+
+def normalize_column_name(column):
+    """Normalize a column name from a CSV header, so that headers are matched loosely."""
+    return column.strip().casefold()
+
+
+class CSVDialect:
+    """
+    The shape of the CSV files exported by a bank: which columns the fields of
+    a transaction are in, the format of its dates, the sign convention of its
+    amounts, and the encoding and delimiter of the file.
+
+    Register a dialect with register_csv_dialect(), so that files in it are
+    detected (from their header, see detect_csv_dialect()) and imported.
+    """
+
+    def __init__(
+        self,
+        name,
+        label,
+        columns,
+        date_format=None,
+        sign_convention=SIGN_TYPE_COLUMN,
+        encoding="utf-8-sig",
+        delimiter=",",
+        earning_types=("income",),
+        identifying_columns=(),
+    ):
+        """
+        Args:
+            name (str): The name that the dialect is registered (and stored on
+                CSVImports) as.
+            label (str): The name of the dialect, as shown to users.
+            columns (dict): Maps the fields of a transaction ("date",
+                "description", "amount", and optionally "category" and "type")
+                to the names of the columns they are in.
+            date_format (str): The strptime() format of the dates, or None to
+                detect it from the file (see detect_date_format()).
+            sign_convention (str): One of the SIGN_CONVENTIONS.
+            encoding (str): The encoding of the file.
+            delimiter (str): The delimiter of the columns.
+            earning_types (tuple): With SIGN_TYPE_COLUMN, the values of the type
+                column (case-insensitively) of the rows that are earnings.
+            identifying_columns (tuple): Other columns that are not imported,
+                but tell files in this dialect apart from other dialects.
+
+        Raises:
+            ValueError: If the columns or the sign convention are not valid.
+        """
+        if sign_convention not in SIGN_CONVENTIONS:
+            raise ValueError(f"Invalid sign convention: {sign_convention}")
+        required_fields = DIALECT_REQUIRED_FIELDS
+        if sign_convention == SIGN_TYPE_COLUMN:
+            required_fields += ("type",)
+        missing_fields = [field for field in required_fields if field not in columns]
+        unknown_fields = [field for field in columns if field not in DIALECT_FIELDS]
+        if missing_fields or unknown_fields:
+            raise ValueError(
+                f"Invalid columns for the {name} dialect. Missing: {missing_fields}, "
+                f"unknown: {unknown_fields}"
+            )
+
+        self.name = name
+        self.label = label
+        self.columns = dict(columns)
+        self.date_format = date_format
+        self.sign_convention = sign_convention
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.earning_types = frozenset(earning_type.casefold() for earning_type in earning_types)
+        #: The columns that a file's header must have to be in this dialect
+        self.header_columns = (*self.columns.values(), *identifying_columns)
+
+    def __repr__(self):
+        return f"<CSVDialect: {self.name}>"
+
+    def get_missing_columns(self, header):
+        """Get the header_columns that are not in a header (a list of column names)."""
+        columns = {normalize_column_name(column) for column in header}
+        return [
+            column for column in self.header_columns if normalize_column_name(column) not in columns
+        ]
+
+    def get_column_indexes(self, header):
+        """
+        Get the index of the column of each field in a header.
+
+        Raises:
+            ValueError: If the header is missing a column.
+        """
+        missing_columns = self.get_missing_columns(header)
+        if missing_columns:
+            raise ValueError(
+                "The file is missing the column(s): {}.".format(", ".join(missing_columns))
+            )
+        indexes = {normalize_column_name(column): index for index, column in enumerate(header)}
+        return {
+            field: indexes[normalize_column_name(column)] for field, column in self.columns.items()
+        }
+
+    def get_classifier(self):
+        """
+        Get a function that applies the sign convention to a row.
+
+        The function takes the amount and the value of the type column (or
+        None, if there is none) of a row, and returns (amount, TYPE_EXPENSE or
+        TYPE_EARNING).
+        """
+        if self.sign_convention == SIGN_TYPE_COLUMN:
+            earning_types = self.earning_types
+
+            def classify(amount, transaction_type):
+                if (transaction_type or "").strip().casefold() in earning_types:
+                    return amount, TYPE_EARNING
+                return amount, TYPE_EXPENSE
+
+            return classify
+
+        if self.sign_convention == SIGN_NEGATIVE_EXPENSES:
+            negative_type, positive_type = TYPE_EXPENSE, TYPE_EARNING
+        else:
+            negative_type, positive_type = TYPE_EARNING, TYPE_EXPENSE
+
+        def classify(amount, transaction_type):
+            if amount < 0:
+                return -amount, negative_type
+            return amount, positive_type
+
+        return classify
+
+    def get_row_converter(self, header):
+        """
+        Get a function that converts a row (a list of values) of a file with a header
+        into a ParsedRow.
+
+        The column indexes, date parser and sign convention are all resolved
+        here, once per file (or, for the date format if the dialect has none,
+        from the first row with a date in one of the DATE_FORMATS), so
+        converting a row only indexes into it and parses its values.
+
+        Raises:
+            ValueError: If the header is missing a column.
+        """
+        indexes = self.get_column_indexes(header)
+        width = len(header)
+        date_index = indexes["date"]
+        amount_index = indexes["amount"]
+        description_index = indexes["description"]
+        category_index = indexes.get("category")
+        type_index = indexes.get("type")
+        parse_row_date = get_date_parser(self.date_format)
+        # Without a date format, it is detected from the first date that is in one
+        # of the DATE_FORMATS, like iter_columnar_parsed_rows() does
+        detect_format = self.date_format is None
+        classify = self.get_classifier()
+
+        def convert_row(row):
+            nonlocal parse_row_date, detect_format
+            if len(row) < width:
+                # Short rows are missing values for the trailing columns
+                row = row + [""] * (width - len(row))
+            if detect_format:
+                date_format = detect_date_format([row[date_index]])
+                if date_format is not None:
+                    parse_row_date = get_date_parser(date_format)
+                    detect_format = False
+            try:
+                transaction_date = parse_row_date(row[date_index])
+            except ValueError:
+                transaction_date = None
+            try:
+                amount, expense_or_earning = classify(
+                    parse_amount(row[amount_index]),
+                    None if type_index is None else row[type_index],
+                )
+            except ValueError:
+                amount = expense_or_earning = None
+            return ParsedRow(
+                transaction_date,
+                amount,
+                expense_or_earning,
+                "" if category_index is None else row[category_index],
+                row[description_index],
+                # The original row is only needed to report an invalid value
+                dict(zip(header, row)) if transaction_date is None or amount is None else None,
+            )
+
+        return convert_row
+
+
+#: The registered CSVDialects, by name. See register_csv_dialect().
+CSV_DIALECTS = {}
+
+
+def register_csv_dialect(dialect):
+    """Register a CSVDialect, so that files in it can be detected and imported."""
+    CSV_DIALECTS[dialect.name] = dialect
+    return dialect
+
+
+def get_csv_dialect(name):
+    """
+    Get a registered CSVDialect by its name.
+
+    Raises:
+        ValueError: If there is no dialect with that name.
+    """
+    try:
+        return CSV_DIALECTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown CSV dialect: {name}")
+
+
+def get_csv_dialect_choices():
+    """Get the (name, label) choices of the registered CSVDialects."""
+    return [(dialect.name, dialect.label) for dialect in CSV_DIALECTS.values()]
+
+
+def get_sample_header(sample, dialect):
+    """Get the header (a list of column names) of the bytes at the start of a file."""
+    lines = sample.decode(dialect.encoding, errors="replace").splitlines()
+    try:
+        return next(csv.reader(lines[:1], delimiter=dialect.delimiter), [])
+    except csv.Error:
+        return []
+
+
+def detect_csv_dialect(sample):
+    """
+    Detect the CSVDialect of a file from its header.
+
+    The dialects with the most header_columns are tried first, so that a
+    dialect is preferred over a more generic one whose columns it also has.
+
+    Args:
+        sample (bytes): The start of the file (see DIALECT_SNIFF_SIZE).
+
+    Returns:
+        CSVDialect or None: The first dialect whose columns are all in the
+        header, or None if there is none.
+    """
+    dialects = sorted(CSV_DIALECTS.values(), key=lambda d: len(d.header_columns), reverse=True)
+    for dialect in dialects:
+        if not dialect.get_missing_columns(get_sample_header(sample, dialect)):
+            return dialect
+    return None
+
+
+def get_csv_import_dialect(csv_import):
+    """
+    Get the CSVDialect of a CSVImport's file.
+
+    If the CSVImport does not have a dialect yet, it is detected from the
+    header of the file, and saved on the CSVImport.
+
+    Raises:
+        ValueError: If the dialect is not registered, or can't be detected.
     """
-    Ingest a CSV file. See example.csv for an example.
+    if csv_import.dialect:
+        return get_csv_dialect(csv_import.dialect)
+    with csv_import.file.open(mode="rb") as csv_file:
+        dialect = detect_csv_dialect(csv_file.read(DIALECT_SNIFF_SIZE))
+    if dialect is None:
+        raise ValueError("The columns of the file don't match any of the CSV dialects.")
+    csv_import.dialect = dialect.name
+    if csv_import.pk is not None:
+        csv_import.save(update_fields=["dialect"])
+    return dialect
+
+
+#: The format of the files exported by Chase, which is also the default format
+#: of this project (see example.csv).
+register_csv_dialect(
+    CSVDialect(
+        "chase",
+        "Chase",
+        columns={
+            "date": "Transaction Date",
+            "description": "Description",
+            "category": "Category",
+            "type": "Type",
+            "amount": "Amount",
+        },
+    )
+)
+#: American Express card exports, where charges are positive and credits negative.
+register_csv_dialect(
+    CSVDialect(
+        "amex",
+        "American Express",
+        columns={"date": "Date", "description": "Description", "amount": "Amount"},
+        date_format="%m/%d/%Y",
+        sign_convention=SIGN_NEGATIVE_EARNINGS,
+        identifying_columns=("Card Member", "Account #"),
+    )
+)
+#: A generic bank account export, where withdrawals are negative and deposits positive.
+register_csv_dialect(
+    CSVDialect(
+        "bank",
+        "Bank account",
+        columns={"date": "Date", "description": "Description", "amount": "Amount"},
+        sign_convention=SIGN_NEGATIVE_EXPENSES,
+    )
+)
+
+
+def iter_columnar_parsed_rows(csv_import, chunk_size=COLUMNAR_CHUNK_SIZE, dialect=None):
     """
-    TYPE_EARNING = "earning"
-    TYPE_EXPENSE = "expense"
+    Yield a ParsedRow for each row of a CSVImport's file, converting a column at a time.
 
-    # Load all title mappings into a dictionary for efficient lookup
-    title_mappings = dict(TitleMapping.objects.values_list("source_title", "canonical_title"))
+    This is a faster alternative to iter_parsed_rows() for large files. The
+    rows are read in chunks of chunk_size, which are turned into columns, and
+    each column is converted at once: unless the dialect has a date format,
+    it is detected once per file (so each date is parsed by a single fast
+    parser, and only dates in a different format fall back to parse_date()),
+    and the amounts are converted in a single loop. Only the columns that are
+    imported are converted.
+    """
+    dialect = dialect or get_csv_import_dialect(csv_import)
+    classify = dialect.get_classifier()
+    with open_csv_file(csv_import, dialect) as csv_file:
+        reader = csv.reader(csv_file, delimiter=dialect.delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        column_indexes = dialect.get_column_indexes(header)
 
-    # Load all category mappings into a dictionary for efficient lookup
-    category_mappings = {
-        m.source_title: m.category
-        for m in CategoryMapping.objects.filter(category__isnull=False).select_related("category")
+        # Skip blank lines, like csv.DictReader does
+        rows = (row for row in reader if row)
+        date_format = dialect.date_format
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            columns = list(zip_longest(*chunk, fillvalue=""))
+            # Short rows are missing values for the trailing columns
+            columns += [("",) * len(chunk)] * (len(header) - len(columns))
+
+            date_strings = columns[column_indexes["date"]]
+            if date_format is None:
+                date_format = detect_date_format(date_strings)
+            dates = parse_date_column(date_strings, date_format)
+            amounts = parse_amount_column(columns[column_indexes["amount"]])
+            transaction_types = (
+                columns[column_indexes["type"]] if "type" in column_indexes else repeat(None)
+            )
+            categories = (
+                columns[column_indexes["category"]] if "category" in column_indexes else repeat("")
+            )
+
+            for transaction_date, amount, transaction_type, category, description, row in zip(
+                dates,
+                amounts,
+                transaction_types,
+                categories,
+                columns[column_indexes["description"]],
+                chunk,
+            ):
+                expense_or_earning = None
+                if amount is not None:
+                    amount, expense_or_earning = classify(amount, transaction_type)
+                yield ParsedRow(
+                    transaction_date,
+                    amount,
+                    expense_or_earning,
+                    category,
+                    description,
+                    # The original row is only needed to report an invalid value
+                    dict(zip(header, row)) if transaction_date is None or amount is None else None,
+                )
+
+
+def get_duplicate_key(title, amount, date):
+    """
+    Get the key that identifies duplicate transactions: their title, amount, and date.
+
+    The amount is converted to integer cents, so that amounts compare exactly,
+    however they were parsed or loaded from the database.
+    """
+    return (title, get_amount_cents(amount), date)
+
+
+def remove_duplicate_transactions(model, transactions):
+    """
+    Remove the unsaved transactions that are duplicates of each other, or of existing ones.
+
+    Rather than querying for each transaction, the existing (title, amount, date)
+    keys in the date span of the transactions are loaded with a single query and
+    compared in memory.
+
+    Args:
+        model: ExpenseTransaction or EarningTransaction.
+        transactions (list): Unsaved instances of model.
+
+    Returns:
+        list: The transactions that are not duplicates, in their original order.
+    """
+    if not transactions:
+        return []
+
+    dates = [t.date for t in transactions]
+    seen_keys = {
+        get_duplicate_key(title, amount, date)
+        for title, amount, date in model.objects.filter(
+            date__range=(min(dates), max(dates)),
+            title__in={t.title for t in transactions},
+        ).values_list("title", "amount", "date")
     }
 
+    new_transactions = []
+    for t in transactions:
+        key = get_duplicate_key(t.title, t.amount, t.date)
+        if key in seen_keys:
+            logger.info(f"Transaction '{t.title}' already exists. Skipping.")
+            continue
+        # Also skip later copies of this transaction in the same file
+        seen_keys.add(key)
+        new_transactions.append(t)
+    return new_transactions
+
+
+def load_mappings():
+    """
+    Load and compile the title and category mappings used by ingest_csv().
+
+    Returns:
+        tuple: (title_mappings, category_mappings), MappingTables where
+        title_mappings maps source_title -> canonical_title, and
+        category_mappings maps source_title -> Category.
+    """
+    priority_order = ("-priority", "pk")
+    title_mappings = MappingTable.from_mappings(
+        TitleMapping.objects.order_by(*priority_order).values_list(
+            "source_title", "match_type", "canonical_title"
+        )
+    )
+    category_mappings = MappingTable.from_mappings(
+        (m.source_title, m.match_type, m.category)
+        for m in CategoryMapping.objects.filter(category__isnull=False)
+        .select_related("category")
+        .order_by(*priority_order)
+    )
+    return title_mappings, category_mappings
+
+
+#: The process-local cache of the compiled mappings, as a (version, mappings) pair.
+_mapping_cache = {}
+
+
+def _get_mapping_cache():
+    """
+    Get the Django cache that the compiled mappings are shared through between processes.
+
+    This is the cache named by the MAPPING_CACHE_ALIAS setting, or None if the
+    setting is not set, in which case the mappings are not cached.
+    """
+    alias = getattr(settings, "MAPPING_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def get_mapping_version():
+    """
+    Get the current version of the mappings (from the mapping cache).
+
+    A version that is not in the cache (yet, or any more) is initialized to the
+    current time, so that a version is never reused for different mappings.
+    """
+    mapping_cache = _get_mapping_cache()
+    version = mapping_cache.get(MAPPING_VERSION_CACHE_KEY)
+    if version is None:
+        mapping_cache.add(MAPPING_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = mapping_cache.get(MAPPING_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_mapping_version():
+    """
+    Bump the mapping version, so the cached mappings are not used.
+
+    The version is bumped right away, and again when the current database
+    transaction is committed, so that mappings which were cached by another
+    process before the changes were committed are not used either.
+    """
+    if _get_mapping_cache() is None:
+        return
+
+    def bump():
+        mapping_cache = _get_mapping_cache()
+        try:
+            mapping_cache.incr(MAPPING_VERSION_CACHE_KEY)
+        except ValueError:
+            # The version is not in the cache, so there are no mappings cached for it
+            mapping_cache.add(MAPPING_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_cached_mappings():
+    """
+    Get the compiled title and category mappings (see load_mappings()), from the caches.
+
+    The mappings are cached in this process, and in the mapping cache (so that
+    other processes don't need to load and compile them again), for the
+    current mapping version. So they are reused by every import until a
+    mapping (or a Category) changes, and the version is bumped (see
+    bump_mapping_version()). If no mapping cache is configured, the mappings
+    are loaded every time.
+    """
+    mapping_cache = _get_mapping_cache()
+    if mapping_cache is None:
+        return load_mappings()
+
+    version = get_mapping_version()
+    cached = _mapping_cache.get("mappings")
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    key = "data_tools:mappings:{}".format(version)
+    mappings = mapping_cache.get(key)
+    if mappings is None:
+        mappings = load_mappings()
+        mapping_cache.set(key, mappings, timeout=MAPPING_CACHE_TIMEOUT)
+    _mapping_cache["mappings"] = (version, mappings)
+    return mappings
+
+
+def clear_mapping_cache():
+    """Empty the process-local cache of the compiled mappings."""
+    _mapping_cache.clear()
+
+
+def _flush_batch(expense_transactions, earning_transactions, write=True, lock_id=None):
+    """
+    Deduplicate a batch of unsaved transactions, and write it inside a savepoint.
+
+    The Months for the whole batch are resolved (and created, if needed) at once.
+
+    Args:
+        expense_transactions (list): Unsaved ExpenseTransactions.
+        earning_transactions (list): Unsaved EarningTransactions.
+        write (bool): If False, the batch is only deduplicated, not written.
+        lock_id (int): If given, this Postgres advisory lock is held while the
+            batch is deduplicated and written, so that concurrent imports
+            holding the same lock can't both create the same transaction.
+
+    Returns:
+        tuple: (count of transactions created, count of duplicates skipped, set of
+        the ids of the Months that transactions were created in)
+    """
+    rows_in_batch = len(expense_transactions) + len(earning_transactions)
+    with transaction.atomic():
+        if lock_id is not None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [lock_id])
+
+        # Earlier batches have already been written, so deduplicating against the
+        # database also catches duplicates within the file
+        expense_transactions = remove_duplicate_transactions(
+            ExpenseTransaction, expense_transactions
+        )
+        earning_transactions = remove_duplicate_transactions(
+            EarningTransaction, earning_transactions
+        )
+        new_transactions = expense_transactions + earning_transactions
+        count_duplicates = rows_in_batch - len(new_transactions)
+        if not write or not new_transactions:
+            return 0, count_duplicates, set()
+
+        months = get_or_create_months_for_dates(t.date for t in new_transactions)
+        for t in new_transactions:
+            t.month = months[(t.date.year, t.date.month)]
+        set_unique_transaction_slugs(new_transactions)
+        count_created = len(ExpenseTransaction.objects.bulk_create(expense_transactions))
+        count_created += len(EarningTransaction.objects.bulk_create(earning_transactions))
+    return count_created, count_duplicates, {month.pk for month in months.values()}
+
+
+class ImportProgress:
+    """
+    Record the progress (the rows created and skipped so far) of a CSVImport.
+
+    An atomic import runs in a single transaction, so progress saved in it
+    would only be visible once the import is committed. So for atomic imports,
+    the progress is written with a separate database connection, which
+    commits each update right away.
+    """
+
+    def __init__(self, csv_import, separate_connection=False):
+        self.csv_import = csv_import
+        self._connection = None
+        if separate_connection:
+            self._connection = connections.create_connection(
+                csv_import._state.db or DEFAULT_DB_ALIAS
+            )
+
+    def save(self, rows_created, rows_skipped):
+        csv_import = self.csv_import
+        csv_import.rows_created = rows_created
+        csv_import.rows_skipped = rows_skipped
+        csv_import.progress_at = timezone.now()
+        if self._connection is None:
+            csv_import.save(update_fields=["rows_created", "rows_skipped", "progress_at"])
+            return
+        with self._connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE {} SET rows_created = %s, rows_skipped = %s, progress_at = %s "
+                "WHERE id = %s".format(self._connection.ops.quote_name(CSVImport._meta.db_table)),
+                [rows_created, rows_skipped, csv_import.progress_at, csv_import.pk],
+            )
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+
+
+def ingest_csv(
+    csv_import,
+    batch_size=DEFAULT_BATCH_SIZE,
+    atomic=True,
+    mappings=None,
+    category_resolver=None,
+    lock_id=None,
+    columnar=False,
+    dialect=None,
+):
+    """
+    Ingest a CSV file, in any of the registered CSVDialects. See example.csv for an example.
+
+    The file is streamed, and transactions are written to the database in
+    batches of batch_size, so memory use stays flat regardless of file size.
+    The CSVImport's rows_created and rows_skipped are updated after each batch,
+    so the progress of a long import can be followed.
+
+    Args:
+        csv_import (CSVImport): The import whose file should be ingested.
+        batch_size (int): The number of transactions to write at a time.
+        atomic (bool): If True (the default), the import is all-or-nothing: if
+            any row is invalid, every batch is rolled back and no transactions
+            are created. If False, invalid rows (and batches that fail to save)
+            are skipped and reported in the errors, and the rest of the file is
+            still imported.
+        mappings (tuple): Pre-loaded mappings, as returned by load_mappings().
+            If not given, they are loaded from the caches (see get_cached_mappings()).
+        category_resolver (CategoryResolver): A pre-loaded CategoryResolver.
+            Created if not given.
+        lock_id (int): A Postgres advisory lock to hold while each batch is
+            deduplicated and written, for imports that run concurrently. Since
+            the lock lasts until the end of the transaction, it should only be
+            used with atomic=False.
+        columnar (bool): If True, the file is parsed a column at a time (see
+            iter_columnar_parsed_rows()), which is much faster for large files,
+            but holds a chunk of rows in memory at a time.
+        dialect (CSVDialect): The dialect of the file. If not given, the
+            CSVImport's dialect is used, or detected (see get_csv_import_dialect()).
+
+    Returns:
+        tuple: (count of transactions created, list of error messages)
+
+    Raises:
+        ValueError: If the dialect of the file can't be found, or the file is
+            missing one of its columns.
+    """
+    ingest_kwargs = {
+        "batch_size": batch_size,
+        "atomic": atomic,
+        "mappings": mappings or get_cached_mappings(),
+        "category_resolver": category_resolver or CategoryResolver(),
+        "lock_id": lock_id,
+        "columnar": columnar,
+        "dialect": dialect or get_csv_import_dialect(csv_import),
+        # Inside an outer transaction, the progress could not be committed anyway (and
+        # the outer transaction may hold a lock on the CSVImport)
+        "progress": ImportProgress(
+            csv_import, separate_connection=atomic and not connection.in_atomic_block
+        ),
+    }
+    try:
+        if atomic:
+            with transaction.atomic():
+                count_transactions_created, errors, rows_skipped = _ingest_rows(
+                    csv_import, **ingest_kwargs
+                )
+                if errors:
+                    # Throw away everything this import wrote, including any Months
+                    transaction.set_rollback(True)
+                    count_transactions_created = 0
+        else:
+            count_transactions_created, errors, rows_skipped = _ingest_rows(
+                csv_import, **ingest_kwargs
+            )
+    finally:
+        ingest_kwargs["progress"].close()
+    if count_transactions_created:
+        # Concurrent imports may commit their transactions out of id order, which the
+        # TitleIndexes would not find without reloading
+        bump_title_index_version()
+
+    # Update the CSVImport object with the final row counts
+    csv_import.rows_created = count_transactions_created
+    csv_import.rows_skipped = rows_skipped
+    csv_import.save(update_fields=["rows_created", "rows_skipped"])
+
+    return count_transactions_created, errors
+
+
+def _ingest_rows(
+    csv_import,
+    batch_size,
+    atomic,
+    mappings,
+    category_resolver,
+    lock_id,
+    columnar,
+    dialect,
+    progress,
+):
+    """
+    Stream the rows of a CSVImport's file into the database, batch by batch.
+
+    Returns a (count_transactions_created, errors, rows_skipped) tuple.
+    """
+    title_mappings, category_mappings = mappings
+
+    # The ids of the Months that transactions have been created in
+    month_ids = set()
     expense_transactions = []
     earning_transactions = []
     errors = []
     rows_skipped = 0
+    count_transactions_created = 0
 
-    with csv_import.file.open(mode="r") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for index, row in enumerate(reader):
-            amount = float(row["Amount"])
+    def refresh_totals(batch_month_ids):
+        try:
+            refresh_monthly_category_totals(batch_month_ids)
+        except DatabaseError as e:
+            # The batch has been saved, so only its totals are out of date
+            error_msg = (
+                f"Could not refresh the totals of {len(batch_month_ids)} Month(s): {e}. "
+                "Run the rebuild_monthly_category_totals command to fix them."
+            )
+            errors.append(error_msg)
+            logger.error(error_msg)
 
-            # Convert the date string to a date object
-            try:
-                transaction_date = parse_date(row["Transaction Date"])
-            except ValueError:
+    def flush():
+        nonlocal count_transactions_created, rows_skipped
+        batch_length = len(expense_transactions) + len(earning_transactions)
+        if not batch_length:
+            return
+        # Once an atomic import has an error, nothing will be kept, so stop writing
+        write = not (atomic and errors)
+        batch_month_ids = set()
+        try:
+            count_created, count_duplicates, batch_month_ids = _flush_batch(
+                expense_transactions, earning_transactions, write=write, lock_id=lock_id
+            )
+            count_transactions_created += count_created
+            rows_skipped += count_duplicates
+            month_ids.update(batch_month_ids)
+        except DatabaseError as e:
+            if atomic:
+                raise
+            # Only this batch's savepoint was rolled back, so keep going
+            error_msg = f"Could not save a batch of {batch_length} row(s): {e}"
+            errors.append(error_msg)
+            logger.error(error_msg)
+            rows_skipped += batch_length
+        if not atomic and batch_month_ids:
+            # bulk_create() does not send post_save, so refresh the totals once
+            # the batch is committed (not while its Months are locked). This is
+            # outside of the try above, since a failed refresh doesn't mean that
+            # the batch was not saved.
+            transaction.on_commit(functools.partial(refresh_totals, batch_month_ids))
+        if write:
+            # Report the progress so far
+            progress.save(count_transactions_created, rows_skipped)
+        expense_transactions.clear()
+        earning_transactions.clear()
+
+    if columnar:
+        parsed_rows = iter_columnar_parsed_rows(csv_import, dialect=dialect)
+    else:
+        parsed_rows = iter_parsed_rows(csv_import, dialect=dialect)
+    for (
+        transaction_date,
+        amount,
+        expense_or_earning,
+        category_name,
+        description,
+        row,
+    ) in parsed_rows:
+        if transaction_date is None or amount is None:
+            if transaction_date is None:
                 error_msg = f"Invalid date format for row: {row}. Skipping."
-                errors.append(error_msg)
-                logger.error(error_msg)
-                rows_skipped += 1
-                continue
             else:
-                month = get_or_create_month_for_date_obj(transaction_date)
+                error_msg = f"Invalid amount for row: {row}. Skipping."
+            errors.append(error_msg)
+            logger.error(error_msg)
+            rows_skipped += 1
+            continue
 
-            transaction_type = row["Type"].strip().lower()
+        # Determine the category based on the provided name
+        category = category_resolver.resolve(category_name, expense_or_earning)
 
-            if transaction_type.lower() == "income":
-                expense_or_earning = TYPE_EARNING
-            else:
-                expense_or_earning = TYPE_EXPENSE
+        # Get the mapped title for this transaction
+        mapped_title = get_mapped_title(description, title_mappings)
 
-            # Determine the category based on the provided name
-            default_category_name = "Uncategorized"
-            category = None
-            try:
-                category = Category.objects.get(name__iexact=row["Category"])
-            except ObjectDoesNotExist:
-                categories = Category.objects.filter(name__icontains=default_category_name)
-                if categories.count() > 1:
-                    category = categories.filter(name__icontains=expense_or_earning).first()
-                if not category:
-                    category = categories.first()
-
-            # Get the mapped title for this transaction
-            mapped_title = get_mapped_title(row["Description"], title_mappings)
-
-            # Override category with CategoryMapping if one exists for this description
-            mapped_category = get_mapped_category(mapped_title, category_mappings)
-            if mapped_category is not None:
-                category = mapped_category
-
-            # Check if the transaction already exists based on title, amount, and date
-            if transaction_type.lower() == "income":
-                existing_transaction = EarningTransaction.objects.filter(
-                    title=mapped_title, amount=amount, date=transaction_date
-                ).first()
-                if existing_transaction:
-                    logger.info(f"Transaction '{mapped_title}' already exists. Skipping.")
-                    rows_skipped += 1
-                    continue
+        # Override category with CategoryMapping if one exists for this description
+        mapped_category = get_mapped_category(mapped_title, category_mappings)
+        if mapped_category is not None:
+            category = mapped_category
 
-                # Create a new EarningTransaction
-                earning_transactions.append(
-                    EarningTransaction(
-                        title=mapped_title,
-                        slug=f"{slugify(mapped_title)}-{transaction_date.strftime('%Y-%m-%d')}-{index}",
-                        amount=amount,
-                        month=month,
-                        category=category,
-                        csv_import=csv_import,
-                        pending=True,
-                        date=transaction_date,
-                    )
+        # Duplicates (based on title, amount, and date) are removed when the batch
+        # is flushed
+        if expense_or_earning == TYPE_EARNING:
+            # Create a new EarningTransaction
+            earning_transactions.append(
+                EarningTransaction(
+                    title=mapped_title,
+                    amount=amount,
+                    category=category,
+                    csv_import=csv_import,
+                    pending=True,
+                    date=transaction_date,
                 )
-            else:
-                existing_transaction = ExpenseTransaction.objects.filter(
-                    title=mapped_title, amount=amount, date=transaction_date
-                ).first()
-                if existing_transaction:
-                    logger.info(f"Transaction '{mapped_title}' already exists. Skipping.")
-                    rows_skipped += 1
-                    continue
-
-                # Create a new ExpenseTransaction
-                expense_transactions.append(
-                    ExpenseTransaction(
-                        title=mapped_title,
-                        slug=f"{slugify(mapped_title)}-{transaction_date.strftime('%Y-%m-%d')}-{index}",
-                        amount=amount,
-                        month=month,
-                        category=category,
-                        csv_import=csv_import,
-                        pending=True,
-                        date=transaction_date,
-                    )
+            )
+        else:
+            # Create a new ExpenseTransaction
+            expense_transactions.append(
+                ExpenseTransaction(
+                    title=mapped_title,
+                    amount=amount,
+                    category=category,
+                    csv_import=csv_import,
+                    pending=True,
+                    date=transaction_date,
                 )
+            )
 
-    count_transactions_created = 0
-    if not errors:
-        expense_transactions_created = ExpenseTransaction.objects.bulk_create(expense_transactions)
-        earning_transactions_created = EarningTransaction.objects.bulk_create(earning_transactions)
-        count_transactions_created = len(expense_transactions_created) + len(
-            earning_transactions_created
+        if len(expense_transactions) + len(earning_transactions) >= batch_size:
+            flush()
+
+    flush()
+
+    if atomic and month_ids:
+        # bulk_create() does not send post_save, so refresh the totals once the
+        # import is committed, rather than holding locks on its Months until then
+        transaction.on_commit(functools.partial(refresh_monthly_category_totals, month_ids))
+
+    return count_transactions_created, errors, rows_skipped
+
+
+def claim_next_csv_import():
+    """
+    Claim the oldest queued CSVImport for processing, and mark it as running.
+
+    The row is locked with SKIP LOCKED while it is claimed, so several workers
+    can run at once without processing the same import twice.
+
+    Returns:
+        CSVImport or None: The claimed import, or None if nothing is queued.
+    """
+    with transaction.atomic():
+        csv_import = (
+            CSVImport.objects.select_for_update(skip_locked=True)
+            .filter(status=CSVImport.STATUS_QUEUED)
+            .order_by("created_at", "pk")
+            .first()
         )
+        if csv_import is None:
+            return None
+        csv_import.status = CSVImport.STATUS_RUNNING
+        csv_import.started_at = timezone.now()
+        csv_import.save(update_fields=["status", "started_at"])
+    return csv_import
 
-    # Update the CSVImport object with the row counts
-    csv_import.rows_created = count_transactions_created
-    csv_import.rows_skipped = rows_skipped
-    csv_import.save(update_fields=["rows_created", "rows_skipped"])
 
+def fail_stale_csv_imports(timeout=STALE_IMPORT_TIMEOUT):
+    """
+    Mark the running CSVImports whose workers have stopped as failed.
+
+    An import whose worker has not recorded any progress (or, before its first
+    batch, started it) for longer than timeout is assumed to have been
+    interrupted, e.g. because its worker crashed. Atomic imports are rolled
+    back when that happens, so nothing was created from them.
+
+    Returns:
+        int: The number of imports that were marked as failed.
+    """
+    cutoff = timezone.now() - timeout
+    return (
+        CSVImport.objects.filter(status=CSVImport.STATUS_RUNNING)
+        .filter(
+            Q(progress_at__lt=cutoff)
+            | Q(progress_at__isnull=True, started_at__lt=cutoff)
+            | Q(progress_at__isnull=True, started_at__isnull=True)
+        )
+        .update(
+            status=CSVImport.STATUS_FAILED,
+            errors="The import was interrupted. Upload the file again to retry it.",
+            finished_at=timezone.now(),
+        )
+    )
+
+
+def run_csv_import(csv_import, **ingest_kwargs):
+    """
+    Process a claimed CSVImport, recording its status, progress and errors.
+
+    The dialect of the file is detected (unless the CSVImport has one), and
+    the rows in the file are counted (so that progress can be shown as a
+    percentage), then the file is ingested with ingest_csv(), which is
+    passed any ingest_kwargs.
+
+    Returns:
+        tuple: (count of transactions created, list of error messages)
+    """
+    count_transactions_created = 0
+    try:
+        dialect = get_csv_import_dialect(csv_import)
+        csv_import.rows_total = sum(1 for _ in iter_csv_rows(csv_import, dialect))
+        csv_import.save(update_fields=["rows_total"])
+        count_transactions_created, errors = ingest_csv(
+            csv_import, dialect=dialect, **ingest_kwargs
+        )
+    except Exception as e:
+        logger.exception(f"Error processing {csv_import}")
+        errors = [f"Error processing file: {e}"]
+
+    csv_import.status = CSVImport.STATUS_FAILED if errors else CSVImport.STATUS_COMPLETED
+    csv_import.errors = "\n".join(errors)
+    csv_import.finished_at = timezone.now()
+    csv_import.save(update_fields=["status", "errors", "finished_at"])
     return count_transactions_created, errors
@@ -0,0 +1,358 @@
+"""
+Tools for benchmarking the occurrence views and CSV imports.
+
+The synthetic data is built with the test factories, so factory_boy (from the
+dev requirements) must be installed to seed it. The factories are imported
+when data is seeded, so that the rest of this module (like the view requests
+of the explain_view_queries command) works without them. See the
+seed_benchmark_data and run_benchmarks management commands.
+"""
+
+import csv
+import random
+import statistics as stats
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import models, utils, views
+
+# The expense Categories to seed, as {parent name: {child name: (titles, low amount, high amount)}}
+EXPENSE_CATEGORIES = {
+    "Housing": {
+        "Rent": (["Rent"], 1200, 1500),
+        "Utilities": (["Electric Company", "Water Utility", "Internet Provider"], 40, 180),
+        "Home Improvement": (["Hardware Store", "Furniture Store"], 15, 400),
+    },
+    "Food": {
+        "Groceries": (["Grocery Store", "Farmers Market", "Wholesale Club"], 10, 250),
+        "Restaurants": (["Pizza Place", "Thai Restaurant", "Burger Joint", "Diner"], 12, 90),
+        "Coffee": (["Coffee Shop", "Bakery"], 3, 15),
+    },
+    "Transportation": {
+        "Gas": (["Gas Station"], 25, 70),
+        "Parking": (["Parking Garage", "City Parking"], 2, 25),
+        "Car Maintenance": (["Auto Shop", "Car Wash"], 15, 600),
+    },
+    "Personal": {
+        "Health": (["Pharmacy", "Doctor's Office", "Dentist"], 10, 300),
+        "Entertainment": (["Movie Theater", "Streaming Service", "Bookstore"], 8, 60),
+        "Clothing": (["Clothing Store", "Shoe Store"], 20, 150),
+        "Gifts": (["Gift Shop", "Online Store"], 10, 200),
+    },
+}
+# The expense Categories that have a running total, as {name: (titles, low amount, high amount)}
+RUNNING_EXPENSE_CATEGORIES = {
+    "Car Fund": (["Car Fund Transfer"], -300, 500),
+    "Vacation Fund": (["Vacation Fund Transfer"], -200, 800),
+}
+# The earning Categories to seed, as {name: (titles, low amount, high amount, count per Month)}
+EARNING_CATEGORIES = {
+    "Salary": (["Paycheck"], 2500, 3200, 2),
+    "Interest": (["Savings Interest"], 1, 30, 1),
+    "Refunds": (["Refund"], 5, 150, 1),
+}
+STATISTIC_NAMES = ["Net Worth", "Savings Balance", "Retirement Balance", "Credit Card Balance"]
+
+# The columns of the seeded CSV files, which are in the format of data_tools/tests/example.csv
+CSV_COLUMNS = ["Transaction Date", "Post Date", "Description", "Category", "Type", "Amount", "Memo"]
+
+
+def _get_or_create_categories(names_and_kwargs, factory):
+    """Get or create the Categories with the given names (and fields), keyed by name."""
+    categories = models.Category.objects.in_bulk(list(names_and_kwargs), field_name="name")
+    for name, kwargs in names_and_kwargs.items():
+        if name not in categories:
+            categories[name] = factory(name=name, **kwargs)
+    return categories
+
+
+def seed_categories():
+    """
+    Get or create the Categories (with parent hierarchies) and Statistics to seed data for.
+
+    Returns:
+        tuple: (dict of {Category: (titles, low, high)} for the expense Categories,
+            dict of {Category: (titles, low, high, count)} for the earning Categories,
+            list of the Statistics)
+    """
+    from .tests import factories
+
+    parents = _get_or_create_categories(
+        {name: {"order": order} for order, name in enumerate(EXPENSE_CATEGORIES)},
+        factories.ExpenseCategoryFactory,
+    )
+    child_kwargs = {}
+    child_details = {}
+    for parent_name, children in EXPENSE_CATEGORIES.items():
+        for name, details in children.items():
+            child_kwargs[name] = {"parent": parents[parent_name]}
+            child_details[name] = details
+    for name, details in RUNNING_EXPENSE_CATEGORIES.items():
+        child_kwargs[name] = {"total_type": models.Category.TOTAL_TYPE_RUNNING}
+        child_details[name] = details
+    expense_categories = _get_or_create_categories(child_kwargs, factories.ExpenseCategoryFactory)
+    earning_categories = _get_or_create_categories(
+        {name: {} for name in EARNING_CATEGORIES}, factories.IncomeCategoryFactory
+    )
+
+    existing_statistics = {
+        statistic.name: statistic
+        for statistic in models.Statistic.objects.filter(name__in=STATISTIC_NAMES)
+    }
+    statistics = [
+        existing_statistics.get(name) or factories.StatisticFactory(name=name, order=order)
+        for order, name in enumerate(STATISTIC_NAMES)
+    ]
+    return (
+        {expense_categories[name]: details for name, details in child_details.items()},
+        {earning_categories[name]: details for name, details in EARNING_CATEGORIES.items()},
+        statistics,
+    )
+
+
+def _random_amount(rng, low, high):
+    """A random amount between low and high, skewed towards the low end (like real spending)."""
+    return Decimal(low + (high - low) * rng.random() ** 2).quantize(Decimal("0.01"))
+
+
+def _random_date(rng, year, month):
+    return date(year, month, rng.randint(1, 28))
+
+
+def get_benchmark_months(years, end_year):
+    """The (year, month) of each month in the years up to (and including) end_year."""
+    return [
+        (year, month)
+        for year in range(end_year - years + 1, end_year + 1)
+        for month in range(1, 13)
+    ]
+
+
+def seed_benchmark_data(years, transactions_per_month=100, end_year=None, seed=0):
+    """
+    Create a synthetic multi-year dataset for benchmarking.
+
+    We create (or reuse) Categories with parent hierarchies, some with running
+    totals, and Statistics, and then for every Month: transactions for each
+    Category, a budget (ExpectedMonthlyCategoryTotals), and MonthlyStatistics.
+    Rows are built with the factories, and saved with bulk_create().
+
+    Args:
+        years: The number of years of data to create.
+        transactions_per_month: The number of expense transactions to create in each Month.
+        end_year: The last year to create data for (defaults to the current year).
+        seed: The seed for the random data, so that a dataset can be recreated.
+
+    Returns:
+        dict: The number of objects created, keyed by model name.
+    """
+    from .tests import factories
+
+    rng = random.Random(seed)
+    end_year = end_year or date.today().year
+    expense_categories, earning_categories, statistics = seed_categories()
+    year_months = get_benchmark_months(years, end_year)
+    months = models.get_or_create_months_for_dates(
+        date(year, month, 1) for year, month in year_months
+    )
+
+    expense_transactions = []
+    earning_transactions = []
+    budgets = []
+    monthly_statistics = []
+    expense_category_list = list(expense_categories)
+    for index, (year, month_number) in enumerate(year_months):
+        month = months[(year, month_number)]
+        for category in rng.choices(expense_category_list, k=transactions_per_month):
+            titles, low, high = expense_categories[category]
+            expense_transactions.append(
+                factories.ExpenseTransactionFactory.build(
+                    title=rng.choice(titles),
+                    date=_random_date(rng, year, month_number),
+                    month=month,
+                    amount=_random_amount(rng, low, high),
+                    category=category,
+                    description="",
+                )
+            )
+        for category, (titles, low, high, count) in earning_categories.items():
+            for _ in range(count):
+                earning_transactions.append(
+                    factories.EarningTransactionFactory.build(
+                        title=rng.choice(titles),
+                        date=_random_date(rng, year, month_number),
+                        month=month,
+                        amount=_random_amount(rng, low, high),
+                        category=category,
+                        description="",
+                    )
+                )
+        for category, (titles, low, high) in expense_categories.items():
+            budgets.append(
+                factories.ExpectedMonthlyCategoryTotalFactory.build(
+                    category=category,
+                    month=month,
+                    amount=Decimal(
+                        high * transactions_per_month / len(expense_categories) / 2
+                    ).quantize(Decimal("1")),
+                )
+            )
+        for statistic_index, statistic in enumerate(statistics):
+            monthly_statistics.append(
+                factories.MonthlyStatisticFactory.build(
+                    statistic=statistic,
+                    month=month,
+                    amount=Decimal(10000 * (statistic_index + 1) + 250 * index).quantize(
+                        Decimal("0.01")
+                    ),
+                )
+            )
+
+    models.set_unique_transaction_slugs(expense_transactions)
+    models.set_unique_transaction_slugs(earning_transactions)
+    models.ExpenseTransaction.objects.bulk_create(expense_transactions, batch_size=1000)
+    models.EarningTransaction.objects.bulk_create(earning_transactions, batch_size=1000)
+    # Months that already had a budget or statistics keep them
+    budgets = models.ExpectedMonthlyCategoryTotal.objects.bulk_create(
+        budgets, batch_size=1000, ignore_conflicts=True
+    )
+    monthly_statistics = models.MonthlyStatistic.objects.bulk_create(
+        monthly_statistics, batch_size=1000, ignore_conflicts=True
+    )
+    # bulk_create() does not send post_save, so refresh the totals here
+    month_ids = [month.pk for month in months.values()]
+    utils.refresh_monthly_category_totals(month_ids)
+    utils.bump_report_data_versions(month_ids, structure=True)
+
+    return {
+        "ExpenseTransaction": len(expense_transactions),
+        "EarningTransaction": len(earning_transactions),
+        "ExpectedMonthlyCategoryTotal": len(budgets),
+        "MonthlyStatistic": len(monthly_statistics),
+    }
+
+
+def write_benchmark_csv(csv_file, rows, years, end_year=None, seed=0):
+    """
+    Write a CSV file of synthetic bank transactions, for benchmarking imports.
+
+    The file is in the format of data_tools/tests/example.csv, with dates in the
+    seeded years, and the titles and Category names of the seeded Categories.
+    """
+    rng = random.Random(seed)
+    end_year = end_year or date.today().year
+    year_months = get_benchmark_months(years, end_year)
+    category_details = {}
+    for children in EXPENSE_CATEGORIES.values():
+        category_details.update(children)
+
+    writer = csv.writer(csv_file)
+    writer.writerow(CSV_COLUMNS)
+    category_names = list(category_details)
+    earning_names = list(EARNING_CATEGORIES)
+    for _ in range(rows):
+        transaction_date = _random_date(rng, *rng.choice(year_months))
+        if rng.random() < 0.05:
+            category_name = rng.choice(earning_names)
+            titles, low, high, _count = EARNING_CATEGORIES[category_name]
+            transaction_type = "Income"
+            amount = -_random_amount(rng, low, high)
+        else:
+            category_name = rng.choice(category_names)
+            titles, low, high = category_details[category_name]
+            transaction_type = "Sale"
+            amount = _random_amount(rng, low, high)
+        writer.writerow(
+            [
+                transaction_date.strftime("%m/%d/%Y"),
+                transaction_date.strftime("%m/%d/%Y"),
+                "{} #{}".format(rng.choice(titles).upper(), rng.randint(100, 999)),
+                category_name,
+                transaction_type,
+                amount,
+                "",
+            ]
+        )
+
+
+def measure(func, repeat=1):
+    """
+    Measure a function's wall time, number of queries, and peak memory.
+
+    The function is run repeat times to time it (and count its queries), and
+    once more with tracemalloc, so that tracing does not slow down the timed runs.
+
+    Returns:
+        dict: The min and median wall time (in seconds), the number of queries
+            (of the last timed run), and the peak memory (in bytes).
+    """
+    wall_times = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            wall_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _current, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_time_min": min(wall_times),
+        "wall_time_median": stats.median(wall_times),
+        "queries": len(captured.captured_queries),
+        "peak_memory": peak_memory,
+    }
+
+
+def get_view_requests(month):
+    """
+    Get the views to benchmark (or explain) for a Month.
+
+    Returns:
+        list: (view name, view function, GET parameters) tuples.
+    """
+    view_requests = [
+        ("transactions", views.transactions, {"month": month.slug}),
+        ("totals", views.totals, {"month": month.slug}),
+        ("running_totals", views.running_total_categories, {}),
+        ("budget", views.budget, {"month": month.slug}),
+    ]
+    statistic = models.Statistic.objects.first()
+    first_month = models.Month.objects.last()
+    if statistic is not None:
+        view_requests.append(
+            (
+                "statistics_chart_view",
+                views.statistics_chart_view,
+                {
+                    "statistic": statistic.slug,
+                    "start_month": first_month.slug,
+                    "end_month": month.slug,
+                },
+            )
+        )
+    return view_requests
+
+
+def get_view_request_function(view, view_name, params):
+    """Get a function that requests a view (with a RequestFactory request)."""
+    request_factory = RequestFactory()
+    url = reverse(view_name)
+
+    def request_view():
+        response = view(request_factory.get(url, params))
+        if response.status_code != 200:
+            raise ValueError("{} returned {}".format(view_name, response.status_code))
+
+    return request_view
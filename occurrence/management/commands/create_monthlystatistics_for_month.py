@@ -1,38 +1,79 @@
+from decimal import Decimal
+
 from django.core.management.base import BaseCommand, CommandError
 
-from occurrence.models import Month, MonthlyStatistic, Statistic
+from occurrence.models import Month
+from occurrence.utils import create_missing_monthly_statistics
 
 
 class Command(BaseCommand):
-    help = "Creates MonthlyStatistics for a Month"
+    help = (
+        "Creates the missing MonthlyStatistics for a Month, a range of Months, or every Month "
+        "that is missing some"
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument("month_slug", type=str)
-        parser.add_argument("--amount", type=float, default=0.0, required=False)
+        parser.add_argument("month_slug", type=str, nargs="?")
+        parser.add_argument("--start-month", type=str, help="The slug of the first Month")
+        parser.add_argument("--end-month", type=str, help="The slug of the last Month")
+        parser.add_argument(
+            "--all-missing",
+            action="store_true",
+            help="Create the missing MonthlyStatistics for every Month",
+        )
+        parser.add_argument("--amount", type=Decimal, default=Decimal("0"), required=False)
+        parser.add_argument(
+            "--copy-previous",
+            action="store_true",
+            help="Use the amount of each Statistic in the previous month (if there is one)",
+        )
+
+    def get_month(self, month_slug):
+        month = Month.objects.filter(slug=month_slug).first()
+        # If the Month was not found, then raise an error.
+        if not month:
+            raise CommandError('Month not found for slug "%s"' % month_slug)
+        return month
 
     def handle(self, *args, **options):
         """
-        Create MonthlyStatistics for a Month.
+        Create the missing MonthlyStatistics for some Months.
 
         We:
-         - find the appropriate Month
-         - loop over each of the Statistics, and create one for the Month
+         - find the Months: the Month of month_slug, the Months from --start-month
+           to --end-month, or every Month (with --all-missing)
+         - create a MonthlyStatistic for each Statistic and Month that does not
+           have one yet, all at once
+         - report how many MonthlyStatistics were created
         """
         month_slug = options["month_slug"]
-        month = Month.objects.filter(slug=month_slug).first()
-        amount = options["amount"]
-
-        # If the Month was not found, then raise an error.
-        if not month:
-            raise CommandError('Month not found for slug "%s"' % month_slug)
-
-        # Loop over each of the Statistics, and create one for the month.
-        objects_created = []
-        for statistic in Statistic.objects.all():
-            objects_created.append(
-                MonthlyStatistic.objects.create(month=month, statistic=statistic, amount=amount)
+        start = end = None
+        if month_slug is not None:
+            if options["start_month"] or options["end_month"] or options["all_missing"]:
+                raise CommandError(
+                    "Give either a month_slug, or --start-month/--end-month, or --all-missing."
+                )
+            month = self.get_month(month_slug)
+            start = end = (month.year, month.month)
+        elif options["start_month"] or options["end_month"]:
+            if options["all_missing"]:
+                raise CommandError("--all-missing can't be used with --start-month/--end-month.")
+            if options["start_month"]:
+                month = self.get_month(options["start_month"])
+                start = (month.year, month.month)
+            if options["end_month"]:
+                month = self.get_month(options["end_month"])
+                end = (month.year, month.month)
+        elif not options["all_missing"]:
+            raise CommandError(
+                "Give a month_slug, --start-month and/or --end-month, or --all-missing."
             )
 
-        # Write a success message of the MonthlyStatistic that were created.
-        objects_created_str = "\n".join(["    " + str(obj) for obj in objects_created])
-        self.stdout.write(self.style.SUCCESS("Successfully created:\n%s") % objects_created_str)
+        objects_created = create_missing_monthly_statistics(
+            start, end, amount=options["amount"], copy_previous=options["copy_previous"]
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS("Successfully created %d MonthlyStatistic(s).")
+            % len(objects_created)
+        )
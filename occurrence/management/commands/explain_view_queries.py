@@ -0,0 +1,126 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from occurrence.benchmarks import get_view_requests
+from occurrence.models import Month
+
+# Patterns for the scans in the output of EXPLAIN
+INDEX_SCAN_RE = re.compile(r"(?:Index Scan|Index Only Scan) using (\S+) on (\S+)")
+BITMAP_INDEX_SCAN_RE = re.compile(r"Bitmap Index Scan on (\S+)")
+SEQ_SCAN_RE = re.compile(r"Seq Scan on (\S+)")
+
+
+def get_scans(plan_lines):
+    """Get the indexes, and the tables scanned sequentially, from the lines of a query plan."""
+    indexes = []
+    seq_scan_tables = []
+    for line in plan_lines:
+        match = INDEX_SCAN_RE.search(line) or BITMAP_INDEX_SCAN_RE.search(line)
+        if match:
+            indexes.append(match.group(1))
+            continue
+        match = SEQ_SCAN_RE.search(line)
+        if match:
+            seq_scan_tables.append(match.group(1))
+    return indexes, seq_scan_tables
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN for the queries of the occurrence views, and reports whether they use "
+        "indexes. Run it against a realistically sized database, since Postgres prefers "
+        "sequential scans for small tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            help="The slug of the Month to request the views for (default: the latest Month)",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Use EXPLAIN ANALYZE, which runs the queries to get the actual timings",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Print the full query plans",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Explain the queries of the occurrence views.
+
+        We:
+         - request each view (without the report cache, so the queries are run),
+           and capture its queries
+         - run EXPLAIN for each of the SELECT queries
+         - report the indexes each query uses, and the tables it scans sequentially
+        """
+        if options["month"]:
+            month = Month.objects.filter(slug=options["month"]).first()
+            if month is None:
+                raise CommandError("Month '%s' does not exist." % options["month"])
+        else:
+            month = Month.objects.first()
+            if month is None:
+                raise CommandError("There are no Months to request the views for.")
+
+        count_queries = 0
+        count_queries_with_seq_scans = 0
+        for view_name, queries in self.capture_view_queries(month):
+            self.stdout.write(view_name)
+            for query_number, sql in enumerate(queries, start=1):
+                plan_lines = self.explain(sql, analyze=options["analyze"])
+                indexes, seq_scan_tables = get_scans(plan_lines)
+                count_queries += 1
+                if seq_scan_tables:
+                    count_queries_with_seq_scans += 1
+                self.stdout.write(
+                    "  query %d: indexes: %s; sequential scans: %s"
+                    % (
+                        query_number,
+                        ", ".join(indexes) or "none",
+                        ", ".join(seq_scan_tables) or "none",
+                    )
+                )
+                if options["plans"]:
+                    self.stdout.write("    " + sql)
+                    for line in plan_lines:
+                        self.stdout.write("      " + line)
+
+        self.stdout.write(
+            self.style.SUCCESS("Explained %d queries, %d of which have sequential scans.")
+            % (count_queries, count_queries_with_seq_scans)
+        )
+
+    def capture_view_queries(self, month):
+        """Request each of the views, and yield (view name, list of its SELECT queries)."""
+        request_factory = RequestFactory()
+        view_requests = get_view_requests(month)
+
+        with override_settings(REPORT_CACHE_ALIAS=None):
+            for view_name, view, params in view_requests:
+                request = request_factory.get(reverse(view_name), params)
+                with CaptureQueriesContext(connection) as captured:
+                    view(request)
+                yield (
+                    view_name,
+                    [
+                        query["sql"]
+                        for query in captured.captured_queries
+                        if query["sql"].lstrip().upper().startswith("SELECT")
+                    ],
+                )
+
+    def explain(self, sql, analyze=False):
+        """Run EXPLAIN for a query, and return the lines of its plan."""
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN {}{}".format("ANALYZE " if analyze else "", sql))
+            return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from occurrence.models import MonthlyCategoryTotal
+from occurrence.utils import refresh_monthly_category_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the MonthlyCategoryTotals from the transactions"
+
+    def handle(self, *args, **options):
+        """
+        Rebuild the MonthlyCategoryTotals.
+
+        They are normally kept up to date as transactions change, but this
+        recomputes all of them from scratch (e.g. after transactions have been
+        changed with QuerySet.update()).
+        """
+        refresh_monthly_category_totals()
+        self.stdout.write(
+            self.style.SUCCESS("Successfully rebuilt %d MonthlyCategoryTotal(s).")
+            % MonthlyCategoryTotal.objects.count()
+        )
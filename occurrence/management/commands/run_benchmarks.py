@@ -0,0 +1,150 @@
+import io
+import json
+import platform
+from datetime import date
+
+import django
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from data_tools.models import CSVImport
+from data_tools.utils import ingest_csv
+from occurrence import models, utils
+from occurrence.benchmarks import (
+    get_view_request_function,
+    get_view_requests,
+    measure,
+    seed_benchmark_data,
+    write_benchmark_csv,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the occurrence views and CSV imports at several scales of synthetic data, "
+        "and reports the wall time, number of queries and peak memory of each as JSON. "
+        "The data is created in a transaction that is rolled back, so the database is left "
+        "unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--years",
+            type=int,
+            nargs="+",
+            default=[1, 3],
+            help="The scales to benchmark, as numbers of years of data",
+        )
+        parser.add_argument(
+            "--transactions-per-month",
+            type=int,
+            default=100,
+            help="The number of expense transactions in each Month",
+        )
+        parser.add_argument(
+            "--csv-rows",
+            type=int,
+            nargs="+",
+            default=[1000],
+            help="The number of rows of each CSV file to import",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="The number of times to time each view"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="The seed for the random data")
+        parser.add_argument("--output", type=str, help="A file to write the JSON results to")
+
+    def handle(self, *args, **options):
+        """
+        Benchmark the views and CSV imports.
+
+        We, for each scale (number of years):
+         - seed the data (see seed_benchmark_data), in a transaction
+         - request each view --repeat times (without the report cache), and once more
+           to measure its peak memory
+         - import a CSV file with each of the numbers of --csv-rows (each in a
+           savepoint that is rolled back, so every import starts from the same data)
+         - roll the transaction back
+        and then write the results as JSON.
+        """
+        if min(options["years"]) < 1 or options["repeat"] < 1:
+            raise CommandError("--years and --repeat must be at least 1.")
+
+        end_year = date.today().year
+        results = []
+        for years in options["years"]:
+            self.stderr.write("Benchmarking %d year(s) of data..." % years)
+            with transaction.atomic():
+                counts = seed_benchmark_data(
+                    years,
+                    transactions_per_month=options["transactions_per_month"],
+                    end_year=end_year,
+                    seed=options["seed"],
+                )
+                results.append(
+                    {
+                        "years": years,
+                        "counts": counts,
+                        "views": self.benchmark_views(options["repeat"]),
+                        "imports": self.benchmark_imports(
+                            options["csv_rows"], years, end_year, options["seed"]
+                        ),
+                    }
+                )
+                transaction.set_rollback(True)
+            # Nothing that was cached while benchmarking exists any more
+            utils.clear_title_indexes()
+
+        output = json.dumps(
+            {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "transactions_per_month": options["transactions_per_month"],
+                "repeat": options["repeat"],
+                "results": results,
+            },
+            indent=2,
+        )
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                output_file.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS("Wrote the results to %s.") % options["output"])
+        else:
+            self.stdout.write(output)
+
+    def benchmark_views(self, repeat):
+        """Measure each of the views for the latest Month."""
+        month = models.Month.objects.first()
+        view_results = {}
+        with override_settings(REPORT_CACHE_ALIAS=None):
+            for view_name, view, params in get_view_requests(month):
+                view_results[view_name] = measure(
+                    get_view_request_function(view, view_name, params), repeat=repeat
+                )
+        return view_results
+
+    def benchmark_imports(self, csv_rows, years, end_year, seed):
+        """Measure the import of a CSV file with each of the numbers of rows."""
+        import_results = {}
+        for rows in csv_rows:
+            csv_file = io.StringIO()
+            write_benchmark_csv(csv_file, rows, years, end_year=end_year, seed=seed)
+            csv_import = CSVImport.objects.create(
+                file=ContentFile(csv_file.getvalue().encode(), name="benchmark_{}.csv".format(rows))
+            )
+            try:
+
+                def import_csv():
+                    # Every import starts from the same data
+                    with transaction.atomic():
+                        ingest_csv(csv_import)
+                        transaction.set_rollback(True)
+
+                import_results[str(rows)] = measure(import_csv)
+            finally:
+                csv_import.file.delete(save=False)
+        return import_results
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from occurrence.benchmarks import seed_benchmark_data, write_benchmark_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates a synthetic multi-year dataset (transactions, Categories, budgets and "
+        "Statistics), and optionally CSV files to import, for benchmarking"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--years", type=int, default=3, help="The number of years of data")
+        parser.add_argument(
+            "--transactions-per-month",
+            type=int,
+            default=100,
+            help="The number of expense transactions to create in each Month",
+        )
+        parser.add_argument(
+            "--end-year", type=int, help="The last year to create data for (default: this year)"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="The seed for the random data")
+        parser.add_argument(
+            "--csv-dir", type=str, help="A directory to write CSV files (to import) to"
+        )
+        parser.add_argument(
+            "--csv-rows",
+            type=int,
+            nargs="+",
+            default=[1000],
+            help="The number of rows of each CSV file to write",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Create a synthetic dataset for benchmarking.
+
+        We:
+         - create (or reuse) the Categories, with parent hierarchies, and Statistics
+         - create transactions, budgets and MonthlyStatistics for every Month of
+           the years, and refresh the monthly totals
+         - write a CSV file with each of the numbers of --csv-rows, if --csv-dir is given
+        """
+        if options["years"] < 1 or options["transactions_per_month"] < 0:
+            raise CommandError(
+                "--years must be at least 1, and --transactions-per-month at least 0."
+            )
+        csv_dir = None
+        if options["csv_dir"]:
+            csv_dir = Path(options["csv_dir"])
+            if not csv_dir.is_dir():
+                raise CommandError('Directory not found: "%s"' % csv_dir)
+
+        with transaction.atomic():
+            counts = seed_benchmark_data(
+                options["years"],
+                transactions_per_month=options["transactions_per_month"],
+                end_year=options["end_year"],
+                seed=options["seed"],
+            )
+        for model_name, count in counts.items():
+            self.stdout.write("%s: %d created." % (model_name, count))
+
+        if csv_dir is not None:
+            for rows in options["csv_rows"]:
+                path = csv_dir / "benchmark_{}.csv".format(rows)
+                with path.open("w", newline="") as csv_file:
+                    write_benchmark_csv(
+                        csv_file,
+                        rows,
+                        options["years"],
+                        end_year=options["end_year"],
+                        seed=options["seed"],
+                    )
+                self.stdout.write("Wrote %d rows to %s." % (rows, path))
+
+        self.stdout.write(
+            self.style.SUCCESS("Successfully seeded %d year(s) of data.") % options["years"]
+        )
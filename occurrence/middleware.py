@@ -0,0 +1,214 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# The upper bounds (in milliseconds) of the buckets of the request timing histograms. Requests
+# slower than the last bound are counted in an extra overflow bucket.
+REQUEST_TIMING_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# The histograms are kept for a number of windows of this many seconds, so they only
+# reflect recent requests
+REQUEST_TIMING_WINDOW_SECONDS = 60
+REQUEST_TIMING_WINDOWS = 15
+# The view name that requests which did not resolve to a view are recorded under
+UNRESOLVED_VIEW_NAME = "<unresolved>"
+
+
+class QueryTimer:
+    """
+    A database execute wrapper that counts and times the queries of a request.
+
+    Only the SQL of the slowest queries is kept, so this stays cheap for
+    requests with many queries.
+    """
+
+    def __init__(self, slowest_count):
+        self.slowest_count = slowest_count
+        self.count = 0
+        self.duration = 0.0
+        # A min-heap of (duration, query number, sql)
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if len(self._slowest) < self.slowest_count:
+                heapq.heappush(self._slowest, (duration, self.count, sql))
+            elif self._slowest and duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, (duration, self.count, sql))
+
+    def get_slowest_queries(self):
+        """Get the slowest queries, as (duration, sql) pairs, slowest first."""
+        return [(duration, sql) for duration, _, sql in sorted(self._slowest, reverse=True)]
+
+
+class RequestTimings:
+    """
+    Rolling, in-process histograms of the wall times of the requests to each view.
+
+    The requests are counted in windows of REQUEST_TIMING_WINDOW_SECONDS, and
+    only the last REQUEST_TIMING_WINDOWS windows are kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (window start, {view name: stats}) pairs, oldest first
+        self._windows = deque(maxlen=REQUEST_TIMING_WINDOWS)
+
+    @staticmethod
+    def _get_empty_stats():
+        return {
+            "buckets": [0] * (len(REQUEST_TIMING_BUCKETS) + 1),
+            "count": 0,
+            "duration": 0.0,
+            "db_duration": 0.0,
+            "queries": 0,
+        }
+
+    def record(self, view_name, duration, db_duration, query_count):
+        """Record a request to a view (with its durations in seconds)."""
+        now = time.monotonic()
+        window_start = now - now % REQUEST_TIMING_WINDOW_SECONDS
+        bucket = bisect_left(REQUEST_TIMING_BUCKETS, duration * 1000)
+        with self._lock:
+            if not self._windows or self._windows[-1][0] != window_start:
+                self._windows.append((window_start, {}))
+            view_stats = self._windows[-1][1].get(view_name)
+            if view_stats is None:
+                view_stats = self._windows[-1][1][view_name] = self._get_empty_stats()
+            view_stats["buckets"][bucket] += 1
+            view_stats["count"] += 1
+            view_stats["duration"] += duration
+            view_stats["db_duration"] += db_duration
+            view_stats["queries"] += query_count
+
+    def get_histograms(self):
+        """
+        Get the histograms of the views, for the requests of the recent windows.
+
+        Returns:
+            dict: Maps view name -> a dict of the count of requests, the mean wall
+                time and database time (in milliseconds), the mean number of
+                queries, the estimated 50th, 95th and 99th percentile wall times
+                (the upper bounds of their buckets, or None for the overflow
+                bucket), and the buckets, as a list of [upper bound, count] pairs.
+        """
+        oldest_window_start = (
+            time.monotonic() - REQUEST_TIMING_WINDOW_SECONDS * REQUEST_TIMING_WINDOWS
+        )
+        totals = {}
+        with self._lock:
+            for window_start, window in self._windows:
+                if window_start < oldest_window_start:
+                    continue
+                for view_name, view_stats in window.items():
+                    total = totals.get(view_name)
+                    if total is None:
+                        total = totals[view_name] = self._get_empty_stats()
+                    for bucket, count in enumerate(view_stats["buckets"]):
+                        total["buckets"][bucket] += count
+                    for key in ("count", "duration", "db_duration", "queries"):
+                        total[key] += view_stats[key]
+
+        bounds = [*REQUEST_TIMING_BUCKETS, None]
+        histograms = {}
+        for view_name, total in sorted(totals.items()):
+            histograms[view_name] = {
+                "count": total["count"],
+                "mean_ms": total["duration"] * 1000 / total["count"],
+                "mean_db_ms": total["db_duration"] * 1000 / total["count"],
+                "mean_queries": total["queries"] / total["count"],
+                "p50_ms": self._get_percentile(total, bounds, 0.5),
+                "p95_ms": self._get_percentile(total, bounds, 0.95),
+                "p99_ms": self._get_percentile(total, bounds, 0.99),
+                "buckets": [list(pair) for pair in zip(bounds, total["buckets"])],
+            }
+        return histograms
+
+    @staticmethod
+    def _get_percentile(total, bounds, fraction):
+        """Get the upper bound of the bucket that a percentile of the requests falls in."""
+        rank = fraction * total["count"]
+        cumulative_count = 0
+        for bound, count in zip(bounds, total["buckets"]):
+            cumulative_count += count
+            if cumulative_count >= rank:
+                return bound
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+#: The request timings of this process
+request_timings = RequestTimings()
+
+
+def get_view_name(request):
+    """Get the name of the view that handled a request."""
+    resolver_match = getattr(request, "resolver_match", None)
+    if resolver_match is None:
+        return UNRESOLVED_VIEW_NAME
+    return resolver_match.view_name
+
+
+class RequestTimingMiddleware:
+    """
+    Record the wall time, database time and number of queries of every request.
+
+    The timings are added to the response as a Server-Timing header (so they
+    show up in the browser's developer tools), recorded in the rolling
+    request_timings histograms, and requests slower than the
+    SLOW_REQUEST_THRESHOLD setting are logged with their slowest queries.
+    The queries are timed with a connection.execute_wrapper(), which only
+    adds a couple of clock reads to each query.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_timer = QueryTimer(settings.SLOW_REQUEST_LOGGED_QUERIES)
+        start = time.perf_counter()
+        with connection.execute_wrapper(query_timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view_name = get_view_name(request)
+        server_timing = 'total;dur={:.1f}, db;dur={:.1f};desc="{} queries"'.format(
+            duration * 1000, query_timer.duration * 1000, query_timer.count
+        )
+        if response.has_header("Server-Timing"):
+            server_timing = "{}, {}".format(response["Server-Timing"], server_timing)
+        response["Server-Timing"] = server_timing
+        request_timings.record(view_name, duration, query_timer.duration, query_timer.count)
+
+        if duration >= settings.SLOW_REQUEST_THRESHOLD:
+            logger.warning(
+                "Slow request: %s %s (%s) took %.1fms, with %d queries taking %.1fms. "
+                "The slowest queries:\n%s",
+                request.method,
+                request.path,
+                view_name,
+                duration * 1000,
+                query_timer.count,
+                query_timer.duration * 1000,
+                "\n".join(
+                    "  {:.1f}ms: {}".format(query_duration * 1000, sql)
+                    for query_duration, sql in query_timer.get_slowest_queries()
+                ),
+            )
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.6 on 2026-10-18 01:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_monthly_category_totals(apps, schema_editor):
+    MonthlyCategoryTotal = apps.get_model("occurrence", "MonthlyCategoryTotal")
+    for transaction_type, model_name in [
+        ("expense", "ExpenseTransaction"),
+        ("income", "EarningTransaction"),
+    ]:
+        totals = (
+            apps.get_model("occurrence", model_name)
+            .objects.values("month_id", "category_id")
+            .order_by()
+            .annotate(amount=Sum("amount"), transaction_count=Count("id"))
+        )
+        MonthlyCategoryTotal.objects.bulk_create(
+            [MonthlyCategoryTotal(transaction_type=transaction_type, **total) for total in totals]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('occurrence', '0024_month_unique_year_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], help_text='Whether this is the total of ExpenseTransactions or EarningTransactions.', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='occurrence.category')),
+                ('month', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='occurrence.month')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'category', 'transaction_type'), name='unique_monthlycategorytotal_month_category_type')],
+            },
+        ),
+        migrations.RunPython(populate_monthly_category_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.6 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("occurrence", "0025_monthlycategorytotal"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="earningtransaction",
+            index=models.Index(
+                fields=["month", "category"], include=("amount",), name="earning_month_category_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="earningtransaction",
+            index=models.Index(
+                fields=["title", "date", "amount"], name="earning_title_date_amount_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="earningtransaction",
+            index=models.Index(
+                fields=["-date", "title", "amount"], name="earning_date_title_amount_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensetransaction",
+            index=models.Index(
+                fields=["month", "category"], include=("amount",), name="expense_month_category_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensetransaction",
+            index=models.Index(
+                fields=["title", "date", "amount"], name="expense_title_date_amount_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensetransaction",
+            index=models.Index(
+                fields=["-date", "title", "amount"], name="expense_date_title_amount_idx"
+            ),
+        ),
+    ]
@@ -1,6 +1,10 @@
+import time
+import uuid
 from datetime import date
 
-from django.db import models
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, models, transaction
 from django.utils.text import slugify
 
 from data_tools.models import CSVImport
@@ -84,6 +88,111 @@ class Month(models.Model):
         ]
 
 
+#: A process-local cache of Months, keyed by (year, month). Each Month is cached
+#: along with the version of the shared Month cache it was cached at (None if there
+#: is no shared cache).
+_month_cache = {}
+
+#: The key of the version of the shared Month cache, which is bumped whenever a
+#: Month changes, so that the process-local caches of other processes are not used.
+MONTH_CACHE_VERSION_KEY = "occurrence:month-version"
+
+
+def _get_shared_month_cache():
+    """
+    Get the Django cache that Months are shared through between processes.
+
+    This is the cache named by the MONTH_CACHE_ALIAS setting, or None if the
+    setting is not set, in which case Months are only cached per process.
+    """
+    alias = getattr(settings, "MONTH_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _get_shared_month_cache_key(year, month):
+    return "occurrence:month:{}-{}".format(year, month)
+
+
+def get_cached_month(year, month):
+    """Get the cached Month for a year and month, or None if it is not cached.
+
+    With a shared cache, a Month in the process-local cache is only used if
+    the version of the shared cache has not changed since it was cached (so
+    a Month that another process changed or deleted is not used).
+    """
+    shared_cache = _get_shared_month_cache()
+    if shared_cache is None:
+        return _month_cache.get((year, month), (None, None))[1]
+
+    key = _get_shared_month_cache_key(year, month)
+    shared_values = shared_cache.get_many([MONTH_CACHE_VERSION_KEY, key])
+    shared_version = shared_values.get(MONTH_CACHE_VERSION_KEY)
+    version, cached_month = _month_cache.get((year, month), (None, None))
+    if cached_month is not None and shared_version is not None and version == shared_version:
+        return cached_month
+
+    cached_month = shared_values.get(key)
+    if cached_month is None:
+        _month_cache.pop((year, month), None)
+    elif shared_version is not None:
+        _month_cache[(year, month)] = (shared_version, cached_month)
+    return cached_month
+
+
+def cache_month(month):
+    """
+    Cache a Month, once the current database transaction has been committed.
+
+    A Month created in a transaction that is later rolled back must never be
+    cached, so the cache is only populated on commit (which happens right away
+    when there is no transaction).
+    """
+
+    def populate():
+        shared_cache = _get_shared_month_cache()
+        if shared_cache is None:
+            _month_cache[(month.year, month.month)] = (None, month)
+            return
+        shared_cache.add(MONTH_CACHE_VERSION_KEY, time.time_ns(), timeout=None)
+        shared_cache.set(_get_shared_month_cache_key(month.year, month.month), month)
+        shared_version = shared_cache.get(MONTH_CACHE_VERSION_KEY)
+        if shared_version is not None:
+            _month_cache[(month.year, month.month)] = (shared_version, month)
+
+    transaction.on_commit(populate)
+
+
+def uncache_month(year, month):
+    """Remove a Month from the caches (called when a Month is changed or deleted).
+
+    With a shared cache, the version of the shared cache is bumped, so that
+    other processes do not use the Month from their process-local caches.
+    This is done right away, and again when the current database transaction
+    is committed, so that the Month is not cached by another process before
+    the change is committed either.
+    """
+    _month_cache.pop((year, month), None)
+    if _get_shared_month_cache() is None:
+        return
+
+    def uncache():
+        shared_cache = _get_shared_month_cache()
+        shared_cache.delete(_get_shared_month_cache_key(year, month))
+        try:
+            shared_cache.incr(MONTH_CACHE_VERSION_KEY)
+        except ValueError:
+            # The version is not in the cache, so no process-local cache can be used
+            pass
+
+    uncache()
+    transaction.on_commit(uncache)
+
+
+def clear_month_cache():
+    """Empty the process-local Month cache."""
+    _month_cache.clear()
+
+
 def get_or_create_month_for_date_obj(date_obj):
     """Get or create a Month object for a date object.
 
@@ -91,11 +200,16 @@ def get_or_create_month_for_date_obj(date_obj):
     imports models, so importing utils from here would create a circular
     import.
 
-    Uses get_or_create() with the lookup restricted to year/month (name and
-    slug are only set on creation, via defaults), so this is safe under a
-    concurrent race: a losing insert re-fetches the winner's row instead of
-    raising an error.
+    Months are cached (see cache_month()), so this usually does not touch the
+    database. Otherwise, it uses get_or_create() with the lookup restricted to
+    year/month (name and slug are only set on creation, via defaults), so this
+    is safe under a concurrent race: a losing insert re-fetches the winner's
+    row instead of raising an error.
     """
+    month = get_cached_month(date_obj.year, date_obj.month)
+    if month is not None:
+        return month
+
     month, _ = Month.objects.get_or_create(
         year=date_obj.year,
         month=date_obj.month,
@@ -104,9 +218,137 @@ def get_or_create_month_for_date_obj(date_obj):
             "slug": slugify(date_obj.strftime("%B, %Y")),
         },
     )
+    cache_month(month)
     return month
 
 
+def get_or_create_months_for_dates(dates):
+    """Get or create the Months for many dates at once.
+
+    The cached Months are checked with a single query (so that a Month that
+    another process deleted is not used), Months that are not cached are
+    fetched with a single query, and any that do not exist yet are created
+    with a single bulk_create(). Conflicting inserts from a concurrent process
+    are ignored, and the winner's rows are re-fetched.
+
+    Args:
+        dates: An iterable of date objects.
+
+    Returns:
+        dict: Maps (year, month) -> Month, for the month of each date.
+    """
+    months = {}
+    missing_dates = {}
+    for date_obj in dates:
+        key = (date_obj.year, date_obj.month)
+        if key in months or key in missing_dates:
+            continue
+        month = get_cached_month(*key)
+        if month is None:
+            missing_dates[key] = date_obj
+        else:
+            months[key] = month
+    if months:
+        # A cached Month may have been deleted by a process whose deletion did not
+        # reach this process's cache, so check that the cached Months still exist
+        existing_ids = set(
+            Month.objects.filter(pk__in=[month.pk for month in months.values()]).values_list(
+                "pk", flat=True
+            )
+        )
+        for key, month in list(months.items()):
+            if month.pk not in existing_ids:
+                uncache_month(*key)
+                del months[key]
+                missing_dates[key] = date(*key, 1)
+    if not missing_dates:
+        return months
+
+    def fetch_missing_months():
+        years = {year for year, _ in missing_dates}
+        for month in Month.objects.filter(year__in=years):
+            key = (month.year, month.month)
+            if key in missing_dates:
+                months[key] = month
+                cache_month(month)
+
+    fetch_missing_months()
+    months_to_create = [
+        Month(
+            year=date_obj.year,
+            month=date_obj.month,
+            name=date_obj.strftime("%B, %Y"),
+            slug=slugify(date_obj.strftime("%B, %Y")),
+        )
+        for key, date_obj in missing_dates.items()
+        if key not in months
+    ]
+    if months_to_create:
+        Month.objects.bulk_create(months_to_create, ignore_conflicts=True)
+        fetch_missing_months()
+        # bulk_create() does not send post_save, so bump the data version of the
+        # structure here (utils imports models, so it can only be imported here)
+        from .utils import bump_report_data_versions
+
+        bump_report_data_versions(structure=True)
+    return months
+
+
+def get_or_create_months_for_date_range(start_date, end_date):
+    """Get or create every Month from start_date through end_date (inclusive).
+
+    Returns:
+        dict: Maps (year, month) -> Month, for each month in the range.
+    """
+    dates = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        dates.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return get_or_create_months_for_dates(dates)
+
+
+# The number of times a Transaction is saved with a new slug, when its slug is taken
+TRANSACTION_SLUG_ATTEMPTS = 5
+# The length of the random suffix of the slugs created with create_transaction_slug()
+TRANSACTION_SLUG_SUFFIX_LENGTH = 10
+
+
+def create_transaction_slug(title, date_obj, unique_suffix=False, max_length=50):
+    """
+    Create a slug for a Transaction, based on its title and date.
+
+    If unique_suffix is True, some random characters are added to the end of the
+    slug, so that it is unique without checking the database. The title part of
+    the slug is shortened, so that the slug fits in max_length characters.
+    """
+    date_part = date_obj.strftime("%Y-%m-%d")
+    suffix = ""
+    if unique_suffix:
+        suffix = "-{}".format(uuid.uuid4().hex[:TRANSACTION_SLUG_SUFFIX_LENGTH])
+    title_length = max_length - len(date_part) - len(suffix) - 1
+    title_part = slugify(title)[:title_length].strip("-")
+    return "{}-{}{}".format(title_part, date_part, suffix)
+
+
+def set_unique_transaction_slugs(transactions):
+    """
+    Give unsaved Transactions unique slugs, without checking the database.
+
+    This is for Transactions that are created with bulk_create(), which does
+    not call save(). Each slug has a random suffix, and no two of the
+    Transactions get the same slug.
+    """
+    slugs = set()
+    for transaction_obj in transactions:
+        slug = create_transaction_slug(transaction_obj.title, transaction_obj.date, True)
+        while slug in slugs:
+            slug = create_transaction_slug(transaction_obj.title, transaction_obj.date, True)
+        slugs.add(slug)
+        transaction_obj.slug = slug
+    return transactions
+
+
 class TransactionBase(models.Model):
     """An abstract base model for Transaction-like models."""
 
@@ -136,33 +378,38 @@ class TransactionBase(models.Model):
         return "{} - {}".format(self.title, self.date.strftime("%Y-%m-%d"))
 
     def save(self, *args, **kwargs):
-        """Make sure the slug field is unique, and associate with a Month."""
-        # If the current slug would interfere with other current slugs, then try
-        # to find a new one
-        if (
-            not self.slug
-            or self.__class__.objects.exclude(pk=self.pk).filter(slug=self.slug).exists()
-        ):
-            # Create a potential_slug based on title and self.date (including year,
-            # month, day)
-            potential_slug = "{}-{}".format(slugify(self.title), self.date.strftime("%Y-%m-%d"))
-            # Does a Transaction with this slug already exist?
-            count_slugs_same_beginning = self.__class__.objects.filter(
-                slug__startswith=potential_slug
-            ).count()
-            if count_slugs_same_beginning > 0:
-                # The new slug will have a suffix 1 greater than the number of
-                # slugs that begin with potential_slug.
-                suffix = f"_{count_slugs_same_beginning + 1}"
-                potential_slug += suffix
-
-            # This is a unique slug, so set it to self.slug
-            self.slug = potential_slug
-
+        """Make sure the slug field is unique, and associate with a Month.
+
+        The slug is not checked before saving. If it is already taken, the save
+        fails with an IntegrityError, and is retried with a slug that has a random
+        suffix (see create_transaction_slug()).
+        """
+        if not self.slug:
+            self.slug = create_transaction_slug(self.title, self.date)
+
+        # Remember the Month this Transaction was in before saving, so that the
+        # MonthlyCategoryTotals of both Months can be refreshed if it moves
+        self._previous_month_id = self.month_id
         # Associate this Transaction with the correct Month for its date
         self.month = get_or_create_month_for_date_obj(self.date)
 
-        super().save(*args, **kwargs)
+        for attempt in range(1, TRANSACTION_SLUG_ATTEMPTS + 1):
+            try:
+                # Save in a savepoint, so that a failed save does not break the
+                # current database transaction
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # Only retry if the error was caused by the slug being taken
+                if (
+                    attempt == TRANSACTION_SLUG_ATTEMPTS
+                    or not self.__class__.objects.exclude(pk=self.pk)
+                    .filter(slug=self.slug)
+                    .exists()
+                ):
+                    raise
+                self.slug = create_transaction_slug(self.title, self.date, unique_suffix=True)
 
     class Meta:
         abstract = True
@@ -183,6 +430,18 @@ class ExpenseTransaction(TransactionBase):
             "title",
             "amount",
         )
+        indexes = [
+            # For the totals of each Category in a Month (see MonthlyCategoryTotal)
+            models.Index(
+                fields=["month", "category"],
+                include=["amount"],
+                name="expense_month_category_idx",
+            ),
+            # For finding duplicates when importing CSV files
+            models.Index(fields=["title", "date", "amount"], name="expense_title_date_amount_idx"),
+            # For the default ordering
+            models.Index(fields=["-date", "title", "amount"], name="expense_date_title_amount_idx"),
+        ]
 
 
 class EarningTransaction(TransactionBase):
@@ -200,6 +459,18 @@ class EarningTransaction(TransactionBase):
             "title",
             "amount",
         )
+        indexes = [
+            # For the totals of each Category in a Month (see MonthlyCategoryTotal)
+            models.Index(
+                fields=["month", "category"],
+                include=["amount"],
+                name="earning_month_category_idx",
+            ),
+            # For finding duplicates when importing CSV files
+            models.Index(fields=["title", "date", "amount"], name="earning_title_date_amount_idx"),
+            # For the default ordering
+            models.Index(fields=["-date", "title", "amount"], name="earning_date_title_amount_idx"),
+        ]
 
 
 class Statistic(models.Model):
@@ -254,3 +525,36 @@ class ExpectedMonthlyCategoryTotal(models.Model):
             )
         ]
         ordering = ["category__order"]
+
+
+class MonthlyCategoryTotal(models.Model):
+    """
+    The total amount and count of a Category's transactions in a Month.
+
+    This is a summary of the ExpenseTransaction and EarningTransaction tables,
+    so that totals pages don't have to aggregate the transactions themselves.
+    It is kept up to date by utils.refresh_monthly_category_totals(), which is
+    called whenever transactions are saved, deleted or bulk created, and can be
+    rebuilt with the rebuild_monthly_category_totals management command.
+    """
+
+    month = models.ForeignKey(Month, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    transaction_type = models.CharField(
+        max_length=20,
+        choices=Category.TYPE_CHOICES,
+        help_text="Whether this is the total of ExpenseTransactions or EarningTransactions.",
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_count = models.PositiveIntegerField()
+
+    def __str__(self):
+        return "Total for {} in {}".format(self.category, self.month)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "category", "transaction_type"],
+                name="unique_monthlycategorytotal_month_category_type",
+            )
+        ]
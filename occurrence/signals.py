@@ -0,0 +1,73 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from data_tools.models import TitleMapping
+
+from . import models, utils
+
+
+@receiver(post_save, sender=models.Month)
+@receiver(post_delete, sender=models.Month)
+def uncache_changed_month(sender, instance, **kwargs):
+    """Make sure a changed or deleted Month is not served from the Month caches."""
+    models.uncache_month(instance.year, instance.month)
+
+
+@receiver(post_save, sender=models.ExpenseTransaction)
+@receiver(post_save, sender=models.EarningTransaction)
+def refresh_totals_for_saved_transaction(sender, instance, **kwargs):
+    """Refresh the MonthlyCategoryTotals of the Month(s) a saved transaction is (or was) in."""
+    previous_month_id = getattr(instance, "_previous_month_id", None)
+    utils.refresh_monthly_category_totals(
+        [instance.month_id, previous_month_id],
+        type_cats=[utils.get_transaction_type_cat(sender)],
+    )
+
+
+@receiver(post_delete, sender=models.ExpenseTransaction)
+@receiver(post_delete, sender=models.EarningTransaction)
+def refresh_totals_for_deleted_transaction(sender, instance, **kwargs):
+    """Refresh the MonthlyCategoryTotals of the Month a deleted transaction was in."""
+    utils.refresh_monthly_category_totals(
+        [instance.month_id], type_cats=[utils.get_transaction_type_cat(sender)]
+    )
+
+
+@receiver(post_save, sender=models.ExpectedMonthlyCategoryTotal)
+@receiver(post_delete, sender=models.ExpectedMonthlyCategoryTotal)
+@receiver(post_save, sender=models.MonthlyStatistic)
+@receiver(post_delete, sender=models.MonthlyStatistic)
+def bump_report_data_version_for_month(sender, instance, **kwargs):
+    """Make sure the reports of the Month of a changed budget row or statistic are not cached."""
+    utils.bump_report_data_versions([instance.month_id])
+
+
+@receiver(post_save, sender=models.Category)
+@receiver(post_delete, sender=models.Category)
+@receiver(post_save, sender=models.Statistic)
+@receiver(post_delete, sender=models.Statistic)
+@receiver(post_save, sender=models.Month)
+@receiver(post_delete, sender=models.Month)
+def bump_report_data_version_for_structure(sender, instance, **kwargs):
+    """Make sure no reports are cached after a Category, Statistic or Month changes."""
+    utils.bump_report_data_versions(structure=True)
+
+
+@receiver(post_save, sender=models.ExpenseTransaction)
+@receiver(post_save, sender=models.EarningTransaction)
+@receiver(post_delete, sender=models.ExpenseTransaction)
+@receiver(post_delete, sender=models.EarningTransaction)
+def bump_title_index_version_for_transaction(sender, instance, created=False, **kwargs):
+    """Make sure the TitleIndexes don't keep the title of a changed or deleted transaction.
+
+    New transactions are added to the indexes without reloading them.
+    """
+    if not created:
+        utils.bump_title_index_version([utils.get_transaction_type_cat(sender)])
+
+
+@receiver(post_save, sender=TitleMapping)
+@receiver(post_delete, sender=TitleMapping)
+def bump_title_index_version_for_title_mapping(sender, instance, **kwargs):
+    """Make sure the TitleIndexes have the canonical titles of the current TitleMappings."""
+    utils.bump_title_index_version()
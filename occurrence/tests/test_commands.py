@@ -1,11 +1,21 @@
+import csv
+import importlib
+import json
+import sys
+import tempfile
 from decimal import Decimal
 from io import StringIO
+from pathlib import Path
+from unittest import mock
 
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Sum
 from django.test import TestCase
 
 from .. import models
+from ..management.commands.explain_view_queries import get_scans
 from . import factories
 
 
@@ -22,15 +32,21 @@ class CreateMonthlyStatisticsForMonthTestCase(TestCase):
         call_command("create_monthlystatistics_for_month", *args, **kwargs)
 
     def test_no_month_slug(self):
-        """Calling create_monthlystatistics_for_month without month_slug raises an error."""
+        """Calling create_monthlystatistics_for_month without any Months raises an error."""
         factories.StatisticFactory()
         with self.assertRaises(CommandError) as error:
             self.call_command()
         self.assertEqual(
             str(error.exception),
-            "Error: the following arguments are required: month_slug",
+            "Give a month_slug, --start-month and/or --end-month, or --all-missing.",
         )
 
+    def test_month_slug_and_range(self):
+        """A month_slug can't be combined with a range of Months."""
+        month = factories.MonthFactory()
+        with self.assertRaises(CommandError):
+            self.call_command(month.slug, "--all-missing")
+
     def test_no_months(self):
         """Calling create_monthlystatistics_for_month when no Months exist raises an error."""
         factories.StatisticFactory()
@@ -91,3 +107,300 @@ class CreateMonthlyStatisticsForMonthTestCase(TestCase):
             list(models.MonthlyStatistic.objects.values_list("amount", flat=True)),
             [Decimal("0")],
         )
+
+    def test_rerun(self):
+        """Running the command again only creates the MonthlyStatistics that are missing."""
+        month = factories.MonthFactory()
+        statistic1 = factories.StatisticFactory()
+        self.call_command(month.slug, amount=Decimal("5"))
+        statistic2 = factories.StatisticFactory()
+
+        self.call_command(month.slug)
+
+        self.assertEqual(
+            dict(models.MonthlyStatistic.objects.values_list("statistic", "amount")),
+            {statistic1.pk: Decimal("5"), statistic2.pk: Decimal("0")},
+        )
+
+    def test_range(self):
+        """The missing MonthlyStatistics are created for each Month in a range."""
+        months = [
+            factories.MonthFactory(year=year, month=month)
+            for year, month in [(2022, 11), (2022, 12), (2023, 1), (2023, 2)]
+        ]
+        statistic = factories.StatisticFactory()
+        factories.MonthlyStatisticFactory(statistic=statistic, month=months[2])
+
+        # The 2 Months, the Statistics, the Months in the range, the existing
+        # MonthlyStatistics, and the insert (in a savepoint)
+        with self.assertNumQueries(8):
+            self.call_command("--start-month", months[1].slug, "--end-month", months[2].slug)
+
+        self.assertEqual(
+            sorted(models.MonthlyStatistic.objects.values_list("month__year", "month__month")),
+            [(2022, 12), (2023, 1)],
+        )
+        self.assertIn("Successfully created 1 MonthlyStatistic(s).", self.stdout.getvalue())
+
+    def test_created_concurrently(self):
+        """MonthlyStatistics that are created concurrently are not created again, or reported."""
+        month = factories.MonthFactory()
+        statistic1 = factories.StatisticFactory()
+        statistic2 = factories.StatisticFactory()
+        atomic = transaction.atomic
+        created_by_another_process = []
+
+        def atomic_after_another_process(*args, **kwargs):
+            # Create one of the MonthlyStatistics right before they are inserted
+            if not created_by_another_process:
+                created_by_another_process.append(True)
+                factories.MonthlyStatisticFactory(statistic=statistic1, month=month, amount=5)
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(transaction, "atomic", atomic_after_another_process):
+            self.call_command(month.slug)
+
+        self.assertEqual(
+            dict(models.MonthlyStatistic.objects.values_list("statistic", "amount")),
+            {statistic1.pk: Decimal("5"), statistic2.pk: Decimal("0")},
+        )
+        self.assertIn("Successfully created 1 MonthlyStatistic(s).", self.stdout.getvalue())
+
+    def test_all_missing(self):
+        """With --all-missing, the missing MonthlyStatistics are created for every Month."""
+        months = [factories.MonthFactory(year=2020 + offset, month=6) for offset in range(3)]
+        statistics = factories.StatisticFactory.create_batch(2)
+        factories.MonthlyStatisticFactory(statistic=statistics[0], month=months[1])
+
+        self.call_command("--all-missing")
+
+        self.assertEqual(models.MonthlyStatistic.objects.count(), 6)
+
+    def test_copy_previous(self):
+        """With --copy-previous, the last amount of each Statistic is carried forward."""
+        months = [
+            factories.MonthFactory(year=year, month=month)
+            for year, month in [(2022, 11), (2022, 12), (2023, 1), (2023, 2)]
+        ]
+        statistic1 = factories.StatisticFactory()
+        statistic2 = factories.StatisticFactory()
+        factories.MonthlyStatisticFactory(statistic=statistic1, month=months[0], amount=100)
+        factories.MonthlyStatisticFactory(statistic=statistic1, month=months[2], amount=300)
+
+        self.call_command("--start-month", months[1].slug, "--copy-previous", amount=Decimal("7"))
+
+        amounts = {
+            (statistic_id, month_id): amount
+            for statistic_id, month_id, amount in models.MonthlyStatistic.objects.values_list(
+                "statistic", "month", "amount"
+            )
+        }
+        self.assertEqual(
+            amounts,
+            {
+                (statistic1.pk, months[0].pk): Decimal("100"),
+                (statistic1.pk, months[1].pk): Decimal("100"),
+                (statistic1.pk, months[2].pk): Decimal("300"),
+                (statistic1.pk, months[3].pk): Decimal("300"),
+                (statistic2.pk, months[1].pk): Decimal("7"),
+                (statistic2.pk, months[2].pk): Decimal("7"),
+                (statistic2.pk, months[3].pk): Decimal("7"),
+            },
+        )
+
+
+class RebuildMonthlyCategoryTotalsTestCase(TestCase):
+    """Test the 'rebuild_monthly_category_totals' management command."""
+
+    def test_success(self):
+        """The MonthlyCategoryTotals are rebuilt from the transactions."""
+        transaction = factories.ExpenseTransactionFactory(amount=Decimal("10.00"))
+        models.MonthlyCategoryTotal.objects.all().delete()
+        stdout = StringIO()
+
+        call_command("rebuild_monthly_category_totals", stdout=stdout)
+
+        monthly_category_total = models.MonthlyCategoryTotal.objects.get()
+        self.assertEqual(monthly_category_total.month, transaction.month)
+        self.assertEqual(monthly_category_total.category, transaction.category)
+        self.assertEqual(monthly_category_total.amount, Decimal("10.00"))
+        self.assertEqual(monthly_category_total.transaction_count, 1)
+        self.assertIn("Successfully rebuilt 1 MonthlyCategoryTotal(s).", stdout.getvalue())
+
+
+class ExplainViewQueriesTestCase(TestCase):
+    """Test the 'explain_view_queries' management command."""
+
+    def setUp(self):
+        super().setUp()
+        self.transaction = factories.ExpenseTransactionFactory()
+        factories.MonthlyStatisticFactory(month=self.transaction.month)
+
+    def test_success(self):
+        """The queries of each view are explained."""
+        stdout = StringIO()
+
+        call_command("explain_view_queries", "--plans", stdout=stdout)
+
+        output = stdout.getvalue()
+        for view_name in [
+            "transactions",
+            "totals",
+            "running_totals",
+            "budget",
+            "statistics_chart_view",
+        ]:
+            with self.subTest(view_name):
+                self.assertIn("{}\n  query 1: indexes: ".format(view_name), output)
+        self.assertIn("occurrence_expensetransaction", output)
+        self.assertIn("Explained ", output)
+
+    def test_month(self):
+        """The views are requested for the Month given with --month."""
+        stdout = StringIO()
+
+        call_command("explain_view_queries", "--month", self.transaction.month.slug, stdout=stdout)
+
+        self.assertIn("Explained ", stdout.getvalue())
+
+    def test_month_does_not_exist(self):
+        """A Month that does not exist raises an error."""
+        with self.assertRaisesMessage(CommandError, "Month 'nope' does not exist."):
+            call_command("explain_view_queries", "--month", "nope")
+
+    def test_without_factory_boy(self):
+        """The command can be imported without factory_boy (which is only a dev requirement)."""
+        modules = {
+            "factory": None,
+            "occurrence.tests.factories": None,
+            "occurrence.benchmarks": None,
+            "occurrence.management.commands.explain_view_queries": None,
+        }
+        tests_package = sys.modules["occurrence.tests"]
+        with mock.patch.dict(sys.modules, modules), mock.patch.dict(vars(tests_package)):
+            del sys.modules["occurrence.benchmarks"]
+            del sys.modules["occurrence.management.commands.explain_view_queries"]
+            del vars(tests_package)["factories"]
+
+            command = importlib.import_module("occurrence.management.commands.explain_view_queries")
+
+        self.assertTrue(hasattr(command, "Command"))
+
+    def test_get_scans(self):
+        """The indexes and sequential scans are found in a query plan."""
+        plan_lines = [
+            "Sort  (cost=1.1..1.2 rows=1 width=8)",
+            "  ->  Index Scan using expense_month_category_idx on occurrence_expensetransaction",
+            "  ->  Bitmap Index Scan on occurrence_month_slug_key",
+            "  ->  Seq Scan on occurrence_category",
+        ]
+        self.assertEqual(
+            get_scans(plan_lines),
+            (
+                ["expense_month_category_idx", "occurrence_month_slug_key"],
+                ["occurrence_category"],
+            ),
+        )
+
+
+class SeedBenchmarkDataTestCase(TestCase):
+    """Test the 'seed_benchmark_data' management command."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(models.clear_month_cache)
+
+    def test_success(self):
+        """A year of data is created, along with a CSV file."""
+        stdout = StringIO()
+        with tempfile.TemporaryDirectory() as csv_dir:
+            call_command(
+                "seed_benchmark_data",
+                "--years=1",
+                "--transactions-per-month=5",
+                "--end-year=2019",
+                "--csv-dir",
+                csv_dir,
+                "--csv-rows",
+                "20",
+                stdout=stdout,
+            )
+            with (Path(csv_dir) / "benchmark_20.csv").open() as csv_file:
+                rows = list(csv.DictReader(csv_file))
+
+        self.assertEqual(
+            sorted(models.Month.objects.values_list("year", "month")),
+            [(2019, month) for month in range(1, 13)],
+        )
+        self.assertEqual(models.ExpenseTransaction.objects.count(), 12 * 5)
+        self.assertEqual(models.EarningTransaction.objects.count(), 12 * 4)
+        self.assertTrue(models.Category.objects.filter(parent__isnull=False).exists())
+        self.assertTrue(
+            models.Category.objects.filter(total_type=models.Category.TOTAL_TYPE_RUNNING).exists()
+        )
+        self.assertTrue(models.ExpectedMonthlyCategoryTotal.objects.exists())
+        self.assertEqual(
+            models.MonthlyStatistic.objects.count(), 12 * models.Statistic.objects.count()
+        )
+        self.assertEqual(
+            models.MonthlyCategoryTotal.objects.filter(
+                transaction_type=models.Category.TYPE_EXPENSE
+            ).aggregate(count=Sum("transaction_count"))["count"],
+            12 * 5,
+        )
+        self.assertEqual(len(rows), 20)
+        self.assertTrue(all(row["Transaction Date"].endswith("/2019") for row in rows))
+        self.assertIn("Successfully seeded 1 year(s) of data.", stdout.getvalue())
+
+        with self.subTest("Seeding again reuses the Categories and Statistics"):
+            category_count = models.Category.objects.count()
+            call_command("seed_benchmark_data", "--years=1", "--end-year=2019", stdout=StringIO())
+            self.assertEqual(models.Category.objects.count(), category_count)
+            self.assertEqual(models.ExpenseTransaction.objects.count(), 12 * 5 + 12 * 100)
+
+    def test_csv_dir_not_found(self):
+        """A missing --csv-dir raises an error."""
+        with self.assertRaises(CommandError):
+            call_command("seed_benchmark_data", "--csv-dir=/does/not/exist", stdout=StringIO())
+
+
+class RunBenchmarksTestCase(TestCase):
+    """Test the 'run_benchmarks' management command."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(models.clear_month_cache)
+
+    def test_success(self):
+        """The views and imports are measured, and the data is rolled back."""
+        stdout = StringIO()
+
+        call_command(
+            "run_benchmarks",
+            "--years",
+            "1",
+            "2",
+            "--transactions-per-month=2",
+            "--csv-rows=10",
+            "--repeat=1",
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+
+        output = json.loads(stdout.getvalue())
+        self.assertEqual([result["years"] for result in output["results"]], [1, 2])
+        self.assertEqual(output["results"][1]["counts"]["ExpenseTransaction"], 2 * 12 * 2)
+        for result in output["results"]:
+            self.assertEqual(
+                set(result["views"]),
+                {"transactions", "totals", "running_totals", "budget", "statistics_chart_view"},
+            )
+            self.assertEqual(set(result["imports"]), {"10"})
+            for measurements in [*result["views"].values(), *result["imports"].values()]:
+                self.assertEqual(
+                    set(measurements),
+                    {"wall_time_min", "wall_time_median", "queries", "peak_memory"},
+                )
+                self.assertGreater(measurements["queries"], 0)
+        self.assertFalse(models.Month.objects.exists())
+        self.assertFalse(models.ExpenseTransaction.objects.exists())
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import middleware
+from . import factories
+
+
+class RequestTimingMiddlewareTestCase(TestCase):
+    """Test the RequestTimingMiddleware."""
+
+    def setUp(self):
+        super().setUp()
+        middleware.request_timings.clear()
+        self.addCleanup(middleware.request_timings.clear)
+        self.month = factories.MonthFactory(year=2019, month=3)
+
+    def test_server_timing(self):
+        """The wall time, database time and number of queries are in the Server-Timing header."""
+        with self.assertNumQueries(5) as captured:
+            response = self.client.get(reverse("totals"), {"month": self.month.slug})
+
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^total;dur=\d+\.\d, db;dur=\d+\.\d;desc="{} queries"$'.format(
+                len(captured.captured_queries)
+            ),
+        )
+
+    def test_histograms(self):
+        """Requests are recorded in the histograms of their views."""
+        for _ in range(3):
+            self.client.get(reverse("totals"), {"month": self.month.slug})
+        self.client.get("/does-not-exist/")
+
+        histograms = middleware.request_timings.get_histograms()
+
+        self.assertEqual(set(histograms), {"totals", middleware.UNRESOLVED_VIEW_NAME})
+        self.assertEqual(histograms["totals"]["count"], 3)
+        self.assertEqual(histograms["totals"]["mean_queries"], 5)
+        self.assertEqual(sum(count for _, count in histograms["totals"]["buckets"]), 3)
+        self.assertEqual(histograms["totals"]["buckets"][-1][0], None)
+
+    def test_histograms_old_windows(self):
+        """Requests older than the windows that are kept are not included."""
+        with mock.patch("occurrence.middleware.time.monotonic", return_value=0):
+            middleware.request_timings.record("totals", 0.02, 0.01, 3)
+        with mock.patch("occurrence.middleware.time.monotonic", return_value=10_000):
+            middleware.request_timings.record("totals", 0.2, 0.1, 5)
+            histograms = middleware.request_timings.get_histograms()
+
+        self.assertEqual(histograms["totals"]["count"], 1)
+        self.assertEqual(histograms["totals"]["p50_ms"], 250)
+        self.assertEqual(histograms["totals"]["mean_queries"], 5)
+
+    def test_percentiles(self):
+        """The percentiles are the upper bounds of the buckets they fall in."""
+        for duration in [0.001] * 90 + [0.03] * 9 + [20]:
+            middleware.request_timings.record("totals", duration, 0, 1)
+
+        histograms = middleware.request_timings.get_histograms()
+
+        self.assertEqual(histograms["totals"]["p50_ms"], 5)
+        self.assertEqual(histograms["totals"]["p95_ms"], 50)
+        self.assertEqual(histograms["totals"]["p99_ms"], 50)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0, SLOW_REQUEST_LOGGED_QUERIES=2)
+    def test_slow_request_logged(self):
+        """Slow requests are logged, with their slowest queries."""
+        with self.assertLogs("occurrence.middleware", level="WARNING") as logs:
+            self.client.get(reverse("totals"), {"month": self.month.slug})
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Slow request: GET /totals/ (totals)", logs.output[0])
+        self.assertIn("with 5 queries", logs.output[0])
+        self.assertEqual(logs.output[0].count("ms: SELECT"), 2)
+
+    def test_fast_request_not_logged(self):
+        """Requests faster than SLOW_REQUEST_THRESHOLD are not logged."""
+        with self.assertNoLogs("occurrence.middleware"):
+            self.client.get(reverse("totals"), {"month": self.month.slug})
+
+
+class RequestTimingHistogramsViewTestCase(TestCase):
+    """Test the request_timing_histograms view."""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("request_timing_histograms")
+        middleware.request_timings.clear()
+        self.addCleanup(middleware.request_timings.clear)
+
+    def test_staff_only(self):
+        """Only staff users can see the request timings."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_get(self):
+        """The histograms are returned as JSON."""
+        user = User.objects.create_user("admin", password="password", is_staff=True)
+        self.client.force_login(user)
+        middleware.request_timings.record("totals", 0.02, 0.01, 3)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["views"]["totals"]["count"], 1)
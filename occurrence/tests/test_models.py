@@ -1,7 +1,11 @@
 from datetime import date
+from unittest import mock
 
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from .. import models
 from . import factories
@@ -144,6 +148,120 @@ class GetOrCreateMonthForDateObjTestCase(TestCase):
         self.assertNotEqual(month.slug, "")
 
 
+class MonthCacheTestCase(TestCase):
+    """Test case for the Month caches used by get_or_create_month_for_date_obj()."""
+
+    def setUp(self):
+        super().setUp()
+        # Cached Months would outlive the rolled-back test transaction
+        self.addCleanup(models.clear_month_cache)
+        self.addCleanup(cache.clear)
+
+    def test_committed_month_is_cached(self):
+        """Once the Month has been committed, later calls do not query the database."""
+        date_obj = date(year=2019, month=3, day=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            month = models.get_or_create_month_for_date_obj(date_obj)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(models.get_or_create_month_for_date_obj(date_obj), month)
+
+    def test_uncommitted_month_is_not_cached(self):
+        """A Month is not cached until its transaction commits, so a rollback is safe."""
+        date_obj = date(year=2019, month=3, day=1)
+        with self.captureOnCommitCallbacks(execute=False):
+            models.get_or_create_month_for_date_obj(date_obj)
+
+        self.assertIsNone(models.get_cached_month(2019, 3))
+
+    def test_deleted_month_is_uncached(self):
+        """Deleting a Month removes it from the cache."""
+        with self.captureOnCommitCallbacks(execute=True):
+            month = models.get_or_create_month_for_date_obj(date(year=2019, month=3, day=1))
+
+        month.delete()
+
+        self.assertIsNone(models.get_cached_month(2019, 3))
+
+    @override_settings(MONTH_CACHE_ALIAS="default")
+    def test_shared_cache(self):
+        """With MONTH_CACHE_ALIAS set, Months are also shared through the Django cache."""
+        with self.captureOnCommitCallbacks(execute=True):
+            month = models.get_or_create_month_for_date_obj(date(year=2019, month=3, day=1))
+        # Simulate another process, which has an empty process-local cache
+        models.clear_month_cache()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(models.get_cached_month(2019, 3), month)
+
+        month.delete()
+        models.clear_month_cache()
+        self.assertIsNone(models.get_cached_month(2019, 3))
+
+    @override_settings(MONTH_CACHE_ALIAS="default")
+    def test_shared_cache_month_deleted_by_another_process(self):
+        """A Month that another process deleted is not used from the process-local cache."""
+        with self.captureOnCommitCallbacks(execute=True):
+            month = models.get_or_create_month_for_date_obj(date(year=2019, month=3, day=1))
+        process_local_entry = models._month_cache[(2019, 3)]
+
+        month.delete()
+        # Simulate that the deletion happened in another process
+        models._month_cache[(2019, 3)] = process_local_entry
+
+        self.assertIsNone(models.get_cached_month(2019, 3))
+        new_month = models.get_or_create_month_for_date_obj(date(year=2019, month=3, day=1))
+        self.assertNotEqual(new_month.pk, month.pk)
+
+    def test_cached_month_deleted_by_another_process(self):
+        """get_or_create_months_for_dates() does not use a cached Month that was deleted."""
+        with self.captureOnCommitCallbacks(execute=True):
+            month = models.get_or_create_month_for_date_obj(date(year=2019, month=3, day=1))
+        # Simulate that the Month is deleted in another process
+        with mock.patch.object(models, "uncache_month"):
+            month.delete()
+        self.assertEqual(models.get_cached_month(2019, 3), month)
+
+        months = models.get_or_create_months_for_dates([date(year=2019, month=3, day=9)])
+
+        self.assertNotEqual(months[(2019, 3)].pk, month.pk)
+        self.assertTrue(models.Month.objects.filter(pk=months[(2019, 3)].pk).exists())
+        self.assertIsNone(models.get_cached_month(2019, 3))
+
+
+class GetOrCreateMonthsForDateRangeTestCase(TestCase):
+    """Test case for get_or_create_months_for_date_range() and ..._for_dates()."""
+
+    def test_creates_missing_months_in_bulk(self):
+        """Missing Months are created together, and existing Months are reused."""
+        existing_month = factories.MonthFactory(year=2019, month=12, name="December, 2019")
+
+        # 1 query for the existing Months, 1 to create, 1 to fetch the created Months
+        with self.assertNumQueries(3):
+            months = models.get_or_create_months_for_date_range(
+                date(year=2019, month=11, day=15), date(year=2020, month=2, day=3)
+            )
+
+        self.assertEqual(sorted(months), [(2019, 11), (2019, 12), (2020, 1), (2020, 2)])
+        self.assertEqual(months[(2019, 12)], existing_month)
+        self.assertEqual(months[(2020, 1)].name, "January, 2020")
+        self.assertEqual(months[(2020, 1)].slug, "january-2020")
+        self.assertEqual(models.Month.objects.count(), 4)
+
+    def test_all_months_exist(self):
+        """If all the Months exist, they are fetched with a single query."""
+        factories.MonthFactory(year=2020, month=1)
+        factories.MonthFactory(year=2020, month=2)
+
+        with self.assertNumQueries(1):
+            months = models.get_or_create_months_for_dates(
+                [date(year=2020, month=1, day=1), date(year=2020, month=2, day=9)]
+            )
+
+        self.assertEqual(len(months), 2)
+        self.assertEqual(models.Month.objects.count(), 2)
+
+
 class TransactionBaseMixin(object):
     """
     Mixin for Transaction-like models inheriting from TransactionBase.
@@ -200,16 +318,11 @@ class TransactionBaseMixin(object):
         # Creating it does not cause an error.
         self.factory(title=transaction1.title, date=transaction1.date, slug=unique_slug)
 
-        self.assertEqual(
-            set(transaction1.__class__.objects.values_list("slug", flat=True)),
-            set(
-                [
-                    "transaction-1-2017-05-01",
-                    "transaction-1-2017-05-01_2",
-                    "transaction-1-2017-05-01_3",
-                ]
-            ),
-        )
+        slugs = list(transaction1.__class__.objects.values_list("slug", flat=True))
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertIn(unique_slug, slugs)
+        for slug in slugs:
+            self.assertTrue(slug.startswith(unique_slug))
 
     def test_save_associate_month(self):
         """Saving a Transaction without a Month associates it with correct Month."""
@@ -268,6 +381,96 @@ class TransactionBaseMixin(object):
         self.assertEqual(models.Month.objects.filter(year=2022, month=3).count(), 1)
         self.assertEqual(transaction2.month, transaction1.month)
 
+    def test_save_without_slug(self):
+        """Saving a Transaction without a slug creates one from its title and date."""
+        test_date = date(year=2017, month=5, day=1)
+        category = self.factory().category
+        transaction1 = self.factory.build(
+            slug="", title="Transaction 1", date=test_date, category=category
+        )
+        transaction1.save()
+        self.assertEqual(transaction1.slug, "transaction-1-2017-05-01")
+
+        with self.subTest("Same title and date"):
+            transaction2 = self.factory.build(
+                slug="", title="Transaction 1", date=test_date, category=category
+            )
+            transaction2.save()
+            self.assertNotEqual(transaction2.slug, transaction1.slug)
+            self.assertTrue(transaction2.slug.startswith("transaction-1-2017-05-01-"))
+
+        with self.subTest("Long title"):
+            transaction3 = self.factory.build(
+                slug="", title="A very long title " * 10, category=category
+            )
+            transaction3.save()
+            self.assertLessEqual(len(transaction3.slug), 50)
+
+    def test_save_slug_taken_in_transaction(self):
+        """A taken slug does not break the database transaction the Transaction is saved in."""
+        transaction1 = self.factory()
+        with transaction.atomic():
+            transaction2 = self.factory(slug=transaction1.slug)
+            # The database transaction can still be used
+            self.assertEqual(self.model_class.objects.count(), 2)
+        self.assertNotEqual(transaction2.slug, transaction1.slug)
+
+    def test_save_slug_not_checked(self):
+        """The slug is not checked with a query before saving a new Transaction."""
+        transaction1 = self.factory()
+        transaction2 = self.factory.build(
+            slug="",
+            title="A different title",
+            date=transaction1.date,
+            month=transaction1.month,
+            category=transaction1.category,
+        )
+        with CaptureQueriesContext(connection) as queries:
+            transaction2.save()
+        for query in queries.captured_queries:
+            self.assertNotIn('."slug" =', query["sql"])
+            self.assertNotIn("LIKE", query["sql"])
+
+
+class SetUniqueTransactionSlugsTestCase(TestCase):
+    """Test case for the set_unique_transaction_slugs() function."""
+
+    def test_unique_slugs(self):
+        """Transactions with the same title and date get unique slugs, without any queries."""
+        transactions = [
+            factories.ExpenseTransactionFactory.build(
+                slug="", title="Same title", date=date(year=2017, month=5, day=1)
+            )
+            for _ in range(20)
+        ]
+
+        with self.assertNumQueries(0):
+            models.set_unique_transaction_slugs(transactions)
+
+        slugs = [transaction.slug for transaction in transactions]
+        self.assertEqual(len(set(slugs)), len(transactions))
+        for slug in slugs:
+            self.assertTrue(slug.startswith("same-title-2017-05-01-"))
+            self.assertLessEqual(len(slug), 50)
+
+    def test_bulk_create(self):
+        """The Transactions can be created with bulk_create()."""
+        month = models.get_or_create_month_for_date_obj(date(year=2017, month=5, day=1))
+        category = factories.ExpenseCategoryFactory()
+        transactions = [
+            models.ExpenseTransaction(
+                title="Same title",
+                date=date(year=2017, month=5, day=1),
+                month=month,
+                category=category,
+                amount=1,
+            )
+            for _ in range(3)
+        ]
+        models.set_unique_transaction_slugs(transactions)
+        models.ExpenseTransaction.objects.bulk_create(transactions)
+        self.assertEqual(models.ExpenseTransaction.objects.count(), 3)
+
 
 class TestExpenseTransaction(TestCase, TransactionBaseMixin):
     model_class = models.ExpenseTransaction
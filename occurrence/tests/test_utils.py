@@ -1,9 +1,13 @@
 import random
 from datetime import date, timedelta
 from decimal import Decimal
+from unittest import mock
 
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from data_tools.models import TitleMapping
 
 from .. import models, utils
 from . import factories
@@ -35,9 +39,20 @@ class GetExpensetransactionsRunningTotalsTestCase(TestCase):
 
     def test_correct_amount(self):
         """Test that the correct amounts are returned for ExpenseTransactions."""
-        trans1 = factories.ExpenseTransactionFactory(category=self.category)
-        trans2 = factories.ExpenseTransactionFactory(category=self.category)
-        trans3 = factories.ExpenseTransactionFactory(category=self.category)
+        trans1 = factories.ExpenseTransactionFactory(
+            category=self.category, date=date(2023, 1, 1), amount=Decimal("10.00")
+        )
+        trans2 = factories.ExpenseTransactionFactory(
+            category=self.category, date=date(2023, 1, 3), amount=Decimal("-50.00")
+        )
+        trans3 = factories.ExpenseTransactionFactory(
+            category=self.category, date=date(2023, 1, 2), amount=Decimal("5.50")
+        )
+        # A transaction in another running total Category does not affect the balance
+        factories.ExpenseTransactionFactory(
+            category=factories.CategoryFactory(total_type=models.Category.TOTAL_TYPE_RUNNING),
+            date=date(2023, 1, 1),
+        )
 
         results = utils.get_expensetransactions_running_totals(self.category)
 
@@ -48,9 +63,30 @@ class GetExpensetransactionsRunningTotalsTestCase(TestCase):
             set([trans1.id, trans2.id, trans3.id]),
         )
         # Each of the transactions now has a running_total_amount field, which
-        # is equal to its amount, multiplied by -1
-        for transaction in results:
-            self.assertEqual(transaction.running_total_amount, transaction.amount * -1)
+        # is the cumulative sum of the amounts (multiplied by -1) up to its date
+        self.assertEqual(
+            [(transaction.id, transaction.running_total_amount) for transaction in results],
+            [
+                (trans2.id, Decimal("34.50")),
+                (trans3.id, Decimal("-15.50")),
+                (trans1.id, Decimal("-10.00")),
+            ],
+        )
+
+    def test_running_total_of_a_slice(self):
+        """The running_total_amount of a slice of the results includes the earlier transactions."""
+        for day in range(1, 6):
+            factories.ExpenseTransactionFactory(
+                category=self.category, date=date(2023, 1, day), amount=Decimal("1.00")
+            )
+
+        results = utils.get_running_totals_transactions([self.category])
+
+        # The results are newest first, so the last 2 are the oldest transactions
+        self.assertEqual(
+            [transaction.running_total_amount for transaction in results[3:]],
+            [Decimal("-2.00"), Decimal("-1.00")],
+        )
 
     def test_not_running_total_category(self):
         """A category that does not have a total_type of TOTAL_TYPE_RUNNING."""
@@ -801,6 +837,73 @@ class GetTransactionsRegularTotalsProgressTestCase(TestCase):
         self.assertNotIn("progress_percent", results[category.id])
 
 
+class GetRegularTotalsTestCase(TestCase):
+    """Test case for the get_regular_totals() function."""
+
+    def setUp(self):
+        super().setUp()
+        self.month = factories.MonthFactory(year=2023, month=6, name="June, 2023")
+        self.other_month = factories.MonthFactory(year=2023, month=7, name="July, 2023")
+
+    def test_matches_get_transactions_regular_totals(self):
+        """The totals for each type_cat are the same as from get_transactions_regular_totals()."""
+        expense_parent = factories.ExpenseCategoryFactory()
+        expense_child = factories.ExpenseCategoryFactory(parent=expense_parent)
+        expense_category = factories.ExpenseCategoryFactory()
+        expense_budget_only = factories.ExpenseCategoryFactory(parent=expense_parent)
+        earning_category = factories.IncomeCategoryFactory()
+        earning_budget_only = factories.IncomeCategoryFactory()
+        running_category = factories.ExpenseCategoryFactory(
+            total_type=models.Category.TOTAL_TYPE_RUNNING
+        )
+        for month in [self.month, self.other_month]:
+            day = date(year=month.year, month=month.month, day=15)
+            for category in [expense_child, expense_category, running_category]:
+                factories.ExpenseTransactionFactory(category=category, date=day)
+            factories.EarningTransactionFactory(category=earning_category, date=day)
+        budget_totals = [
+            factories.ExpectedMonthlyCategoryTotalFactory(month=self.month, category=category)
+            for category in [
+                expense_parent,
+                expense_category,
+                expense_budget_only,
+                earning_budget_only,
+                running_category,
+            ]
+        ]
+        budget_by_category = {row.category_id: row.amount for row in budget_totals}
+
+        for month in [self.month, None]:
+            for budget_kwargs in [{}, {"budget_totals": budget_totals}]:
+                with self.subTest(month=month, budget=bool(budget_kwargs)):
+                    totals = utils.get_regular_totals(month, **budget_kwargs)
+                    for type_cat in [models.Category.TYPE_EXPENSE, models.Category.TYPE_EARNING]:
+                        self.assertEqual(
+                            totals[type_cat],
+                            utils.get_transactions_regular_totals(
+                                month,
+                                type_cat=type_cat,
+                                budget_by_category=budget_by_category if budget_kwargs else None,
+                            ),
+                        )
+
+    def test_num_queries(self):
+        """The totals for both type_cats are gotten in a single query."""
+        factories.ExpenseTransactionFactory(date=date(year=2023, month=6, day=15))
+        factories.EarningTransactionFactory(date=date(year=2023, month=6, day=15))
+        budget_totals = list(
+            models.ExpectedMonthlyCategoryTotal.objects.filter(month=self.month).select_related(
+                "category__parent"
+            )
+        )
+
+        with self.assertNumQueries(1):
+            totals = utils.get_regular_totals(self.month, budget_totals=budget_totals)
+
+        self.assertEqual(len(totals[models.Category.TYPE_EXPENSE][0]), 1)
+        self.assertEqual(len(totals[models.Category.TYPE_EARNING][0]), 1)
+
+
 class CreateUniqueSlugTestCase(TestCase):
     """Test case for the create_unique_slug() function."""
 
@@ -877,3 +980,551 @@ class CreateUniqueSlugTestCase(TestCase):
         ]:
             with self.assertRaises(AttributeError):
                 utils.create_unique_slug_for_transaction(invalid_value)
+
+
+class RefreshMonthlyCategoryTotalsTestCase(TestCase):
+    """Test case for the MonthlyCategoryTotals, and refresh_monthly_category_totals()."""
+
+    def setUp(self):
+        super().setUp()
+        self.expense_category = factories.ExpenseCategoryFactory()
+        self.earning_category = factories.IncomeCategoryFactory()
+
+    def get_totals(self):
+        return {
+            (t.month.year, t.month.month, t.category_id, t.transaction_type): (
+                t.amount,
+                t.transaction_count,
+            )
+            for t in models.MonthlyCategoryTotal.objects.select_related("month")
+        }
+
+    def test_kept_up_to_date_on_save_and_delete(self):
+        """Saving, moving and deleting transactions keeps the totals up to date."""
+        expense1 = factories.ExpenseTransactionFactory(
+            date=date(2020, 1, 5), amount=Decimal("10.00"), category=self.expense_category
+        )
+        factories.ExpenseTransactionFactory(
+            date=date(2020, 1, 6), amount=Decimal("2.50"), category=self.expense_category
+        )
+        earning = factories.EarningTransactionFactory(
+            date=date(2020, 1, 7), amount=Decimal("100.00"), category=self.earning_category
+        )
+        expense_key = (2020, 1, self.expense_category.id, models.Category.TYPE_EXPENSE)
+        earning_key = (2020, 1, self.earning_category.id, models.Category.TYPE_EARNING)
+
+        with self.subTest("Created"):
+            self.assertEqual(
+                self.get_totals(),
+                {expense_key: (Decimal("12.50"), 2), earning_key: (Decimal("100.00"), 1)},
+            )
+
+        with self.subTest("Moved to another Month"):
+            expense1.date = date(2020, 2, 1)
+            expense1.save()
+            self.assertEqual(
+                self.get_totals(),
+                {
+                    expense_key: (Decimal("2.50"), 1),
+                    (2020, 2, self.expense_category.id, models.Category.TYPE_EXPENSE): (
+                        Decimal("10.00"),
+                        1,
+                    ),
+                    earning_key: (Decimal("100.00"), 1),
+                },
+            )
+
+        with self.subTest("Deleted"):
+            expense1.delete()
+            earning.delete()
+            self.assertEqual(self.get_totals(), {expense_key: (Decimal("2.50"), 1)})
+
+    def test_rebuild(self):
+        """Refreshing every Month rebuilds the totals from the transactions."""
+        transaction = factories.ExpenseTransactionFactory(
+            date=date(2020, 1, 5), amount=Decimal("10.00"), category=self.expense_category
+        )
+        # QuerySet.update() does not send signals, so the totals are now stale
+        models.ExpenseTransaction.objects.filter(pk=transaction.pk).update(amount=Decimal("3"))
+        models.MonthlyCategoryTotal.objects.create(
+            month=factories.MonthFactory(year=2021, month=1),
+            category=self.expense_category,
+            transaction_type=models.Category.TYPE_EXPENSE,
+            amount=Decimal("1.00"),
+            transaction_count=1,
+        )
+
+        utils.refresh_monthly_category_totals()
+
+        self.assertEqual(
+            self.get_totals(),
+            {(2020, 1, self.expense_category.id, models.Category.TYPE_EXPENSE): (Decimal("3"), 1)},
+        )
+
+    def test_no_months(self):
+        """Refreshing an empty list of Months does nothing."""
+        with self.assertNumQueries(0):
+            utils.refresh_monthly_category_totals([None])
+
+
+@override_settings(REPORT_CACHE_ALIAS="default")
+class GetCachedReportDataTestCase(TestCase):
+    """Test case for the get_cached_report_data() and bump_report_data_versions() functions."""
+
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        self.month = factories.MonthFactory(year=2023, month=6, name="June, 2023")
+        self.other_month = factories.MonthFactory(year=2023, month=7, name="July, 2023")
+        self.compute = mock.Mock(side_effect=lambda: self.compute.call_count)
+
+    def test_cached(self):
+        """The data is computed once, and then served from the cache."""
+        for _ in range(2):
+            data = utils.get_cached_report_data("report", self.compute, month_ids=[self.month.pk])
+            self.assertEqual(data, 1)
+        self.assertEqual(self.compute.call_count, 1)
+
+    def test_params(self):
+        """The data is cached separately for different names and params."""
+        utils.get_cached_report_data("report", self.compute, params=[1])
+        utils.get_cached_report_data("report", self.compute, params=[2])
+        utils.get_cached_report_data("other-report", self.compute, params=[1])
+        self.assertEqual(self.compute.call_count, 3)
+
+    def test_bump_month(self):
+        """Bumping the version of a Month only recomputes the data of that Month."""
+        month_data = utils.get_cached_report_data(
+            "report", self.compute, params=["month"], month_ids=[self.month.pk]
+        )
+        other_month_data = utils.get_cached_report_data(
+            "report", self.compute, params=["other_month"], month_ids=[self.other_month.pk]
+        )
+        all_months_data = utils.get_cached_report_data("report", self.compute, params=["all"])
+
+        utils.bump_report_data_versions([self.month.pk])
+
+        # The data of the Month, and the data for all Months are recomputed
+        self.assertNotEqual(
+            utils.get_cached_report_data(
+                "report", self.compute, params=["month"], month_ids=[self.month.pk]
+            ),
+            month_data,
+        )
+        self.assertNotEqual(
+            utils.get_cached_report_data("report", self.compute, params=["all"]),
+            all_months_data,
+        )
+        # The data of the other Month is still cached
+        self.assertEqual(
+            utils.get_cached_report_data(
+                "report", self.compute, params=["other_month"], month_ids=[self.other_month.pk]
+            ),
+            other_month_data,
+        )
+
+    def test_bump_structure(self):
+        """Bumping the structure version recomputes the data of every Month."""
+        month_data = utils.get_cached_report_data("report", self.compute, month_ids=[self.month.pk])
+
+        utils.bump_report_data_versions(structure=True)
+
+        self.assertNotEqual(
+            utils.get_cached_report_data("report", self.compute, month_ids=[self.month.pk]),
+            month_data,
+        )
+
+    def test_changes_bump_versions(self):
+        """Changing the data of a Month bumps its version."""
+        category = factories.ExpenseCategoryFactory()
+        earning_category = factories.IncomeCategoryFactory()
+        statistic = factories.StatisticFactory()
+        changes = [
+            (
+                "ExpenseTransaction",
+                lambda: factories.ExpenseTransactionFactory(
+                    category=category, date=date(2023, 6, 1)
+                ),
+            ),
+            (
+                "EarningTransaction",
+                lambda: factories.EarningTransactionFactory(
+                    category=earning_category, date=date(2023, 6, 1)
+                ),
+            ),
+            (
+                "ExpectedMonthlyCategoryTotal",
+                lambda: factories.ExpectedMonthlyCategoryTotalFactory(
+                    month=self.month, category=category
+                ),
+            ),
+            (
+                "MonthlyStatistic",
+                lambda: factories.MonthlyStatisticFactory(month=self.month, statistic=statistic),
+            ),
+        ]
+        for model_name, change in changes:
+            with self.subTest(model_name):
+                month_data = utils.get_cached_report_data(
+                    "report", self.compute, month_ids=[self.month.pk]
+                )
+                other_month_data = utils.get_cached_report_data(
+                    "report", self.compute, month_ids=[self.other_month.pk]
+                )
+
+                change()
+
+                self.assertNotEqual(
+                    utils.get_cached_report_data("report", self.compute, month_ids=[self.month.pk]),
+                    month_data,
+                )
+                self.assertEqual(
+                    utils.get_cached_report_data(
+                        "report", self.compute, month_ids=[self.other_month.pk]
+                    ),
+                    other_month_data,
+                )
+
+    @override_settings(REPORT_CACHE_ALIAS=None)
+    def test_no_report_cache(self):
+        """When the REPORT_CACHE_ALIAS setting is None, the data is always computed."""
+        for _ in range(2):
+            utils.get_cached_report_data("report", self.compute, month_ids=[self.month.pk])
+        self.assertEqual(self.compute.call_count, 2)
+
+
+class GetTransactionsPageTestCase(TestCase):
+    """Test case for the get_transactions_page() function."""
+
+    def setUp(self):
+        super().setUp()
+        category = factories.ExpenseCategoryFactory()
+        # Transactions that tie on date, title and amount, so that each part of
+        # the ordering is used
+        self.transactions = [
+            factories.ExpenseTransactionFactory(
+                category=category, date=transaction_date, title=title, amount=amount
+            )
+            for transaction_date, title, amount in [
+                (date(2023, 6, 1), "A", Decimal("1.00")),
+                (date(2023, 6, 2), "A", Decimal("1.00")),
+                (date(2023, 6, 2), "A", Decimal("1.00")),
+                (date(2023, 6, 2), "A", Decimal("2.00")),
+                (date(2023, 6, 2), "B", Decimal("1.00")),
+                (date(2023, 6, 3), "A", Decimal("1.00")),
+            ]
+        ]
+        self.expected_order = list(
+            models.ExpenseTransaction.objects.order_by("-date", "title", "amount", "id")
+        )
+
+    def test_pages(self):
+        """Following the cursors gets all of the transactions, in order, with no repeats."""
+        for page_size in [1, 2, 4, 6, 10]:
+            with self.subTest(page_size=page_size):
+                transactions = []
+                cursor = None
+                while True:
+                    page, cursor = utils.get_transactions_page(
+                        models.ExpenseTransaction.objects.all(), page_size, after=cursor
+                    )
+                    self.assertLessEqual(len(page), page_size)
+                    transactions.extend(page)
+                    if cursor is None:
+                        break
+                self.assertEqual(transactions, self.expected_order)
+
+    def test_one_query(self):
+        """Each page is gotten with a single query."""
+        _, cursor = utils.get_transactions_page(models.ExpenseTransaction.objects.all(), 2)
+        with self.assertNumQueries(1):
+            page, _ = utils.get_transactions_page(
+                models.ExpenseTransaction.objects.all(), 2, after=cursor
+            )
+        self.assertEqual(page, self.expected_order[2:4])
+
+    def test_invalid_cursor(self):
+        """An invalid cursor raises a ValueError."""
+        for cursor in ["", "not-a-cursor", "WzEsIDJd", "WyJub3QgYSBkYXRlIiwgIkEiLCAiMSIsIDFd"]:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    utils.get_transactions_page(
+                        models.ExpenseTransaction.objects.all(), 2, after=cursor
+                    )
+
+
+class TitleIndexTestCase(TestCase):
+    """Test case for the TitleIndex class."""
+
+    def setUp(self):
+        super().setUp()
+        self.category = factories.ExpenseCategoryFactory()
+        for title, count in [("Coffee Shop", 3), ("Coffee Beans", 1), ("Cinema", 2)]:
+            for _ in range(count):
+                factories.ExpenseTransactionFactory(title=title, category=self.category)
+        factories.EarningTransactionFactory(title="Consulting")
+        TitleMapping.objects.create(source_title="COFFEE CO 123", canonical_title="Coffee Co")
+        self.index = utils.TitleIndex(models.Category.TYPE_EXPENSE)
+
+    def test_search(self):
+        """The titles that start with the prefix are returned, most used first."""
+        self.assertEqual(self.index.search("co"), ["Coffee Shop", "Coffee Beans", "Coffee Co"])
+        self.assertEqual(
+            self.index.search("C"), ["Coffee Shop", "Cinema", "Coffee Beans", "Coffee Co"]
+        )
+        self.assertEqual(self.index.search("coffee s"), ["Coffee Shop"])
+        self.assertEqual(self.index.search("tea"), [])
+
+    def test_limit(self):
+        """At most limit titles are returned."""
+        self.assertEqual(self.index.search("c", limit=2), ["Coffee Shop", "Cinema"])
+
+    def test_new_transactions(self):
+        """Transactions created after the index was loaded are added to it."""
+        self.index.search("c")
+        for _ in range(4):
+            factories.ExpenseTransactionFactory(title="Coffee Beans", category=self.category)
+        factories.ExpenseTransactionFactory(title="Cookies", category=self.category)
+
+        # Only the new transactions are queried
+        with self.assertNumQueries(1):
+            titles = self.index.search("co")
+
+        self.assertEqual(titles, ["Coffee Beans", "Coffee Shop", "Cookies", "Coffee Co"])
+
+    def test_rebuild(self):
+        """The index is reloaded after the rebuild_interval."""
+        self.index.search("c")
+        models.ExpenseTransaction.objects.filter(title="Cinema").delete()
+
+        self.assertIn("Cinema", self.index.search("c"))
+        self.index.rebuild_interval = 0
+        self.assertNotIn("Cinema", self.index.search("c"))
+
+    def test_changed_and_deleted_transactions(self):
+        """The index of this process is reloaded when a transaction is changed or deleted."""
+        self.addCleanup(utils.clear_title_indexes)
+        index = utils.get_title_index(models.Category.TYPE_EXPENSE)
+        index.search("c")
+
+        transaction = models.ExpenseTransaction.objects.get(title="Coffee Beans")
+        transaction.title = "Movies"
+        transaction.save()
+        self.assertEqual(index.search("m"), ["Movies"])
+        self.assertNotIn("Coffee Beans", index.search("c"))
+
+        transaction.delete()
+        self.assertEqual(index.search("m"), [])
+
+    def test_title_mappings(self):
+        """The index is reloaded when a TitleMapping changes."""
+        self.addCleanup(utils.clear_title_indexes)
+        index = utils.get_title_index(models.Category.TYPE_EXPENSE)
+        index.search("c")
+
+        TitleMapping.objects.create(source_title="CAFE 123", canonical_title="Cafe")
+
+        self.assertIn("Cafe", index.search("ca"))
+
+    @override_settings(TITLE_INDEX_CACHE_ALIAS="default")
+    def test_other_processes(self):
+        """With TITLE_INDEX_CACHE_ALIAS set, the indexes of other processes are reloaded too."""
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        self.index.search("c")
+        models.ExpenseTransaction.objects.filter(title="Cinema").update(title="Movies")
+
+        # Another process changed the titles (and self.index is not this process's index)
+        utils.bump_title_index_version([models.Category.TYPE_EXPENSE])
+
+        self.assertNotIn("Cinema", self.index.search("c"))
+        self.assertEqual(self.index.search("m"), ["Movies"])
+        # The version has not changed since, so the index is not reloaded again
+        with self.assertNumQueries(1):
+            self.index.search("m")
+
+
+class BulkSaveTransactionsTestCase(TestCase):
+    """Test the bulk_save_transactions() function."""
+
+    def setUp(self):
+        super().setUp()
+        self.category = factories.ExpenseCategoryFactory()
+        self.month = factories.MonthFactory(year=2019, month=3)
+        self.addCleanup(models.clear_month_cache)
+
+    def get_row(self, **kwargs):
+        row = {
+            "title": "Coffee",
+            "date": "2019-03-05",
+            "amount": "4.50",
+            "category": self.category.pk,
+        }
+        row.update(kwargs)
+        return row
+
+    def test_create(self):
+        """New transactions are created, with their Months and unique slugs."""
+        created, updated = utils.bulk_save_transactions(
+            models.Category.TYPE_EXPENSE,
+            [self.get_row(), self.get_row(), self.get_row(date="2019-04-01", pending=True)],
+        )
+
+        self.assertEqual(updated, [])
+        self.assertEqual(len(created), 3)
+        transactions = models.ExpenseTransaction.objects.order_by("date", "pk")
+        self.assertEqual(len(transactions), 3)
+        self.assertEqual(
+            [(t.month.year, t.month.month) for t in transactions],
+            [(2019, 3), (2019, 3), (2019, 4)],
+        )
+        self.assertEqual(transactions[0].amount, Decimal("4.50"))
+        self.assertEqual([t.pending for t in transactions], [False, False, True])
+        self.assertEqual(len({t.slug for t in transactions}), 3)
+        self.assertEqual(
+            models.MonthlyCategoryTotal.objects.get(month=self.month).amount, Decimal("9.00")
+        )
+
+    def test_update(self):
+        """Transactions with an id are updated, and the totals of their old Month are refreshed."""
+        transaction = factories.ExpenseTransactionFactory(
+            date=date(2019, 3, 10), amount=10, category=self.category
+        )
+        other_category = factories.ExpenseCategoryFactory()
+
+        created, updated = utils.bulk_save_transactions(
+            models.Category.TYPE_EXPENSE,
+            [
+                self.get_row(
+                    id=transaction.pk,
+                    title="Groceries",
+                    date="2019-05-02",
+                    amount="12",
+                    category=other_category.pk,
+                )
+            ],
+        )
+
+        self.assertEqual(created, [])
+        self.assertEqual(updated, [transaction])
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.title, "Groceries")
+        self.assertEqual(transaction.amount, Decimal("12"))
+        self.assertEqual(transaction.category, other_category)
+        self.assertEqual((transaction.month.year, transaction.month.month), (2019, 5))
+        self.assertFalse(models.MonthlyCategoryTotal.objects.filter(month=self.month).exists())
+        self.assertEqual(
+            models.MonthlyCategoryTotal.objects.get(month=transaction.month).amount, Decimal("12")
+        )
+
+    def test_partial_update(self):
+        """A row with an id only changes the fields that it has."""
+        transaction = factories.ExpenseTransactionFactory(
+            date=date(2019, 3, 10),
+            amount=10,
+            category=self.category,
+            description="important note",
+            pending=True,
+        )
+
+        utils.bulk_save_transactions(
+            models.Category.TYPE_EXPENSE, [{"id": transaction.pk, "amount": "12"}]
+        )
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.amount, Decimal("12"))
+        self.assertEqual(transaction.description, "important note")
+        self.assertTrue(transaction.pending)
+        self.assertEqual(transaction.category, self.category)
+        self.assertEqual(transaction.date, date(2019, 3, 10))
+
+    def test_repeated_id(self):
+        """A transaction can't be updated by more than one row."""
+        transaction = factories.ExpenseTransactionFactory(
+            date=date(2019, 3, 10), amount=10, category=self.category
+        )
+        rows = [
+            {"id": transaction.pk, "amount": "12"},
+            {"id": transaction.pk, "amount": "14"},
+        ]
+
+        with self.assertRaises(ValidationError) as context:
+            utils.bulk_save_transactions(models.Category.TYPE_EXPENSE, rows)
+
+        self.assertEqual(
+            context.exception.messages,
+            ["Row 1: id: {} is in more than one row".format(transaction.pk)],
+        )
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.amount, Decimal("10"))
+
+    def test_invalid_rows(self):
+        """Nothing is saved if any of the rows are not valid, and each error is reported."""
+        earning_category = factories.IncomeCategoryFactory()
+        rows = [
+            self.get_row(),
+            self.get_row(amount="a lot"),
+            self.get_row(category=earning_category.pk),
+            self.get_row(id=0),
+            self.get_row(title="", date="yesterday"),
+            "not a row",
+        ]
+
+        with self.assertRaises(ValidationError) as context:
+            utils.bulk_save_transactions(models.Category.TYPE_EXPENSE, rows)
+
+        messages = context.exception.messages
+        self.assertEqual(len(messages), 5)
+        self.assertTrue(messages[0].startswith("Row 1: amount"))
+        self.assertIn("Row 2: category", messages[1])
+        self.assertIn("Row 3: id: 0", messages[2])
+        self.assertIn("title", messages[3])
+        self.assertIn("date", messages[3])
+        self.assertTrue(messages[4].startswith("Row 5:"))
+        self.assertFalse(models.ExpenseTransaction.objects.exists())
+
+    def test_invalid_type_cat(self):
+        """An invalid type_cat raises a ValidationError."""
+        with self.assertRaises(ValidationError):
+            utils.bulk_save_transactions("other", [self.get_row()])
+
+    def test_num_queries(self):
+        """The number of queries does not depend on the number of rows."""
+        transactions = factories.ExpenseTransactionFactory.create_batch(
+            5, date=date(2019, 3, 1), category=self.category
+        )
+        rows = [self.get_row(date="2019-03-{:02d}".format(day)) for day in range(1, 21)]
+        rows += [self.get_row(id=transaction.pk) for transaction in transactions]
+
+        # The Categories, the existing transactions, the Months, bulk_create(),
+        # bulk_update(), the refresh of the totals, and the savepoints
+        with self.assertNumQueries(13):
+            utils.bulk_save_transactions(models.Category.TYPE_EXPENSE, rows)
+
+        self.assertEqual(models.ExpenseTransaction.objects.count(), 25)
+
+
+class FilterMonthRangeTestCase(TestCase):
+    """Test the filter_month_range() function."""
+
+    def test_filter_month_range(self):
+        """Only the rows whose Months are in the range (across years) are kept."""
+        for year, month in [(2022, 11), (2022, 12), (2023, 1), (2023, 2), (2023, 3)]:
+            factories.MonthlyStatisticFactory(month=factories.MonthFactory(year=year, month=month))
+
+        test_data = [
+            ((2022, 12), (2023, 2), [(2022, 12), (2023, 1), (2023, 2)]),
+            ((2023, 2), None, [(2023, 2), (2023, 3)]),
+            (None, (2022, 11), [(2022, 11)]),
+            ((2023, 3), (2022, 11), []),
+        ]
+        for start, end, expected_months in test_data:
+            with self.subTest(start=start, end=end):
+                monthly_statistics = utils.filter_month_range(
+                    models.MonthlyStatistic.objects.all(), start, end
+                ).order_by("month_index")
+                self.assertEqual(
+                    list(monthly_statistics.values_list("month__year", "month__month")),
+                    expected_months,
+                )
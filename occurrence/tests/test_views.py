@@ -1,14 +1,16 @@
 from datetime import date, datetime
 from decimal import Decimal
+from unittest import mock
 
+from django.core.cache import caches
 from django.forms.models import model_to_dict
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils.text import slugify
 
 from data_tools.models import CSVImport
 
-from .. import models
+from .. import models, utils
 from . import factories
 
 
@@ -26,6 +28,210 @@ class TestTransactionsView(TestCase):
         self.assertEqual(current_month.month, date.today().month)
         self.assertNotEqual(current_month.slug, "")
 
+    @mock.patch("occurrence.views.TRANSACTIONS_PAGE_SIZE", 2)
+    def test_load_more(self):
+        """The first page of transactions is shown, and the rest are loaded with more_transactions."""
+        month = factories.MonthFactory(year=2023, month=6, name="June, 2023")
+        expense_transactions = [
+            factories.ExpenseTransactionFactory(date=date(2023, 6, day)) for day in range(1, 6)
+        ]
+        earning_transaction = factories.EarningTransactionFactory(date=date(2023, 6, 1))
+        expense_transactions.sort(key=lambda transaction: transaction.date, reverse=True)
+
+        response = self.client.get(reverse(self.url_name), {"month": month.slug})
+
+        self.assertEqual(response.context["expense_transactions"], expense_transactions[:2])
+        self.assertEqual(response.context["earning_transactions"], [earning_transaction])
+        self.assertIsNone(response.context["earning_next_cursor"])
+        cursor = response.context["expense_next_cursor"]
+        self.assertContains(response, 'data-cursor="{}"'.format(cursor))
+
+        more_url = reverse("more_transactions")
+        for expected_transactions in [expense_transactions[2:4], expense_transactions[4:]]:
+            response = self.client.get(
+                more_url,
+                {"type_cat": models.Category.TYPE_EXPENSE, "month": month.slug, "after": cursor},
+            )
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            for transaction in expected_transactions:
+                self.assertIn('value="{}"'.format(transaction.id), data["html"])
+            self.assertEqual(data["html"].count("<tr>"), len(expected_transactions))
+            cursor = data["next_cursor"]
+        # There are no more transactions after the last page
+        self.assertIsNone(cursor)
+
+    def test_load_more_invalid(self):
+        """Invalid parameters for more_transactions return an error."""
+        month = factories.MonthFactory(year=2023, month=6, name="June, 2023")
+        more_url = reverse("more_transactions")
+
+        with self.subTest("Invalid type_cat"):
+            response = self.client.get(more_url, {"type_cat": "other", "month": month.slug})
+            self.assertEqual(response.status_code, 400)
+
+        with self.subTest("Invalid cursor"):
+            response = self.client.get(
+                more_url,
+                {"type_cat": models.Category.TYPE_EXPENSE, "month": month.slug, "after": "nope"},
+            )
+            self.assertEqual(response.status_code, 400)
+
+        with self.subTest("Month does not exist"):
+            response = self.client.get(
+                more_url, {"type_cat": models.Category.TYPE_EXPENSE, "month": "nope"}
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_months(self):
+        """The Months are listed by their slugs and names, newest first."""
+        month1 = factories.MonthFactory(year=2023, month=5, name="May, 2023")
+        month2 = factories.MonthFactory(year=2023, month=6, name="June, 2023")
+
+        response = self.client.get(reverse(self.url_name), {"month": month1.slug})
+
+        self.assertEqual(
+            response.context["months"],
+            [(month2.slug, month2.name), (month1.slug, month1.name)],
+        )
+
+    @override_settings(REPORT_CACHE_ALIAS="default")
+    def test_months_cached(self):
+        """The list of Months is cached until a Month is created."""
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        month = factories.MonthFactory(year=2023, month=5, name="May, 2023")
+        self.assertEqual(utils.get_month_list(), [(month.slug, month.name)])
+
+        with self.assertNumQueries(0):
+            utils.get_month_list()
+
+        models.get_or_create_months_for_dates([date(2023, 6, 1)])
+        self.assertEqual(len(utils.get_month_list()), 2)
+
+
+class TestTitleAutocompleteView(TestCase):
+    url_name = "title_autocomplete"
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(self.url_name)
+        self.addCleanup(utils.clear_title_indexes)
+
+    def test_get(self):
+        """The most used titles of the type_cat that start with the prefix are returned."""
+        category = factories.ExpenseCategoryFactory()
+        for title in ["Coffee Shop", "Coffee Shop", "Coffee Beans", "Tea"]:
+            factories.ExpenseTransactionFactory(title=title, category=category)
+        factories.EarningTransactionFactory(title="Consulting")
+
+        response = self.client.get(self.url, {"type_cat": models.Category.TYPE_EXPENSE, "q": "co"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"titles": ["Coffee Shop", "Coffee Beans"]})
+
+        with self.subTest("Earning titles"):
+            response = self.client.get(
+                self.url, {"type_cat": models.Category.TYPE_EARNING, "q": "co"}
+            )
+            self.assertEqual(response.json(), {"titles": ["Consulting"]})
+
+    def test_invalid_type_cat(self):
+        """An invalid type_cat returns an error."""
+        response = self.client.get(self.url, {"type_cat": "other", "q": "co"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_transactions_page_has_no_titles(self):
+        """The titles are not part of the transactions page."""
+        factories.ExpenseTransactionFactory(title="An old title", date=date(2017, 1, 1))
+        response = self.client.get(reverse("transactions"))
+        self.assertNotContains(response, "An old title")
+
+
+class TestBulkTransactionsView(TestCase):
+    url_name = "bulk_transactions"
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(self.url_name)
+        self.category = factories.ExpenseCategoryFactory()
+        self.addCleanup(models.clear_month_cache)
+
+    def post(self, data):
+        return self.client.post(self.url, data, content_type="application/json")
+
+    def test_post(self):
+        """Transactions are created and updated."""
+        transaction = factories.ExpenseTransactionFactory(category=self.category)
+        row = {
+            "title": "Coffee",
+            "date": "2019-03-05",
+            "amount": "4.50",
+            "category": self.category.pk,
+        }
+
+        response = self.post(
+            {
+                "type_cat": models.Category.TYPE_EXPENSE,
+                "transactions": [row, dict(row, id=transaction.pk, title="Tea")],
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        new_transaction = models.ExpenseTransaction.objects.get(title="Coffee")
+        self.assertEqual(
+            response.json(), {"created": [new_transaction.pk], "updated": [transaction.pk]}
+        )
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.title, "Tea")
+
+    def test_invalid(self):
+        """Errors are returned, and nothing is saved."""
+        row = {
+            "title": "Coffee",
+            "date": "2019-03-05",
+            "amount": "4.50",
+            "category": self.category.pk,
+        }
+        test_data = [
+            ("Not JSON", "{not json"),
+            ("Missing transactions", {"type_cat": models.Category.TYPE_EXPENSE}),
+            ("Not a list", {"type_cat": models.Category.TYPE_EXPENSE, "transactions": row}),
+            ("Invalid type_cat", {"type_cat": "other", "transactions": [row]}),
+            (
+                "Invalid row",
+                {
+                    "type_cat": models.Category.TYPE_EXPENSE,
+                    "transactions": [row, dict(row, amount="")],
+                },
+            ),
+        ]
+        for description, data in test_data:
+            with self.subTest(description):
+                response = self.post(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()["errors"])
+        self.assertFalse(models.ExpenseTransaction.objects.exists())
+
+    def test_too_many(self):
+        """At most BULK_TRANSACTIONS_MAX transactions can be saved at once."""
+        row = {
+            "title": "Coffee",
+            "date": "2019-03-05",
+            "amount": "4.50",
+            "category": self.category.pk,
+        }
+        with mock.patch("occurrence.views.BULK_TRANSACTIONS_MAX", 2):
+            response = self.post(
+                {"type_cat": models.Category.TYPE_EXPENSE, "transactions": [row] * 3}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.ExpenseTransaction.objects.exists())
+
+    def test_get(self):
+        """GET is not allowed."""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
 
 class TestTotalsView(TestCase):
     url_name = "totals"
@@ -121,6 +327,103 @@ class TestTotalsView(TestCase):
             set([monthly_statistic_current1]),
         )
 
+    def test_num_queries(self):
+        """The number of queries does not depend on the number of Categories or statistics."""
+        # We make 5 queries:
+        #  - get the Month
+        #  - get the budget rows (with their Categories)
+        #  - get the expense and earning totals
+        #  - get the MonthlyStatistics (with their Statistics)
+        #  - get the Months
+        expected_num_queries = 5
+        with self.subTest("No data"):
+            with self.assertNumQueries(expected_num_queries):
+                response = self.client.get(self.url_current_month)
+            self.assertEqual(response.status_code, 200)
+
+        with self.subTest("Transactions, budgets, and statistics"):
+            for i in range(3):
+                expense_category = factories.ExpenseCategoryFactory(
+                    parent=factories.ExpenseCategoryFactory()
+                )
+                earning_category = factories.IncomeCategoryFactory()
+                factories.ExpenseTransactionFactory(date=date.today(), category=expense_category)
+                factories.EarningTransactionFactory(date=date.today(), category=earning_category)
+                # Budgets for Categories with and without transactions
+                for category in [
+                    expense_category,
+                    earning_category,
+                    factories.ExpenseCategoryFactory(),
+                    factories.IncomeCategoryFactory(parent=factories.IncomeCategoryFactory()),
+                ]:
+                    factories.ExpectedMonthlyCategoryTotalFactory(
+                        month=self.current_month, category=category
+                    )
+                factories.MonthlyStatisticFactory(month=self.current_month)
+                factories.MonthFactory(year=2000 + i, month=1)
+
+            with self.assertNumQueries(expected_num_queries):
+                response = self.client.get(self.url_current_month)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["expense_categories"]), 6)
+            self.assertEqual(len(response.context["earning_categories"]), 6)
+
+    @override_settings(REPORT_CACHE_ALIAS="default")
+    def test_cached(self):
+        """The totals are cached until a transaction, budget row or statistic of the Month changes."""
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        category = factories.ExpenseCategoryFactory()
+        statistic = factories.StatisticFactory()
+        transaction = factories.ExpenseTransactionFactory(date=date.today(), category=category)
+        factories.MonthFactory(year=2020, month=1)
+        self.client.get(self.url_current_month)
+
+        with self.subTest("No changes"):
+            # Only the Month and the Months are queried
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url_current_month)
+            self.assertEqual(response.context["expense_total"], transaction.amount)
+
+        with self.subTest("A transaction in another Month"):
+            factories.ExpenseTransactionFactory(date=date(2020, 1, 1), category=category)
+            with self.assertNumQueries(2):
+                self.client.get(self.url_current_month)
+
+        changes = [
+            (
+                "A transaction",
+                lambda: factories.ExpenseTransactionFactory(date=date.today(), category=category),
+            ),
+            (
+                "A budget row",
+                lambda: factories.ExpectedMonthlyCategoryTotalFactory(
+                    month=self.current_month, category=category
+                ),
+            ),
+            (
+                "A statistic",
+                lambda: factories.MonthlyStatisticFactory(
+                    month=self.current_month, statistic=statistic
+                ),
+            ),
+        ]
+        for description, change in changes:
+            with self.subTest(description):
+                change()
+                with self.assertNumQueries(5):
+                    response = self.client.get(self.url_current_month)
+
+        # The totals include the new transaction
+        self.assertEqual(
+            response.context["expense_total"],
+            sum(
+                models.ExpenseTransaction.objects.filter(month=self.current_month).values_list(
+                    "amount", flat=True
+                )
+            ),
+        )
+
     def test_invalid_methods(self):
         """Only GETting this endpoint is allowed."""
         with self.subTest("using POST"):
@@ -173,6 +476,90 @@ class TestRunningTotalCategoriesTestCase(TestCase):
         # The regular total Category is not in the template
         self.assertNotContains(response, "name-{}".format(regular_total_cat.slug))
 
+    def test_running_totals(self):
+        """The transactions are shown with the balance of their Category after them."""
+        category = factories.CategoryFactory(total_type=models.Category.TOTAL_TYPE_RUNNING)
+        other_category = factories.CategoryFactory(total_type=models.Category.TOTAL_TYPE_RUNNING)
+        trans1 = factories.ExpenseTransactionFactory(
+            category=category, date=date(2023, 1, 1), amount=Decimal("10.00")
+        )
+        trans2 = factories.ExpenseTransactionFactory(
+            category=category, date=date(2023, 1, 2), amount=Decimal("-25.00")
+        )
+        trans3 = factories.ExpenseTransactionFactory(
+            category=other_category, date=date(2023, 1, 1), amount=Decimal("3.00")
+        )
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        categories = {category.id: category for category in response.context["categories"]}
+        self.assertEqual(categories[category.id].total, Decimal("15.00"))
+        self.assertEqual(
+            [
+                (transaction.id, transaction.running_total_amount)
+                for transaction in categories[category.id].expense_transactions
+            ],
+            [(trans2.id, Decimal("15.00")), (trans1.id, Decimal("-10.00"))],
+        )
+        self.assertEqual(
+            [
+                (transaction.id, transaction.running_total_amount)
+                for transaction in categories[other_category.id].expense_transactions
+            ],
+            [(trans3.id, Decimal("-3.00"))],
+        )
+
+    def test_num_queries(self):
+        """The number of queries does not depend on the number of Categories."""
+        for _ in range(3):
+            category = factories.CategoryFactory(total_type=models.Category.TOTAL_TYPE_RUNNING)
+            for _ in range(2):
+                factories.ExpenseTransactionFactory(category=category)
+
+        # We make 3 queries:
+        #  - get the Categories (with their totals)
+        #  - count the transactions, for the paginator
+        #  - get a page of the transactions (with their running totals)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch("occurrence.views.RUNNING_TOTALS_PAGE_SIZE", 2)
+    def test_pagination(self):
+        """The transactions are paginated, and the running totals are correct on every page."""
+        category = factories.CategoryFactory(total_type=models.Category.TOTAL_TYPE_RUNNING)
+        for day in range(1, 4):
+            factories.ExpenseTransactionFactory(
+                category=category, date=date(2023, 1, day), amount=Decimal("1.00")
+            )
+
+        with self.subTest("First page"):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["page"].paginator.num_pages, 2)
+            self.assertEqual(
+                [
+                    transaction.running_total_amount
+                    for transaction in response.context["categories"][0].expense_transactions
+                ],
+                [Decimal("-3.00"), Decimal("-2.00")],
+            )
+            self.assertContains(response, "?page=2")
+
+        with self.subTest("Second page"):
+            response = self.client.get(self.url, {"page": 2})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [
+                    transaction.running_total_amount
+                    for transaction in response.context["categories"][0].expense_transactions
+                ],
+                [Decimal("-1.00")],
+            )
+            # The Category total is for all of its transactions
+            self.assertEqual(response.context["categories"][0].total, Decimal("-3.00"))
+
     def test_invalid_methods(self):
         """Only GETting this endpoint is allowed."""
         with self.subTest("using POST"):
@@ -715,6 +1102,80 @@ class TestCopyTransactionsTestCase(TestCase):
             )
             self.assert_transactions_have_same_data(self.transaction_earning1, new_transaction1)
 
+    def test_post_multiple_dates(self):
+        """Transactions can be copied to several dates, and to the following months."""
+        self.addCleanup(models.clear_month_cache)
+        data = {
+            "transaction_type": models.Category.TYPE_EXPENSE,
+            "selected_transactions": [self.transaction_expense1.id, self.transaction_expense2.id],
+            "date": ["2040-01-31", "2040-06-15"],
+            "repeat_months": 2,
+        }
+
+        response = self.client.post(reverse(self.url_name), data)
+
+        self.assertRedirects(response, reverse("transactions"))
+        new_transactions = models.ExpenseTransaction.objects.filter(
+            date__year=2040, title=self.transaction_expense1.title
+        )
+        self.assertEqual(
+            sorted(new_transactions.values_list("date", flat=True)),
+            [
+                date(2040, 1, 31),
+                date(2040, 2, 29),
+                date(2040, 3, 31),
+                date(2040, 6, 15),
+                date(2040, 7, 15),
+                date(2040, 8, 15),
+            ],
+        )
+        for transaction in new_transactions:
+            self.assertEqual(
+                (transaction.month.year, transaction.month.month),
+                (transaction.date.year, transaction.date.month),
+            )
+            self.assert_transactions_have_same_data(self.transaction_expense1, transaction)
+        self.assertEqual(
+            models.ExpenseTransaction.objects.filter(
+                date__year=2040, title=self.transaction_expense2.title
+            ).count(),
+            6,
+        )
+
+    def test_post_num_queries(self):
+        """The number of queries does not depend on the number of transactions or dates."""
+        self.addCleanup(models.clear_month_cache)
+        factories.MonthFactory(year=2030, month=1)
+        transactions = factories.ExpenseTransactionFactory.create_batch(20)
+        data = {
+            "transaction_type": models.Category.TYPE_EXPENSE,
+            "selected_transactions": [transaction.id for transaction in transactions],
+            "date": "2030-01-01",
+            "repeat_months": 11,
+        }
+
+        # The transactions, the Months (and creating the missing ones), the
+        # bulk_create(), and the refresh of the totals
+        with self.assertNumQueries(11):
+            self.client.post(reverse(self.url_name), data)
+
+        self.assertEqual(models.ExpenseTransaction.objects.filter(date__year=2030).count(), 240)
+
+    def test_post_invalid_repeat_months(self):
+        """The number of months to repeat for must be valid."""
+        for repeat_months in ["a", -1, 1000]:
+            with self.subTest(repeat_months=repeat_months):
+                data = {
+                    "transaction_type": models.Category.TYPE_EXPENSE,
+                    "selected_transactions": [self.transaction_expense1.id],
+                    "date": "2040-01-01",
+                    "repeat_months": repeat_months,
+                }
+                response = self.client.post(reverse(self.url_name), data)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context["errors"])
+        self.assertFalse(models.ExpenseTransaction.objects.filter(date__year=2040).exists())
+
     def test_post_invalid(self):
         """Make an invalid POST to copy transactions."""
         # The date string that will be used in this test.
@@ -1031,6 +1492,70 @@ class TestCSVImportListView(TestCase):
             self.assertEqual(response.status_code, 405)
 
 
+class TestCSVImportStatusView(TestCase):
+    url_name = "csv_import_status"
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(self.url_name)
+
+    def test_get_status(self):
+        """The status and progress of the requested CSV imports are returned as JSON."""
+        running_import = CSVImport.objects.create(
+            file="running.csv",
+            status=CSVImport.STATUS_RUNNING,
+            rows_total=10,
+            rows_created=4,
+            rows_skipped=1,
+        )
+        failed_import = CSVImport.objects.create(
+            file="failed.csv", status=CSVImport.STATUS_FAILED, errors="Bad row"
+        )
+        # An import that was not requested
+        CSVImport.objects.create(file="other.csv")
+
+        response = self.client.get(
+            self.url, {"id": [str(running_import.pk), str(failed_import.pk)]}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        csv_imports = {data["id"]: data for data in response.json()["csv_imports"]}
+        self.assertEqual(set(csv_imports), {running_import.pk, failed_import.pk})
+        self.assertEqual(csv_imports[running_import.pk]["status"], CSVImport.STATUS_RUNNING)
+        self.assertEqual(csv_imports[running_import.pk]["status_display"], "Running")
+        self.assertFalse(csv_imports[running_import.pk]["is_finished"])
+        self.assertEqual(csv_imports[running_import.pk]["progress_percent"], 50)
+        self.assertTrue(csv_imports[failed_import.pk]["is_finished"])
+        self.assertIsNone(csv_imports[failed_import.pk]["progress_percent"])
+        self.assertEqual(csv_imports[failed_import.pk]["errors"], "Bad row")
+
+    def test_invalid_id(self):
+        response = self.client.get(self.url, {"id": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_marks_unfinished_imports_for_polling(self):
+        """The imports list marks unfinished imports, so that the page can poll them."""
+        queued_import = CSVImport.objects.create(file="queued.csv")
+        completed_import = CSVImport.objects.create(
+            file="done.csv", status=CSVImport.STATUS_COMPLETED
+        )
+
+        response = self.client.get(reverse("csv_import_list"))
+
+        self.assertContains(
+            response,
+            'id="csv-import-{}" data-id="{}" data-finished="false"'.format(
+                queued_import.pk, queued_import.pk
+            ),
+        )
+        self.assertContains(
+            response,
+            'id="csv-import-{}" data-id="{}" data-finished="true"'.format(
+                completed_import.pk, completed_import.pk
+            ),
+        )
+
+
 class TestStatisticsChartView(TestCase):
     url_name = "statistics_chart_view"
     template_name = "occurrence/statistics.html"
@@ -1145,6 +1670,124 @@ class TestStatisticsChartView(TestCase):
             self.assertEqual(response.status_code, 405)
 
 
+class TestStatisticsSeriesView(TestCase):
+    url_name = "statistics_series"
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(self.url_name)
+        self.net_worth = factories.StatisticFactory(name="Net Worth")
+        self.savings = factories.StatisticFactory(name="Savings")
+        months = {
+            month: factories.MonthFactory(year=2023, month=month, name="{}, 2023".format(month))
+            for month in range(1, 7)
+        }
+        for month, amount in [(1, 100), (2, 110), (3, 120), (5, 140), (6, 150)]:
+            factories.MonthlyStatisticFactory(
+                statistic=self.net_worth, month=months[month], amount=amount
+            )
+        factories.MonthlyStatisticFactory(statistic=self.savings, month=months[2], amount=10)
+
+    def test_get(self):
+        """The amounts of each statistic are returned as columns, aligned with the months."""
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.url,
+                {"statistic": [self.net_worth.slug, self.savings.slug], "start": "2022-12"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "months": [
+                    "2022-12",
+                    "2023-01",
+                    "2023-02",
+                    "2023-03",
+                    "2023-04",
+                    "2023-05",
+                    "2023-06",
+                ],
+                "names": {self.net_worth.slug: "Net Worth", self.savings.slug: "Savings"},
+                "series": {
+                    self.net_worth.slug: [None, 100, 110, 120, None, 140, 150],
+                    self.savings.slug: [None, None, 10, None, None, None, None],
+                },
+            },
+        )
+
+    def test_quarters(self):
+        """The series can be downsampled to quarters, with the last or mean amount of each."""
+        params = {"statistic": self.net_worth.slug, "period": "quarter"}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.json()["months"], ["2023-Q1", "2023-Q2"])
+        self.assertEqual(response.json()["series"][self.net_worth.slug], [120, 150])
+
+        response = self.client.get(self.url, dict(params, aggregate="mean"))
+        self.assertEqual(response.json()["series"][self.net_worth.slug], [110, 145])
+
+    def test_years(self):
+        """The series can be downsampled to years."""
+        response = self.client.get(
+            self.url, {"statistic": self.net_worth.slug, "period": "year", "end": "2023-02"}
+        )
+        self.assertEqual(response.json()["months"], ["2023"])
+        self.assertEqual(response.json()["series"][self.net_worth.slug], [110])
+
+    def test_rolling(self):
+        """Rolling averages are computed over the periods that have amounts."""
+        response = self.client.get(
+            self.url, {"statistic": self.net_worth.slug, "start": "2023-02", "rolling": 2}
+        )
+        self.assertEqual(response.json()["rolling"][self.net_worth.slug], [110, 115, 120, 140, 145])
+
+    def test_no_data(self):
+        """A statistic without data has empty columns."""
+        statistic = factories.StatisticFactory()
+        response = self.client.get(self.url, {"statistic": statistic.slug})
+        self.assertEqual(response.json()["months"], [])
+        self.assertEqual(response.json()["series"], {statistic.slug: []})
+
+    @override_settings(REPORT_CACHE_ALIAS="default")
+    def test_cached(self):
+        """The series are cached, until a MonthlyStatistic is changed."""
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        params = {"statistic": self.net_worth.slug, "period": "quarter"}
+        self.client.get(self.url, params)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.json()["series"][self.net_worth.slug], [120, 150])
+
+        models.MonthlyStatistic.objects.filter(amount=150).get().delete()
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.json()["series"][self.net_worth.slug], [120, 140])
+
+    def test_invalid(self):
+        """Invalid parameters return errors."""
+        test_data = [
+            ("No statistic", {}),
+            ("Statistic not found", {"statistic": "does-not-exist"}),
+            ("Invalid start", {"statistic": self.net_worth.slug, "start": "2023-13"}),
+            ("Invalid end", {"statistic": self.net_worth.slug, "end": "soon"}),
+            ("Invalid period", {"statistic": self.net_worth.slug, "period": "week"}),
+            ("Invalid aggregate", {"statistic": self.net_worth.slug, "aggregate": "max"}),
+            ("Invalid rolling", {"statistic": self.net_worth.slug, "rolling": "a"}),
+            ("Rolling too small", {"statistic": self.net_worth.slug, "rolling": 0}),
+            (
+                "Range too long",
+                {"statistic": self.net_worth.slug, "start": "1000-01", "end": "2023-01"},
+            ),
+        ]
+        for description, params in test_data:
+            with self.subTest(description):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()["errors"])
+
+
 class TestBudgetView(TestCase):
     url_name = "budget"
     template_name = "occurrence/budget.html"
@@ -4,6 +4,9 @@ from . import views
 
 urlpatterns = [
     re_path(r"^transactions/$", views.transactions, name="transactions"),
+    re_path(r"^transactions/more/$", views.more_transactions, name="more_transactions"),
+    re_path(r"^transactions/bulk/$", views.bulk_transactions, name="bulk_transactions"),
+    re_path(r"^transactions/titles/$", views.title_autocomplete, name="title_autocomplete"),
     re_path(
         r"^transactions/import/(?P<csv_import_id>[0-9]+)/$",
         views.csv_import_transactions,
@@ -22,11 +25,17 @@ urlpatterns = [
         views.csv_import_list,
         name="csv_import_list",
     ),
+    re_path(
+        r"^imports/status/$",
+        views.csv_import_status,
+        name="csv_import_status",
+    ),
     re_path(
         r"^statistics-chart/$",
         views.statistics_chart_view,
         name="statistics_chart_view",
     ),
+    re_path(r"^statistics/series/$", views.statistics_series, name="statistics_series"),
     re_path(r"^budget/$", views.budget, name="budget"),
     re_path(
         r"^budget/edit/(?P<id>[0-9]+)/$",
@@ -39,4 +48,9 @@ urlpatterns = [
         name="delete_budget_row",
     ),
     re_path(r"^budget/copy/$", views.copy_budget, name="copy_budget"),
+    re_path(
+        r"^request_timings/$",
+        views.request_timing_histograms,
+        name="request_timing_histograms",
+    ),
 ]
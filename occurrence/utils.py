@@ -1,55 +1,230 @@
-import uuid
+import base64
+import bisect
+import calendar
+import hashlib
+import heapq
+import json
+import threading
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
-from django.db.models import DecimalField, F, Sum, Value
-from django.utils.text import slugify
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Q, Sum, Value, Window
+
+from data_tools.models import TitleMapping
 
 from . import models
 
 
-def get_transactions_regular_totals(
-    month=None, type_cat=models.Category.TYPE_EXPENSE, budget_by_category=None
-):
-    """Get the totals for Categories, including children Categories.
+def get_transaction_model(type_cat):
+    """Get the transaction model (ExpenseTransaction or EarningTransaction) for a type_cat."""
+    if type_cat == models.Category.TYPE_EXPENSE:
+        return models.ExpenseTransaction
+    elif type_cat == models.Category.TYPE_EARNING:
+        return models.EarningTransaction
+    raise ValidationError("{} is not a valid type_cat".format(type_cat))
+
+
+def get_transaction_type_cat(transaction_model):
+    """Get the type_cat for a transaction model (the opposite of get_transaction_model())."""
+    if issubclass(transaction_model, models.EarningTransaction):
+        return models.Category.TYPE_EARNING
+    return models.Category.TYPE_EXPENSE
+
+
+# How long (in seconds) the data of the reporting views is cached for. Since the
+# cache keys include the data versions, the data never needs to expire to be correct.
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# The data version of the data that the reports of all Months depend on
+# (Categories, Statistics and Months)
+REPORT_DATA_VERSION_STRUCTURE = "structure"
+# The data version of the data of all Months (for reports that span Months)
+REPORT_DATA_VERSION_ALL_MONTHS = "all-months"
+
+
+def _get_report_cache():
+    """
+    Get the Django cache that the data of the reporting views is cached in.
+
+    This is the cache named by the REPORT_CACHE_ALIAS setting, or None if the
+    setting is not set, in which case the data is not cached.
+    """
+    alias = getattr(settings, "REPORT_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _get_report_data_version_key(name):
+    return "occurrence:data-version:{}".format(name)
+
+
+def _get_month_data_version_name(month_id):
+    return "month-{}".format(month_id)
+
+
+def get_report_data_versions(names):
+    """
+    Get the current data versions for some names (from the report cache).
+
+    A version that is not in the cache (yet, or any more) is initialized to the
+    current time, so that a version is never reused for different data.
+    """
+    report_cache = _get_report_cache()
+    keys = [_get_report_data_version_key(name) for name in names]
+    versions = report_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            report_cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = report_cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_report_data_versions(month_ids=None, structure=False):
+    """
+    Bump the data versions, so the cached data of the reporting views is not used.
+
+    The versions are bumped right away, and again when the current database
+    transaction is committed, so that data which was cached by another process
+    before the changes were committed is not used either.
 
     Args:
-        month: Optional Month to filter transactions by.
-        type_cat: The category type (expense or earning).
-        budget_by_category: Optional dict mapping category_id to budgeted amount.
-            When provided, each category entry in the returned dict will include
-            a "budgeted" key. Categories that have a budget but no transactions
-            will also be included with a total of 0.
+        month_ids: The ids of the Months whose transactions, budget rows or
+            statistics changed.
+        structure: Whether data that the reports of all Months depend on
+            (Categories, Statistics or Months) changed.
     """
-    # Raise an error if type_cat is not valid
-    if type_cat not in [name for (name, label) in models.Category.TYPE_CHOICES]:
-        raise ValidationError("{} is not a valid type_cat".format(type_cat))
+    if _get_report_cache() is None:
+        return
+    names = [
+        _get_month_data_version_name(month_id)
+        for month_id in (month_ids or [])
+        if month_id is not None
+    ]
+    if names:
+        names.append(REPORT_DATA_VERSION_ALL_MONTHS)
+    if structure:
+        names.append(REPORT_DATA_VERSION_STRUCTURE)
+    if not names:
+        return
 
-    if type_cat == models.Category.TYPE_EXPENSE:
-        # Get all of the ExpenseTransactions with a Cateogry of regular total_type
-        transactions = models.ExpenseTransaction.objects.filter(
-            category__total_type=models.Category.TOTAL_TYPE_REGULAR
-        )
-        if month:
-            transactions = transactions.filter(month=month)
-        category_totals = (
-            transactions.values("category").order_by().distinct().annotate(total=Sum("amount"))
-        )
+    def bump():
+        report_cache = _get_report_cache()
+        for name in names:
+            key = _get_report_data_version_key(name)
+            try:
+                report_cache.incr(key)
+            except ValueError:
+                # The version is not in the cache, so there is no data cached for it
+                report_cache.add(key, time.time_ns(), timeout=None)
 
-        sum_total = category_totals.aggregate(grand_total=Sum("total"))["grand_total"] or 0
+    bump()
+    transaction.on_commit(bump)
 
-    elif type_cat == models.Category.TYPE_EARNING:
-        # Get all of the EarningTransaction with a Cateogry of regular total_type
-        transactions = models.EarningTransaction.objects.filter(
-            category__total_type=models.Category.TOTAL_TYPE_REGULAR
-        )
-        if month:
-            transactions = transactions.filter(month=month)
-        category_totals = (
-            transactions.values("category").order_by().distinct().annotate(total=Sum("amount"))
-        )
 
-        sum_total = category_totals.aggregate(grand_total=Sum("total"))["grand_total"] or 0
+def get_cached_report_data(name, compute, params=(), month_ids=None):
+    """
+    Get the data for a reporting view from the report cache, or compute (and cache) it.
+
+    The data is cached for the current data versions of its Months (or of all
+    Months, if month_ids is None) and of the structure, so it is recomputed
+    after any of them is bumped (see bump_report_data_versions()).
+
+    Args:
+        name: The name of the data (e.g. the name of the view).
+        compute: A function that takes no arguments, and returns the data.
+        params: The parameters that the data depends on (e.g. the page number).
+        month_ids: The ids of the Months that the data depends on. If None,
+            the data depends on all Months.
+    """
+    report_cache = _get_report_cache()
+    if report_cache is None:
+        return compute()
+
+    if month_ids is None:
+        version_names = [REPORT_DATA_VERSION_ALL_MONTHS]
+    else:
+        version_names = [_get_month_data_version_name(month_id) for month_id in month_ids]
+    version_names.append(REPORT_DATA_VERSION_STRUCTURE)
+    versions = get_report_data_versions(version_names)
+    # Hash the parameters and the versions to get a short key that is safe for memcached
+    key = "occurrence:report:{}:{}".format(
+        name, hashlib.md5(repr((tuple(params), versions)).encode()).hexdigest()
+    )
+
+    data = report_cache.get(key)
+    if data is None:
+        data = compute()
+        report_cache.set(key, data, timeout=REPORT_CACHE_TIMEOUT)
+    return data
+
 
+def refresh_monthly_category_totals(month_ids=None, type_cats=None):
+    """Recompute the MonthlyCategoryTotals for some Months from their transactions.
+
+    The Month rows are locked while their totals are recomputed, so that
+    concurrent refreshes of the same Month are applied one after the other,
+    and each one sees the transactions committed by the previous one.
+
+    Args:
+        month_ids: The ids of the Months to refresh. If None, every Month is
+            refreshed (i.e. the whole table is rebuilt).
+        type_cats: The types of transactions to refresh (Category.TYPE_EXPENSE
+            and/or Category.TYPE_EARNING). Defaults to both.
+    """
+    if month_ids is not None:
+        month_ids = {month_id for month_id in month_ids if month_id is not None}
+        if not month_ids:
+            return
+    if type_cats is None:
+        type_cats = [name for (name, label) in models.Category.TYPE_CHOICES]
+
+    with transaction.atomic():
+        # FOR NO KEY UPDATE, so that the lock doesn't block (or deadlock with) the
+        # inserts of transactions into these Months, which take a KEY SHARE lock
+        months = models.Month.objects.select_for_update(no_key=True).order_by("pk")
+        if month_ids is not None:
+            months = months.filter(pk__in=month_ids)
+        locked_month_ids = [month.pk for month in months]
+
+        for type_cat in type_cats:
+            transactions = get_transaction_model(type_cat).objects.all()
+            monthly_category_totals = models.MonthlyCategoryTotal.objects.filter(
+                transaction_type=type_cat
+            )
+            if month_ids is not None:
+                transactions = transactions.filter(month_id__in=month_ids)
+                monthly_category_totals = monthly_category_totals.filter(month_id__in=month_ids)
+
+            totals = (
+                transactions.values("month_id", "category_id")
+                .order_by()
+                .annotate(amount=Sum("amount"), transaction_count=Count("id"))
+            )
+            monthly_category_totals.delete()
+            models.MonthlyCategoryTotal.objects.bulk_create(
+                [
+                    models.MonthlyCategoryTotal(transaction_type=type_cat, **total)
+                    for total in totals
+                ]
+            )
+
+        bump_report_data_versions(locked_month_ids)
+
+
+def _build_regular_totals(category_totals, budget_by_category, get_budget_only_categories):
+    """Build the category_dict for get_transactions_regular_totals() and get_regular_totals().
+
+    Args:
+        category_totals: Iterable of dicts with the total for each Category, ordered by
+            the Category's order and name.
+        budget_by_category: Optional dict mapping category_id to budgeted amount.
+        get_budget_only_categories: A function that takes a set of category ids,
+            and returns the regular Categories (with their parent) among them.
+    """
     if budget_by_category is None:
         budget_by_category = {}
 
@@ -76,14 +251,7 @@ def get_transactions_regular_totals(
 
     # Loop through the category_totals, and add categories to category_dict,
     # as well as adding their parent Category (if applicable)
-    for category_data in category_totals.values(
-        "category__name",
-        "category__id",
-        "category__order",
-        "total",
-        "category__parent",
-        "category__parent__name",
-    ).order_by("category__order", "category__name"):
+    for category_data in category_totals:
         cat_id = category_data["category__id"]
         seen_category_ids.add(cat_id)
 
@@ -133,11 +301,9 @@ def get_transactions_regular_totals(
 
     # Add categories that have a budget but no transactions
     if budget_by_category:
-        budget_only_cats = models.Category.objects.filter(
-            id__in=set(budget_by_category.keys()) - seen_category_ids,
-            total_type=models.Category.TOTAL_TYPE_REGULAR,
-            type_cat=type_cat,
-        ).select_related("parent")
+        budget_only_cats = get_budget_only_categories(
+            set(budget_by_category.keys()) - seen_category_ids
+        )
         for cat in budget_only_cats:
             if cat.parent_id:
                 if cat.parent_id not in category_dict:
@@ -168,15 +334,163 @@ def get_transactions_regular_totals(
         for cat_data in category_dict.values():
             _add_progress(cat_data)
 
+    return category_dict
+
+
+# The fields of the Category (and its parent) that the category_dict is built from
+REGULAR_TOTALS_CATEGORY_FIELDS = (
+    "category__name",
+    "category__id",
+    "category__order",
+    "category__parent",
+    "category__parent__name",
+)
+
+
+def get_transactions_regular_totals(
+    month=None, type_cat=models.Category.TYPE_EXPENSE, budget_by_category=None
+):
+    """Get the totals for Categories, including children Categories.
+
+    Args:
+        month: Optional Month to filter transactions by.
+        type_cat: The category type (expense or earning).
+        budget_by_category: Optional dict mapping category_id to budgeted amount.
+            When provided, each category entry in the returned dict will include
+            a "budgeted" key. Categories that have a budget but no transactions
+            will also be included with a total of 0.
+    """
+    # Raise an error if type_cat is not valid
+    if type_cat not in [name for (name, label) in models.Category.TYPE_CHOICES]:
+        raise ValidationError("{} is not a valid type_cat".format(type_cat))
+
+    # Get the precomputed totals of the transactions of this type, for the
+    # Categories of regular total_type
+    monthly_category_totals = models.MonthlyCategoryTotal.objects.filter(
+        transaction_type=type_cat,
+        category__total_type=models.Category.TOTAL_TYPE_REGULAR,
+    )
+    if month:
+        monthly_category_totals = monthly_category_totals.filter(month=month)
+    category_totals = list(
+        monthly_category_totals.values(*REGULAR_TOTALS_CATEGORY_FIELDS)
+        .annotate(total=Sum("amount"))
+        .order_by("category__order", "category__name")
+    )
+    sum_total = sum(category_data["total"] for category_data in category_totals)
+
+    def get_budget_only_categories(category_ids):
+        return models.Category.objects.filter(
+            id__in=category_ids,
+            total_type=models.Category.TOTAL_TYPE_REGULAR,
+            type_cat=type_cat,
+        ).select_related("parent")
+
+    category_dict = _build_regular_totals(
+        category_totals, budget_by_category, get_budget_only_categories
+    )
     return category_dict, sum_total
 
 
-def get_expensetransactions_running_totals(category):
+def get_regular_totals(month=None, budget_totals=None):
+    """Get the totals for Categories of both expenses and earnings, in one query.
+
+    This is the same as calling get_transactions_regular_totals() for each
+    type_cat, but the MonthlyCategoryTotals for both types are grouped in a
+    single query, and the budget-only Categories are taken from the budget_totals
+    instead of being queried.
+
+    Args:
+        month: Optional Month to filter transactions by.
+        budget_totals: Optional list of ExpectedMonthlyCategoryTotals (with their
+            category and category.parent selected) to enrich the totals with.
+
+    Returns:
+        dict: Maps each type_cat to a (category_dict, sum_total) tuple, as
+            returned by get_transactions_regular_totals().
     """
-    Get ExpenseTransactions for a Category that is of total_type of TOTAL_TYPE_RUNNING.
+    budget_by_category = None
+    budget_categories = {}
+    if budget_totals is not None:
+        budget_by_category = {row.category_id: row.amount for row in budget_totals}
+        budget_categories = {row.category_id: row.category for row in budget_totals}
+
+    monthly_category_totals = models.MonthlyCategoryTotal.objects.filter(
+        category__total_type=models.Category.TOTAL_TYPE_REGULAR,
+    )
+    if month:
+        monthly_category_totals = monthly_category_totals.filter(month=month)
+
+    type_cats = [name for (name, label) in models.Category.TYPE_CHOICES]
+    category_totals_by_type = {type_cat: [] for type_cat in type_cats}
+    for category_data in (
+        monthly_category_totals.values("transaction_type", *REGULAR_TOTALS_CATEGORY_FIELDS)
+        .annotate(total=Sum("amount"))
+        .order_by("category__order", "category__name")
+    ):
+        category_totals_by_type[category_data["transaction_type"]].append(category_data)
+
+    totals = {}
+    for type_cat in type_cats:
+
+        def get_budget_only_categories(category_ids, type_cat=type_cat):
+            return sorted(
+                (
+                    category
+                    for category_id, category in budget_categories.items()
+                    if category_id in category_ids
+                    and category.total_type == models.Category.TOTAL_TYPE_REGULAR
+                    and category.type_cat == type_cat
+                ),
+                key=lambda category: (category.order, category.name),
+            )
+
+        category_totals = category_totals_by_type[type_cat]
+        category_dict = _build_regular_totals(
+            category_totals, budget_by_category, get_budget_only_categories
+        )
+        totals[type_cat] = (
+            category_dict,
+            sum(category_data["total"] for category_data in category_totals),
+        )
+    return totals
+
+
+def get_running_totals_transactions(categories):
+    """
+    Get the ExpenseTransactions for Categories that are of total_type of TOTAL_TYPE_RUNNING.
 
+    Each ExpenseTransaction is annotated with a running_total_amount field, which
+    is the balance of its Category after that transaction (i.e. the cumulative sum
+    of the amounts of the Category's transactions up to, and including, this one).
     Since these Categories will be seen as a running total, and the ExpenseTransactions
     are expenses, the transaction amounts are multiplied by -1.
+
+    The balances are computed by the database with a window function, so they are
+    correct even when only a slice of the queryset (e.g. a page) is evaluated.
+    """
+    return (
+        models.ExpenseTransaction.objects.filter(
+            category__in=categories,
+            category__total_type=models.Category.TOTAL_TYPE_RUNNING,
+        )
+        .annotate(
+            running_total_amount=Window(
+                Sum(F("amount") * Value("-1"), output_field=DecimalField()),
+                partition_by=F("category_id"),
+                order_by=(F("date").asc(), F("id").asc()),
+            )
+        )
+        .order_by("category__order", "category__name", "category_id", "-date", "-id")
+    )
+
+
+def get_expensetransactions_running_totals(category):
+    """
+    Get ExpenseTransactions for a Category that is of total_type of TOTAL_TYPE_RUNNING.
+
+    The ExpenseTransactions are annotated with a running_total_amount field (see
+    get_running_totals_transactions()).
     """
     # If this is not a running type Category, then just return its ExpenseTransactions
     if category.total_type != models.Category.TOTAL_TYPE_RUNNING:
@@ -184,17 +498,668 @@ def get_expensetransactions_running_totals(category):
             category=category,
         )
     # This is a running type Category, so annotate the running_total_amount field
-    return models.ExpenseTransaction.objects.filter(
-        category=category,
-    ).annotate(
-        running_total_amount=Sum(F("amount") * Value("-1"), output_field=DecimalField()),
+    return get_running_totals_transactions([category])
+
+
+# The ordering of transactions for keyset pagination (the default ordering, with
+# the id to break ties)
+TRANSACTION_KEYSET_ORDERING = ("-date", "title", "amount", "id")
+
+
+def encode_transaction_cursor(transaction):
+    """Encode the position of a transaction in TRANSACTION_KEYSET_ORDERING as a cursor string."""
+    position = [
+        transaction.date.isoformat(),
+        transaction.title,
+        str(transaction.amount),
+        transaction.id,
+    ]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_transaction_cursor(cursor):
+    """
+    Decode a cursor from encode_transaction_cursor() to a (date, title, amount, id) tuple.
+
+    Raises a ValueError if the cursor is not valid.
+    """
+    try:
+        date_str, title, amount, transaction_id = json.loads(base64.urlsafe_b64decode(cursor))
+        position = (date.fromisoformat(date_str), str(title), Decimal(amount), int(transaction_id))
+    except (TypeError, ValueError, InvalidOperation) as e:
+        raise ValueError("{} is not a valid cursor".format(cursor)) from e
+    return position
+
+
+def get_transactions_page(transactions, page_size, after=None):
+    """
+    Get a page of transactions, using keyset pagination.
+
+    The transactions are ordered by TRANSACTION_KEYSET_ORDERING, and the page
+    starts right after the transaction that the after cursor points to, so
+    getting a page is as fast for the last page as for the first one (unlike
+    with OFFSET).
+
+    Args:
+        transactions: A queryset of ExpenseTransactions or EarningTransactions.
+        page_size: The maximum number of transactions in the page.
+        after: Optional cursor (from a previous page) to start the page after.
+
+    Returns:
+        tuple: (list of the transactions in the page, cursor for the next page,
+            or None if this is the last page)
+    """
+    if after is not None:
+        after_date, after_title, after_amount, after_id = decode_transaction_cursor(after)
+        transactions = transactions.filter(
+            Q(date__lt=after_date)
+            | Q(date=after_date, title__gt=after_title)
+            | Q(date=after_date, title=after_title, amount__gt=after_amount)
+            | Q(date=after_date, title=after_title, amount=after_amount, id__gt=after_id)
+        )
+    # Get one more transaction than needed, to know whether there is a next page
+    page = list(transactions.order_by(*TRANSACTION_KEYSET_ORDERING)[: page_size + 1])
+    if len(page) <= page_size:
+        return page, None
+    page = page[:page_size]
+    return page, encode_transaction_cursor(page[-1])
+
+
+def get_month_list():
+    """Get a (cached) list of (slug, name) tuples for all of the Months, newest first."""
+    return get_cached_report_data(
+        "month_list", lambda: list(models.Month.objects.values_list("slug", "name")), month_ids=[]
+    )
+
+
+# The periods that statistics series can be downsampled to, and how the
+# MonthlyStatistics in each period are aggregated
+STATISTICS_SERIES_PERIODS = ("month", "quarter", "year")
+STATISTICS_SERIES_AGGREGATES = ("last", "mean")
+# The maximum number of months that a statistics series can cover
+STATISTICS_SERIES_MAX_MONTHS = 100 * 12
+
+
+def get_month_index(year, month):
+    """Get the number of a month, counting from January of year 0 (so ranges of months are ranges of numbers)."""
+    return year * 12 + month - 1
+
+
+def parse_year_month(year_month):
+    """
+    Get the (year, month) of a "YYYY-MM" string.
+
+    Raises:
+        ValidationError: If the string is not a valid year and month.
+    """
+    try:
+        year, month = (int(part) for part in year_month.split("-"))
+        date(year, month, 1)
+    except (AttributeError, TypeError, ValueError):
+        raise ValidationError("{} is not a valid YYYY-MM month".format(year_month))
+    return year, month
+
+
+def filter_month_range(queryset, start=None, end=None, month_field="month"):
+    """
+    Filter a queryset to the rows whose Month is between two (year, month) tuples (inclusive).
+
+    The Month is compared as a single number (see get_month_index()), rather
+    than with OR'ed filters on the year and month. To filter Months themselves,
+    pass month_field=None.
+    """
+    prefix = month_field + "__" if month_field else ""
+    queryset = queryset.annotate(month_index=F(prefix + "year") * 12 + F(prefix + "month") - 1)
+    if start is not None:
+        queryset = queryset.filter(month_index__gte=get_month_index(*start))
+    if end is not None:
+        queryset = queryset.filter(month_index__lte=get_month_index(*end))
+    return queryset
+
+
+def _get_period_label(month_index, period):
+    year, month = divmod(month_index, 12)
+    if period == "year":
+        return str(year)
+    if period == "quarter":
+        return "{}-Q{}".format(year, month // 3 + 1)
+    return "{}-{:02d}".format(year, month + 1)
+
+
+def get_statistics_series(
+    statistic_slugs, start=None, end=None, period="month", aggregate="last", rolling=None
+):
+    """
+    Get the amounts of several Statistics over a range of months, as columns.
+
+    The MonthlyStatistics are loaded with a single values_list() query, and
+    downsampled to quarters or years, if asked, by taking the last amount (or
+    the mean of the amounts) in each period.
+
+    Args:
+        statistic_slugs: The slugs of the Statistics.
+        start: The (year, month) to start at. Defaults to the first month with data.
+        end: The (year, month) to end at. Defaults to the last month with data.
+        period: "month", "quarter" or "year".
+        aggregate: "last" or "mean", how the amounts in a quarter or year are combined.
+        rolling: If given, also compute the rolling average of each series over
+            this many periods.
+
+    Returns:
+        dict: {"months": [labels], "names": {slug: name}, "series": {slug: [amounts]}}
+            where the amounts are None for periods without data, and also
+            "rolling": {slug: [averages]} if rolling was given.
+
+    Raises:
+        ValidationError: If any of the arguments are not valid.
+    """
+    if period not in STATISTICS_SERIES_PERIODS:
+        raise ValidationError(
+            "period must be one of {}".format(", ".join(STATISTICS_SERIES_PERIODS))
+        )
+    if aggregate not in STATISTICS_SERIES_AGGREGATES:
+        raise ValidationError(
+            "aggregate must be one of {}".format(", ".join(STATISTICS_SERIES_AGGREGATES))
+        )
+    if rolling is not None and rolling < 1:
+        raise ValidationError("rolling must be at least 1")
+    statistic_slugs = list(dict.fromkeys(statistic_slugs))
+    names = dict(
+        models.Statistic.objects.filter(slug__in=statistic_slugs).values_list("slug", "name")
+    )
+    missing_slugs = [slug for slug in statistic_slugs if slug not in names]
+    if missing_slugs:
+        raise ValidationError("Statistic(s) not found: {}".format(", ".join(missing_slugs)))
+
+    rows = list(
+        filter_month_range(
+            models.MonthlyStatistic.objects.filter(statistic__slug__in=statistic_slugs), start, end
+        )
+        .order_by("month_index")
+        .values_list("statistic__slug", "month_index", "amount")
+    )
+    start_index = get_month_index(*start) if start else (rows[0][1] if rows else None)
+    end_index = get_month_index(*end) if end else (rows[-1][1] if rows else None)
+    if start_index is None or end_index is None or start_index > end_index:
+        result = {"months": [], "names": names, "series": {slug: [] for slug in statistic_slugs}}
+        if rolling is not None:
+            result["rolling"] = {slug: [] for slug in statistic_slugs}
+        return result
+    if end_index - start_index >= STATISTICS_SERIES_MAX_MONTHS:
+        raise ValidationError(
+            "A series can cover at most {} months".format(STATISTICS_SERIES_MAX_MONTHS)
+        )
+
+    months_per_period = {"month": 1, "quarter": 3, "year": 12}[period]
+    first_period = start_index // months_per_period
+    period_count = end_index // months_per_period - first_period + 1
+    labels = [
+        _get_period_label((first_period + offset) * months_per_period, period)
+        for offset in range(period_count)
+    ]
+    # The amounts in each period, in order of their months
+    amounts = {slug: [[] for _ in range(period_count)] for slug in statistic_slugs}
+    for slug, month_index, amount in rows:
+        amounts[slug][month_index // months_per_period - first_period].append(float(amount))
+
+    series = {}
+    for slug, period_amounts in amounts.items():
+        if aggregate == "last":
+            series[slug] = [values[-1] if values else None for values in period_amounts]
+        else:
+            series[slug] = [
+                sum(values) / len(values) if values else None for values in period_amounts
+            ]
+    result = {"months": labels, "names": names, "series": series}
+
+    if rolling is not None:
+        result["rolling"] = {}
+        for slug, values in series.items():
+            averages = []
+            for index in range(len(values)):
+                window = [
+                    value
+                    for value in values[max(0, index - rolling + 1) : index + 1]
+                    if value is not None
+                ]
+                averages.append(sum(window) / len(window) if window else None)
+            result["rolling"][slug] = averages
+    return result
+
+
+def create_missing_monthly_statistics(start=None, end=None, amount=0, copy_previous=False):
+    """
+    Create the MonthlyStatistics that are missing for the Months in a range.
+
+    Every Statistic should have a MonthlyStatistic for every Month. The missing
+    (Statistic, Month) pairs are found from a single query of the existing
+    MonthlyStatistics in the range, and created with one bulk_create(). If
+    some of them are created concurrently, the insert is retried with only the
+    ones that are still missing, so that just the MonthlyStatistics that were
+    actually inserted are returned.
+
+    Args:
+        start: The (year, month) of the first Month. Defaults to the first Month.
+        end: The (year, month) of the last Month. Defaults to the last Month.
+        amount: The amount of the new MonthlyStatistics.
+        copy_previous: If True, a new MonthlyStatistic gets the amount of the
+            Statistic in the previous month instead (if there is one), so the
+            last known amount is carried forward.
+
+    Returns:
+        list: The MonthlyStatistics that were created.
+    """
+    statistics = list(models.Statistic.objects.all())
+    months = list(
+        filter_month_range(models.Month.objects.all(), start, end, None).order_by("month_index")
+    )
+    if not statistics or not months:
+        return []
+
+    # Also get the amounts of the month before the range, to copy them
+    previous_start = None
+    if start is not None:
+        year, month = divmod(get_month_index(*start) - 1, 12)
+        previous_start = (year, month + 1)
+    amounts = {
+        (statistic_id, month_index): existing_amount
+        for statistic_id, month_index, existing_amount in filter_month_range(
+            models.MonthlyStatistic.objects.order_by(), previous_start, end
+        ).values_list("statistic_id", "month_index", "amount")
+    }
+
+    new_monthly_statistics = []
+    for month in months:
+        for statistic in statistics:
+            if (statistic.pk, month.month_index) in amounts:
+                continue
+            new_amount = amount
+            if copy_previous:
+                new_amount = amounts.get((statistic.pk, month.month_index - 1), amount)
+            amounts[(statistic.pk, month.month_index)] = new_amount
+            new_monthly_statistics.append(
+                models.MonthlyStatistic(statistic=statistic, month=month, amount=new_amount)
+            )
+
+    while new_monthly_statistics:
+        try:
+            with transaction.atomic():
+                models.MonthlyStatistic.objects.bulk_create(new_monthly_statistics, batch_size=1000)
+            break
+        except IntegrityError:
+            # Some were created concurrently, so only create the ones that are still missing
+            existing = set(
+                filter_month_range(models.MonthlyStatistic.objects.order_by(), start, end)
+                .filter(statistic__in=statistics)
+                .values_list("statistic_id", "month_id")
+            )
+            still_missing = [
+                obj
+                for obj in new_monthly_statistics
+                if (obj.statistic_id, obj.month_id) not in existing
+            ]
+            if len(still_missing) == len(new_monthly_statistics):
+                raise
+            new_monthly_statistics = still_missing
+    # bulk_create() does not send post_save, so invalidate the cached reports here
+    bump_report_data_versions({obj.month_id for obj in new_monthly_statistics})
+    return new_monthly_statistics
+
+
+def add_months(date_obj, months):
+    """Get the same day of a later month (or the last day of that month, if it is shorter)."""
+    year, month = divmod(date_obj.month - 1 + months, 12)
+    year += date_obj.year
+    day = min(date_obj.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+
+def copy_transactions(transactions, dates):
+    """
+    Copy transactions to each of several dates.
+
+    The Months of the dates are resolved at once, and the copies are created
+    with a single bulk_create(). The transactions should all be of the same model.
+
+    Args:
+        transactions: The transactions to copy.
+        dates: The dates to copy each of the transactions to.
+
+    Returns:
+        list: The new transactions.
+    """
+    if not transactions or not dates:
+        return []
+    TransactionModel = type(transactions[0])
+    months = models.get_or_create_months_for_dates(dates)
+    new_transactions = []
+    for date_obj in dates:
+        month = months[(date_obj.year, date_obj.month)]
+        for transaction_obj in transactions:
+            new_transactions.append(
+                TransactionModel(
+                    category_id=transaction_obj.category_id,
+                    title=transaction_obj.title,
+                    date=date_obj,
+                    amount=transaction_obj.amount,
+                    month=month,
+                    description=transaction_obj.description,
+                )
+            )
+    models.set_unique_transaction_slugs(new_transactions)
+    TransactionModel.objects.bulk_create(new_transactions, batch_size=1000)
+    # bulk_create() does not send post_save, so refresh the totals here
+    refresh_monthly_category_totals(
+        [month.pk for month in months.values()],
+        type_cats=[get_transaction_type_cat(TransactionModel)],
     )
+    return new_transactions
+
+
+# The fields (other than category) that can be set with bulk_save_transactions()
+BULK_TRANSACTION_FIELDS = ("title", "date", "amount", "description", "pending")
+
+
+def bulk_save_transactions(type_cat, rows):
+    """
+    Create and update many transactions of one type at once.
+
+    All of the rows are validated before anything is saved, the Categories are
+    checked with a single query, the Months and slugs are resolved for all of
+    the rows at once, and the transactions are saved with bulk_create() and
+    bulk_update() in a single database transaction.
+
+    Args:
+        type_cat: The type of the transactions (expense or earning).
+        rows: A list of dicts of the fields of the transactions: title, date,
+            amount, category (the Category's id), and optionally description
+            and pending. A row with an id updates that transaction (only
+            changing the fields that are in the row), and the other rows create
+            new transactions. Each transaction can only be updated by one row.
+
+    Returns:
+        tuple: (list of the created transactions, list of the updated transactions)
+
+    Raises:
+        ValidationError: If any of the rows are not valid, with a message for each.
+    """
+    TransactionModel = get_transaction_model(type_cat)
+    form_fields = {
+        name: TransactionModel._meta.get_field(name).formfield() for name in BULK_TRANSACTION_FIELDS
+    }
+    rows = [row if isinstance(row, dict) else {} for row in rows]
+
+    def get_ids(name):
+        ids = set()
+        for row in rows:
+            try:
+                ids.add(int(row[name]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return ids
+
+    categories = models.Category.objects.filter(type_cat=type_cat).in_bulk(get_ids("category"))
+    existing_transactions = TransactionModel.objects.in_bulk(get_ids("id"))
+
+    errors = []
+    new_transactions = []
+    updated_transactions = []
+    updated_ids = set()
+    for index, row in enumerate(rows):
+        row_errors = []
+        values = {}
+        # A row that updates a transaction only changes the fields that it has
+        is_update = row.get("id") is not None
+        for name, form_field in form_fields.items():
+            if is_update and name not in row:
+                continue
+            try:
+                values[name] = form_field.clean(row.get(name))
+            except ValidationError as e:
+                row_errors.extend("{}: {}".format(name, message) for message in e.messages)
+        if not is_update or "category" in row:
+            try:
+                values["category"] = categories[int(row.get("category"))]
+            except (KeyError, TypeError, ValueError):
+                row_errors.append(
+                    "category: {} is not a valid Category".format(row.get("category"))
+                )
+
+        if not is_update:
+            transaction_obj = TransactionModel()
+            new_transactions.append(transaction_obj)
+        else:
+            try:
+                transaction_obj = existing_transactions[int(row["id"])]
+            except (KeyError, TypeError, ValueError):
+                row_errors.append("id: {} is not a valid transaction".format(row["id"]))
+            else:
+                if transaction_obj.pk in updated_ids:
+                    row_errors.append("id: {} is in more than one row".format(row["id"]))
+                else:
+                    updated_ids.add(transaction_obj.pk)
+                    updated_transactions.append(transaction_obj)
+
+        if row_errors:
+            errors.append("Row {}: {}".format(index, "; ".join(row_errors)))
+            continue
+        for name, value in values.items():
+            setattr(transaction_obj, name, value)
+    if errors:
+        raise ValidationError(errors)
+
+    with transaction.atomic():
+        # Remember the Months of the updated transactions, so that the totals of
+        # the Months they move out of are refreshed too
+        month_ids = {transaction_obj.month_id for transaction_obj in updated_transactions}
+        months = models.get_or_create_months_for_dates(
+            transaction_obj.date for transaction_obj in new_transactions + updated_transactions
+        )
+        for transaction_obj in new_transactions + updated_transactions:
+            transaction_obj.month = months[(transaction_obj.date.year, transaction_obj.date.month)]
+        month_ids.update(month.pk for month in months.values())
+
+        models.set_unique_transaction_slugs(new_transactions)
+        TransactionModel.objects.bulk_create(new_transactions)
+        TransactionModel.objects.bulk_update(
+            updated_transactions, [*BULK_TRANSACTION_FIELDS, "category", "month"]
+        )
+        # bulk_create() and bulk_update() do not send post_save, so refresh the totals here
+        refresh_monthly_category_totals(month_ids, type_cats=[type_cat])
+        if updated_transactions:
+            # The titles of the updated transactions may have changed
+            bump_title_index_version([type_cat])
+    return new_transactions, updated_transactions
 
 
 def create_unique_slug_for_transaction(transaction):
     # Create a slug based on title, date, and some random characters.
-    return "{}-{}-{}".format(
-        slugify(transaction.title),
-        transaction.date.strftime("%Y-%m-%d"),
-        str(uuid.uuid4()).replace("-", "")[0:10],
-    )
+    return models.create_transaction_slug(transaction.title, transaction.date, unique_suffix=True)
+
+
+class TitleIndex:
+    """
+    An in-memory index of the titles of one type of transaction, for autocompleting titles.
+
+    The titles are kept sorted (case-insensitively), so the titles that start
+    with a prefix are found with a binary search, and they are ranked by how
+    many transactions use them. The canonical titles of the TitleMappings are
+    included too, even if no transaction uses them yet.
+
+    The index is loaded on first use. Before each search, the transactions
+    created since the index was last updated (in any process) are added to it
+    with a single query on the primary key. Changes that this can't find (a
+    transaction that is changed or deleted, a TitleMapping that changes, or
+    an import that is committed) bump the title index version (see
+    bump_title_index_version()), and the whole index is reloaded on its next
+    search.
+    """
+
+    # The whole index is also reloaded every rebuild_interval seconds, to catch
+    # the changes that nothing bumps the version for: transactions that are
+    # saved (not imported) and committed out of id order, and changes made in
+    # another process when no TITLE_INDEX_CACHE_ALIAS is set.
+    rebuild_interval = 60 * 60
+
+    def __init__(self, type_cat):
+        self.transaction_model = get_transaction_model(type_cat)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        # Sorted list of (casefolded title, title)
+        self._keys = []
+        # Maps title -> number of transactions that use it
+        self._counts = {}
+        # The id of the newest transaction in the index
+        self._max_id = 0
+        # The title index version that the index was loaded at
+        self._version = None
+        self.type_cat = type_cat
+
+    def _add(self, title, count):
+        if title not in self._counts:
+            self._counts[title] = 0
+            bisect.insort(self._keys, (title.casefold(), title))
+        self._counts[title] += count
+
+    def _load(self):
+        self._keys = []
+        self._counts = {}
+        title_counts = (
+            self.transaction_model.objects.values("title")
+            .order_by()
+            .annotate(count=Count("id"), max_id=Max("id"))
+        )
+        max_id = 0
+        for title_count in title_counts:
+            self._counts[title_count["title"]] = title_count["count"]
+            max_id = max(max_id, title_count["max_id"])
+        for canonical_title in TitleMapping.objects.values_list("canonical_title", flat=True):
+            self._counts.setdefault(canonical_title, 0)
+        self._keys = sorted((title.casefold(), title) for title in self._counts)
+        self._max_id = max_id
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Reload the whole index on its next search."""
+        self._loaded_at = None
+
+    def _update(self):
+        """Add the transactions created since the index was last updated."""
+        new_transactions = self.transaction_model.objects.filter(id__gt=self._max_id).values_list(
+            "id", "title"
+        )
+        for transaction_id, title in new_transactions:
+            self._add(title, 1)
+            self._max_id = max(self._max_id, transaction_id)
+
+    def search(self, prefix, limit=10):
+        """Get the (up to limit) most used titles that start with prefix (case-insensitively)."""
+        with self._lock:
+            version = get_title_index_version(self.type_cat)
+            if (
+                self._loaded_at is None
+                or version != self._version
+                or time.monotonic() - self._loaded_at > self.rebuild_interval
+            ):
+                # Get the version before loading, so that a change made while the
+                # index is loaded makes it reload again
+                self._version = version
+                self._load()
+            else:
+                self._update()
+
+            prefix = prefix.casefold()
+            start = bisect.bisect_left(self._keys, (prefix,))
+            matches = []
+            for index in range(start, len(self._keys)):
+                key, title = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                matches.append(title)
+            return heapq.nsmallest(
+                limit, matches, key=lambda title: (-self._counts[title], title.casefold())
+            )
+
+
+# The TitleIndex of each type_cat (see get_title_index())
+_title_indexes = {}
+
+
+def get_title_index(type_cat):
+    """Get the (process-local) TitleIndex for a type_cat."""
+    if type_cat not in _title_indexes:
+        _title_indexes[type_cat] = TitleIndex(type_cat)
+    return _title_indexes[type_cat]
+
+
+def clear_title_indexes():
+    """Empty the process-local TitleIndexes, so they are reloaded on their next search."""
+    _title_indexes.clear()
+
+
+def _get_title_index_cache():
+    """
+    Get the Django cache that the title index versions are shared through between processes.
+
+    This is the cache named by the TITLE_INDEX_CACHE_ALIAS setting, or None if
+    the setting is not set, in which case only the TitleIndexes of the process
+    that made a change are reloaded.
+    """
+    alias = getattr(settings, "TITLE_INDEX_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _get_title_index_version_key(type_cat):
+    return "occurrence:title-index-version:{}".format(type_cat)
+
+
+def get_title_index_version(type_cat):
+    """
+    Get the current title index version of a type_cat (from the title index cache).
+
+    A version that is not in the cache (yet, or any more) is initialized to the
+    current time, so that a version is never reused. Without a title index
+    cache, the version is always None.
+    """
+    title_index_cache = _get_title_index_cache()
+    if title_index_cache is None:
+        return None
+    key = _get_title_index_version_key(type_cat)
+    version = title_index_cache.get(key)
+    if version is None:
+        title_index_cache.add(key, time.time_ns(), timeout=None)
+        version = title_index_cache.get(key)
+    return version
+
+
+def bump_title_index_version(type_cats=None):
+    """
+    Make the TitleIndexes of some type_cats reload, in this process and (with a
+    title index cache) in every other process.
+
+    The version is bumped right away, and again when the current database
+    transaction is committed, so that an index which was reloaded before the
+    changes were committed is reloaded again.
+
+    Args:
+        type_cats: The type_cats of the indexes. Defaults to all of them.
+    """
+    if type_cats is None:
+        type_cats = [name for (name, label) in models.Category.TYPE_CHOICES]
+
+    def bump():
+        title_index_cache = _get_title_index_cache()
+        for type_cat in type_cats:
+            if type_cat in _title_indexes:
+                _title_indexes[type_cat].invalidate()
+            if title_index_cache is None:
+                continue
+            key = _get_title_index_version_key(type_cat)
+            try:
+                title_index_cache.incr(key)
+            except ValueError:
+                # The version is not in the cache, so no index was loaded at it
+                title_index_cache.add(key, time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -1,9 +1,15 @@
+import json
+from collections import defaultdict
 from datetime import date
 
 from django.contrib import messages
-from django.db.models import DecimalField, F, Q, Sum, Value
-from django.http import Http404
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import DecimalField, F, Sum, Value
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_http_methods
@@ -11,6 +17,18 @@ from django.views.decorators.http import require_http_methods
 from data_tools.models import CSVImport
 
 from . import forms, models, utils
+from .middleware import request_timings
+
+# The number of transactions to show on each page of the running totals
+RUNNING_TOTALS_PAGE_SIZE = 100
+# The number of transactions of each type to show (or load) at a time on the transactions page
+TRANSACTIONS_PAGE_SIZE = 100
+# The number of titles to suggest when autocompleting a transaction title
+TITLE_AUTOCOMPLETE_LIMIT = 10
+# The maximum number of following months that transactions can be copied to at once
+COPY_TRANSACTIONS_MAX_REPEAT_MONTHS = 120
+# The maximum number of transactions that can be saved with one bulk request
+BULK_TRANSACTIONS_MAX = 1000
 
 
 def transactions(request, *args, **kwargs):
@@ -20,32 +38,11 @@ def transactions(request, *args, **kwargs):
         current_month = get_object_or_404(models.Month.objects.all(), slug=request.GET.get("month"))
     else:
         current_month = models.get_or_create_month_for_date_obj(date.today())
-    expense_transactions = models.ExpenseTransaction.objects.filter(
-        month=current_month
-    ).select_related("category")
-    earning_transactions = models.EarningTransaction.objects.filter(
-        month=current_month
-    ).select_related("category")
-    expense_transaction_titles = (
-        models.ExpenseTransaction.objects.order_by("title")
-        .values_list("title", flat=True)
-        .distinct("title")
-    )
-    earning_transaction_titles = (
-        models.EarningTransaction.objects.order_by("title")
-        .values_list("title", flat=True)
-        .distinct("title")
-    )
-
     context = {
-        "expense_transactions": expense_transactions,
-        "earning_transactions": earning_transactions,
         "expense_form": forms.ExpenseTransactionForm(),
         "earning_form": forms.EarningTransactionForm(),
         "current_month": current_month,
-        "months": models.Month.objects.all(),
-        "expense_transaction_choices": expense_transaction_titles,
-        "earning_transaction_choices": earning_transaction_titles,
+        "months": utils.get_month_list(),
         "expense_transaction_constant": models.Category.TYPE_EXPENSE,
         "earning_transaction_constant": models.Category.TYPE_EARNING,
         "show_new_expense_transaction_form": True,
@@ -66,6 +63,17 @@ def transactions(request, *args, **kwargs):
         else:
             # The form is not valid, so return the invalid form to the template
             context["expense_form"] = form
+
+    # Get the first page of the transactions of each type (the rest are loaded
+    # with the more_transactions view)
+    context["expense_transactions"], context["expense_next_cursor"] = utils.get_transactions_page(
+        models.ExpenseTransaction.objects.filter(month=current_month).select_related("category"),
+        TRANSACTIONS_PAGE_SIZE,
+    )
+    context["earning_transactions"], context["earning_next_cursor"] = utils.get_transactions_page(
+        models.EarningTransaction.objects.filter(month=current_month).select_related("category"),
+        TRANSACTIONS_PAGE_SIZE,
+    )
     return render(request, "occurrence/transactions.html", context)
 
 
@@ -81,27 +89,29 @@ def totals(request, *args, **kwargs):
 
     month = get_object_or_404(models.Month.objects.all(), slug=month_slug)
 
-    # Get budget data for this month (used by get_transactions_regular_totals)
-    budget_by_category = {
-        row.category_id: row.amount
-        for row in models.ExpectedMonthlyCategoryTotal.objects.filter(month=month)
-    }
+    def get_totals_data():
+        # Get budget data for this month (used by get_regular_totals)
+        budget_totals = list(
+            models.ExpectedMonthlyCategoryTotal.objects.filter(month=month).select_related(
+                "category__parent"
+            )
+        )
+        # Get the expense and earning totals for this month, enriched with budget data,
+        # and the MonthlyStatistics for this Month
+        return {
+            "regular_totals": utils.get_regular_totals(month, budget_totals=budget_totals),
+            "monthly_statistics": list(
+                models.MonthlyStatistic.objects.filter(month=month).select_related("statistic")
+            ),
+        }
 
-    # Get the expense totals for this month, enriched with budget data
-    expense_categories, expense_total = utils.get_transactions_regular_totals(
-        month,
-        type_cat=models.Category.TYPE_EXPENSE,
-        budget_by_category=budget_by_category,
+    totals_data = utils.get_cached_report_data(
+        "totals", get_totals_data, params=[month.pk], month_ids=[month.pk]
     )
-    # Get the earning totals for this month, enriched with budget data
-    earning_categories, earning_total = utils.get_transactions_regular_totals(
-        month,
-        type_cat=models.Category.TYPE_EARNING,
-        budget_by_category=budget_by_category,
-    )
-
-    # Get the MonthlyStatistic for this Month
-    monthly_statistics = models.MonthlyStatistic.objects.filter(month=month)
+    regular_totals = totals_data["regular_totals"]
+    expense_categories, expense_total = regular_totals[models.Category.TYPE_EXPENSE]
+    earning_categories, earning_total = regular_totals[models.Category.TYPE_EARNING]
+    monthly_statistics = totals_data["monthly_statistics"]
 
     expense_budget_total = (
         sum(
@@ -146,20 +156,125 @@ def totals(request, *args, **kwargs):
     return render(request, "occurrence/totals.html", context)
 
 
+@require_http_methods(["GET"])
+def more_transactions(request):
+    """Get the next page of the transactions of a Month, as HTML table rows (in JSON)."""
+    try:
+        TransactionModel = utils.get_transaction_model(request.GET.get("type_cat"))
+    except ValidationError:
+        return HttpResponseBadRequest("type_cat must be expense or income.")
+    month = get_object_or_404(models.Month.objects.all(), slug=request.GET.get("month"))
+    try:
+        transactions, next_cursor = utils.get_transactions_page(
+            TransactionModel.objects.filter(month=month).select_related("category"),
+            TRANSACTIONS_PAGE_SIZE,
+            after=request.GET.get("after"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest("The cursor is not valid.")
+
+    html = render_to_string(
+        "occurrence/transaction_rows.html", {"transactions": transactions}, request=request
+    )
+    return JsonResponse({"html": html, "next_cursor": next_cursor})
+
+
+@require_http_methods(["GET"])
+def title_autocomplete(request):
+    """Get the most used transaction titles that start with a prefix (as JSON)."""
+    try:
+        utils.get_transaction_model(request.GET.get("type_cat"))
+    except ValidationError:
+        return HttpResponseBadRequest("type_cat must be expense or income.")
+    titles = utils.get_title_index(request.GET["type_cat"]).search(
+        request.GET.get("q", ""), limit=TITLE_AUTOCOMPLETE_LIMIT
+    )
+    return JsonResponse({"titles": titles})
+
+
+@require_http_methods(["POST"])
+def bulk_transactions(request):
+    """
+    Create and update many transactions at once.
+
+    The request body is JSON, like {"type_cat": "expense", "transactions": [...]},
+    where each transaction has a title, date, amount, category (id), and optionally
+    a description and pending. Transactions with an id are updated (only the
+    fields that they have are changed), and the rest are created. Nothing is
+    saved if any of them are not valid.
+    """
+    try:
+        data = json.loads(request.body)
+        type_cat = data["type_cat"]
+        rows = data["transactions"]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse(
+            {"errors": ["The body must be JSON with a type_cat and a list of transactions."]},
+            status=400,
+        )
+    if not isinstance(rows, list):
+        return JsonResponse({"errors": ["transactions must be a list."]}, status=400)
+    if len(rows) > BULK_TRANSACTIONS_MAX:
+        return JsonResponse(
+            {
+                "errors": [
+                    "At most {} transactions can be saved at once.".format(BULK_TRANSACTIONS_MAX)
+                ]
+            },
+            status=400,
+        )
+
+    try:
+        created, updated = utils.bulk_save_transactions(type_cat, rows)
+    except ValidationError as e:
+        return JsonResponse({"errors": e.messages}, status=400)
+    return JsonResponse(
+        {
+            "created": [transaction.pk for transaction in created],
+            "updated": [transaction.pk for transaction in updated],
+        }
+    )
+
+
 @require_http_methods(["GET"])
 def running_total_categories(request):
     """The view for Categories that have a running total, rather than the regular total."""
-    categories = models.Category.objects.filter(
-        total_type=models.Category.TOTAL_TYPE_RUNNING
-    ).annotate(
-        total=Sum(F("expensetransaction__amount") * Value("-1"), output_field=DecimalField()),
+    page_number = request.GET.get("page")
+
+    def get_running_totals_data():
+        categories = list(
+            models.Category.objects.filter(total_type=models.Category.TOTAL_TYPE_RUNNING).annotate(
+                total=Sum(
+                    F("expensetransaction__amount") * Value("-1"), output_field=DecimalField()
+                ),
+            )
+        )
+        # Get a page of the ExpenseTransactions for all of the Categories (with their
+        # running_total_amount), and group them by Category
+        paginator = Paginator(
+            utils.get_running_totals_transactions(categories), RUNNING_TOTALS_PAGE_SIZE
+        )
+        page = paginator.get_page(page_number)
+        expense_transactions_by_category = defaultdict(list)
+        for expense_transaction in page:
+            expense_transactions_by_category[expense_transaction.category_id].append(
+                expense_transaction
+            )
+        for category in categories:
+            category.expense_transactions = expense_transactions_by_category[category.id]
+        # The Page itself is not cached, since it holds on to the (unevaluated) queryset
+        return {"categories": categories, "count": paginator.count, "number": page.number}
+
+    running_totals_data = utils.get_cached_report_data(
+        "running_totals", get_running_totals_data, params=[page_number]
+    )
+    categories = running_totals_data["categories"]
+    # Recreate the Page for the template from the number of transactions
+    page = Paginator(range(running_totals_data["count"]), RUNNING_TOTALS_PAGE_SIZE).page(
+        running_totals_data["number"]
     )
-    # For each Category, attach a queryset of ExpenseTransactions that have a
-    # running_total_amount fiels
-    for category in categories:
-        category.expense_transactions = utils.get_expensetransactions_running_totals(category)
 
-    context = {"categories": categories}
+    context = {"categories": categories, "page": page}
     return render(request, "occurrence/running_totals.html", context)
 
 
@@ -209,6 +324,35 @@ def csv_import_list(request):
     return render(request, "occurrence/csv_import_list.html", context)
 
 
+@require_http_methods(["GET"])
+def csv_import_status(request):
+    """Return the status and progress of CSVImports, for polling from the imports list."""
+    try:
+        csv_import_ids = [int(id) for id in request.GET.getlist("id")]
+    except ValueError:
+        return HttpResponseBadRequest("The CSV import ids must be integers.")
+
+    csv_imports = CSVImport.objects.filter(pk__in=csv_import_ids).order_by("-created_at")
+    return JsonResponse(
+        {
+            "csv_imports": [
+                {
+                    "id": csv_import.pk,
+                    "status": csv_import.status,
+                    "status_display": csv_import.get_status_display(),
+                    "is_finished": csv_import.is_finished,
+                    "rows_created": csv_import.rows_created,
+                    "rows_skipped": csv_import.rows_skipped,
+                    "rows_total": csv_import.rows_total,
+                    "progress_percent": csv_import.progress_percent,
+                    "errors": csv_import.errors,
+                }
+                for csv_import in csv_imports
+            ]
+        }
+    )
+
+
 @require_http_methods(["GET"])
 def csv_import_transactions(request, csv_import_id):
     """Show all transactions for a specific CSVImport."""
@@ -278,10 +422,15 @@ def budget(request):
                 earning_form = form
 
     # Fetch all rows once and split in Python to avoid extra DB queries
-    all_rows = list(
-        models.ExpectedMonthlyCategoryTotal.objects.filter(month=current_month).select_related(
-            "category"
-        )
+    all_rows = utils.get_cached_report_data(
+        "budget",
+        lambda: list(
+            models.ExpectedMonthlyCategoryTotal.objects.filter(month=current_month).select_related(
+                "category"
+            )
+        ),
+        params=[current_month.pk],
+        month_ids=[current_month.pk],
     )
     earning_rows = [r for r in all_rows if r.category.type_cat == models.Category.TYPE_EARNING]
     expense_rows = [r for r in all_rows if r.category.type_cat == models.Category.TYPE_EXPENSE]
@@ -385,6 +534,8 @@ def copy_budget(request):
         for row in source_rows
     ]
     models.ExpectedMonthlyCategoryTotal.objects.bulk_create(new_rows)
+    # bulk_create() does not send post_save, so bump the data version here
+    utils.bump_report_data_versions([target_month.pk])
     messages.success(
         request,
         "{} budget row(s) copied from {} to {}.".format(
@@ -411,20 +562,27 @@ def statistics_chart_view(request):
         start_month = get_object_or_404(models.Month, slug=start_month_slug)
         end_month = get_object_or_404(models.Month, slug=end_month_slug)
 
-        months_in_range = models.Month.objects.filter(
-            Q(year__gt=start_month.year) | Q(year=start_month.year, month__gte=start_month.month)
-        ).filter(Q(year__lt=end_month.year) | Q(year=end_month.year, month__lte=end_month.month))
-        monthly_stats = (
-            models.MonthlyStatistic.objects.filter(
-                statistic=statistic,
-                month__in=months_in_range,
+        def get_chart_data():
+            monthly_stats = (
+                utils.filter_month_range(
+                    models.MonthlyStatistic.objects.filter(statistic=statistic),
+                    (start_month.year, start_month.month),
+                    (end_month.year, end_month.month),
+                )
+                .order_by("month_index")
+                .values_list("month__name", "amount")
             )
-            .select_related("month")
-            .order_by("month__year", "month__month")
+            return [
+                {"month": month_name, "amount": float(amount)}
+                for month_name, amount in monthly_stats
+            ]
+
+        chart_data = utils.get_cached_report_data(
+            "statistics_chart",
+            get_chart_data,
+            params=[statistic.pk, start_month.pk, end_month.pk],
         )
 
-        chart_data = [{"month": str(ms.month), "amount": float(ms.amount)} for ms in monthly_stats]
-
     context = {
         "all_statistics": all_statistics,
         "all_months": all_months,
@@ -434,6 +592,44 @@ def statistics_chart_view(request):
     return render(request, "occurrence/statistics.html", context)
 
 
+@require_http_methods(["GET"])
+def statistics_series(request):
+    """
+    Get the amounts of one or more Statistics over a range of months (as columnar JSON).
+
+    The GET parameters are statistic (one or more slugs), start and end (YYYY-MM,
+    optional), period (month, quarter or year), aggregate (last or mean), and
+    rolling (the number of periods to compute rolling averages over, optional).
+    """
+    try:
+        statistic_slugs = request.GET.getlist("statistic")
+        if not statistic_slugs:
+            raise ValidationError("At least one statistic is required")
+        start = utils.parse_year_month(request.GET["start"]) if request.GET.get("start") else None
+        end = utils.parse_year_month(request.GET["end"]) if request.GET.get("end") else None
+        period = request.GET.get("period", "month")
+        aggregate = request.GET.get("aggregate", "last")
+        try:
+            rolling = int(request.GET["rolling"]) if request.GET.get("rolling") else None
+        except ValueError:
+            raise ValidationError("rolling must be a number")
+        data = utils.get_cached_report_data(
+            "statistics_series",
+            lambda: utils.get_statistics_series(
+                statistic_slugs,
+                start=start,
+                end=end,
+                period=period,
+                aggregate=aggregate,
+                rolling=rolling,
+            ),
+            params=[sorted(statistic_slugs), start, end, period, aggregate, rolling],
+        )
+    except ValidationError as e:
+        return JsonResponse({"errors": e.messages}, status=400)
+    return JsonResponse(data)
+
+
 @require_http_methods(["GET", "POST"])
 def copy_transactions(request):
     """Copy transactions to a new date."""
@@ -453,11 +649,9 @@ def copy_transactions(request):
         context = {"errors": ["The selected transaction ids must be integers."]}
         return render(request, "occurrence/copy_transactions.html", context)
 
-    if transaction_type == models.Category.TYPE_EXPENSE:
-        transactions = models.ExpenseTransaction.objects.filter(id__in=selected_transaction_ids)
-    elif transaction_type == models.Category.TYPE_EARNING:
-        transactions = models.EarningTransaction.objects.filter(id__in=selected_transaction_ids)
-    else:
+    try:
+        TransactionModel = utils.get_transaction_model(transaction_type)
+    except ValidationError:
         error = (
             f"You must choose a valid transaction_type (either '{models.Category.TYPE_EXPENSE}' "
             f"or '{models.Category.TYPE_EARNING}')."
@@ -465,7 +659,11 @@ def copy_transactions(request):
         context = {"errors": [error]}
         return render(request, "occurrence/copy_transactions.html", context)
 
-    if len(request_transaction_ids) != transactions.count():
+    # Get the transactions (and their Categories) with a single query
+    transactions = list(
+        TransactionModel.objects.filter(id__in=selected_transaction_ids).select_related("category")
+    )
+    if len(request_transaction_ids) != len(transactions):
         error = "One or more of the selected transactions does not exist."
         context = {"errors": [error]}
         return render(request, "occurrence/copy_transactions.html", context)
@@ -475,41 +673,53 @@ def copy_transactions(request):
         context = {
             "transactions": transactions,
             "transaction_type": transaction_type,
+            "max_repeat_months": COPY_TRANSACTIONS_MAX_REPEAT_MONTHS,
             "errors": [],
         }
         return render(request, "occurrence/copy_transactions.html", context)
     else:
         # For POST requests, create new transactions, based on the chosen transactions' data.
-        new_date = request.POST.get("date")
-        if new_date:
-            new_date_obj = parse_date(new_date)
-        if not new_date_obj:
-            error = f"You must choose a date in the appropriate format. '{new_date}' is not valid."
-            context = {"errors": [error]}
+        new_dates = request.POST.getlist("date")
+        new_date_objs = []
+        for new_date in new_dates:
+            new_date_obj = parse_date(new_date) if new_date else None
+            if not new_date_obj:
+                error = (
+                    f"You must choose a date in the appropriate format. '{new_date}' is not valid."
+                )
+                context = {"errors": [error]}
+                return render(request, "occurrence/copy_transactions.html", context)
+            new_date_objs.append(new_date_obj)
+        if not new_date_objs:
+            context = {"errors": ["You must choose a date."]}
             return render(request, "occurrence/copy_transactions.html", context)
 
-        # Determine the Month for the selected date.
-        month = models.get_or_create_month_for_date_obj(new_date_obj)
-
-        # Create new transactions, based on the chosen transactions' data.
-        if transaction_type == models.Category.TYPE_EXPENSE:
-            TransactionModel = models.ExpenseTransaction
-        elif transaction_type == models.Category.TYPE_EARNING:
-            TransactionModel = models.EarningTransaction
-        new_transactions = []
-        for transaction in transactions:
-            new_transactions.append(
-                TransactionModel(
-                    category=transaction.category,
-                    title=transaction.title,
-                    slug=utils.create_unique_slug_for_transaction(transaction),
-                    date=new_date_obj,
-                    amount=transaction.amount,
-                    month=month,
-                    description=transaction.description,
-                )
+        # The transactions can also be copied to the same day of each of the following months
+        try:
+            repeat_months = int(request.POST.get("repeat_months") or 0)
+        except ValueError:
+            repeat_months = -1
+        if not 0 <= repeat_months <= COPY_TRANSACTIONS_MAX_REPEAT_MONTHS:
+            error = (
+                "The number of months to repeat the transactions for must be between 0 and "
+                f"{COPY_TRANSACTIONS_MAX_REPEAT_MONTHS}."
             )
-        num_transactions_created = TransactionModel.objects.bulk_create(new_transactions)
+            context = {"errors": [error]}
+            return render(request, "occurrence/copy_transactions.html", context)
+        new_date_objs = [
+            utils.add_months(new_date_obj, months)
+            for new_date_obj in new_date_objs
+            for months in range(repeat_months + 1)
+        ]
 
-        messages.success(request, f"{len(num_transactions_created)} transaction(s) copied.")
+        new_transactions = utils.copy_transactions(transactions, new_date_objs)
+
+        messages.success(request, f"{len(new_transactions)} transaction(s) copied.")
         return redirect("transactions")
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def request_timing_histograms(request):
+    """The recent request timings of each view (in this process), as JSON."""
+    return JsonResponse({"views": request_timings.get_histograms()})
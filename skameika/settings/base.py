@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "occurrence.middleware.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -94,6 +95,29 @@ if os.getenv("DATABASE_URL"):
     DATABASES["default"].update(db_from_env)
 
 
+# The name of the cache (in CACHES) used to share Months between processes. If None,
+# Months are only cached within each process, and a Month that is deleted is only removed
+# from the cache of the process that deleted it, so set this when running several processes.
+MONTH_CACHE_ALIAS = None
+
+# The name of the cache (in CACHES) used to cache the data of the reporting views
+# (totals, running totals, statistics and budget). If None, that data is not cached.
+REPORT_CACHE_ALIAS = None
+
+# The name of the cache (in CACHES) used to share the compiled title and category mappings of
+# CSV imports between processes. If None, the mappings are loaded for every import.
+MAPPING_CACHE_ALIAS = None
+
+# The name of the cache (in CACHES) used to tell the other processes to reload their indexes of
+# transaction titles (for autocompleting titles). If None, only the process that changed the
+# titles reloads its indexes right away, and the others do so at their next periodic rebuild.
+TITLE_INDEX_CACHE_ALIAS = None
+
+# Requests that take at least this many seconds are logged (by
+# occurrence.middleware.RequestTimingMiddleware), along with this many of their slowest queries.
+SLOW_REQUEST_THRESHOLD = 1.0
+SLOW_REQUEST_LOGGED_QUERIES = 5
+
 # Absolute filesystem path to the directory that will hold user-uploaded files.
 # Example: "/home/media/media.lawrence.com/media/"
 MEDIA_ROOT = os.path.join(PROJECT_ROOT, "public", "media")
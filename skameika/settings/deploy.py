@@ -34,6 +34,11 @@ CACHES = {
     }
 }
 
+MONTH_CACHE_ALIAS = "default"
+REPORT_CACHE_ALIAS = "default"
+MAPPING_CACHE_ALIAS = "default"
+TITLE_INDEX_CACHE_ALIAS = "default"
+
 EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
@@ -0,0 +1,41 @@
+// Poll the status of unfinished CSV imports, and update their rows in the imports table.
+
+const POLL_INTERVAL_MS = 3000;
+
+function unfinishedRows(table) {
+  return Array.from(table.querySelectorAll('tr[data-finished="false"]'));
+}
+
+function updateRow(row, csvImport) {
+  let status = csvImport.status_display;
+  if (!csvImport.is_finished && csvImport.progress_percent !== null) {
+    status += ` (${csvImport.progress_percent}%)`;
+  }
+  row.querySelector('.csv-import-status').textContent = status;
+  row.querySelector('.csv-import-errors').textContent = csvImport.errors;
+  row.querySelector('.csv-import-rows-created').textContent = csvImport.rows_created;
+  row.querySelector('.csv-import-rows-skipped').textContent = csvImport.rows_skipped;
+  row.dataset.finished = csvImport.is_finished ? 'true' : 'false';
+}
+
+function poll(table) {
+  const rows = unfinishedRows(table);
+  if (!rows.length) return;
+
+  const params = new URLSearchParams();
+  rows.forEach(row => params.append('id', row.dataset.id));
+  fetch(`${table.dataset.statusUrl}?${params}`)
+    .then(response => response.json())
+    .then(data => {
+      data.csv_imports.forEach(csvImport => {
+        const row = document.getElementById(`csv-import-${csvImport.id}`);
+        if (row) updateRow(row, csvImport);
+      });
+    })
+    .finally(() => setTimeout(() => poll(table), POLL_INTERVAL_MS));
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+  const table = document.getElementById('csv-imports');
+  if (table) setTimeout(() => poll(table), POLL_INTERVAL_MS);
+});
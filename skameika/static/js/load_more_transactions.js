@@ -0,0 +1,26 @@
+// Load the next page of transactions into their table, when a "Load more" button is clicked.
+
+function loadMore(button) {
+  const params = new URLSearchParams({after: button.dataset.cursor});
+  button.disabled = true;
+  fetch(`${button.dataset.url}&${params}`)
+    .then(response => response.json())
+    .then(data => {
+      const tbody = document.getElementById(button.dataset.target);
+      tbody.insertAdjacentHTML('beforeend', data.html);
+      if (data.next_cursor) {
+        button.dataset.cursor = data.next_cursor;
+      } else {
+        button.remove();
+      }
+    })
+    .finally(() => {
+      button.disabled = false;
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('.load-more-transactions').forEach(button => {
+    button.addEventListener('click', () => loadMore(button));
+  });
+});
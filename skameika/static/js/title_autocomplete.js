@@ -0,0 +1,27 @@
+// Suggest transaction titles (in the input's datalist) as the user types.
+
+const AUTOCOMPLETE_DELAY_MS = 150;
+
+function updateSuggestions(input) {
+  const params = new URLSearchParams({q: input.value});
+  fetch(`${input.dataset.url}&${params}`)
+    .then(response => response.json())
+    .then(data => {
+      const datalist = document.getElementById(input.getAttribute('list'));
+      datalist.replaceChildren(...data.titles.map(title => {
+        const option = document.createElement('option');
+        option.value = title;
+        return option;
+      }));
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('.title-autocomplete').forEach(input => {
+    let timeout = null;
+    input.addEventListener('input', () => {
+      clearTimeout(timeout);
+      timeout = setTimeout(() => updateSuggestions(input), AUTOCOMPLETE_DELAY_MS);
+    });
+  });
+});